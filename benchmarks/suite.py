@@ -0,0 +1,60 @@
+"""Benchmark suite: run `pda bench` at 10^3..10^6 rows (10^7 with --max-rows).
+
+Results go to benchmarks/results/<commit>-<rows>.json; pass --baseline DIR
+with an earlier run's results directory to flag per-stage regressions.
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py --max-rows 10000000 --baseline benchmarks/results/abc1234
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pda.bench import compare_results, format_results, run_bench  # noqa: E402
+
+SCALES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-rows", type=int, default=1_000_000)
+    parser.add_argument("--categories", type=int, default=12)
+    parser.add_argument("--invalid-rate", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--out", default=str(Path(__file__).resolve().parent / "results"))
+    parser.add_argument("--baseline", default=None, help="Directory of earlier results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    regressed = False
+    for rows in (s for s in SCALES if s <= args.max_rows):
+        result = run_bench(
+            rows=rows, categories=args.categories, invalid_rate=args.invalid_rate,
+            repeat=args.repeat if rows <= 100_000 else 1, memory=not args.no_memory,
+        )
+        out_dir = Path(args.out) / (result["commit"] or "local")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        name = f"bench-{rows}.json"
+        (out_dir / name).write_text(json.dumps(result, indent=2), encoding="utf-8")
+        print(f"\n== {rows} rows ==\n{format_results(result)}")
+
+        base_path = Path(args.baseline) / name if args.baseline else None
+        if base_path is not None and base_path.exists():
+            baseline = json.loads(base_path.read_text(encoding="utf-8"))
+            for c in compare_results(baseline, result, args.threshold):
+                flag = "  REGRESSION" if c["regression"] else ""
+                print(f"  {c['stage']:<18} {c['change']:+.1%}{flag}")
+                regressed = regressed or c["regression"]
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,26 +2,29 @@ from __future__ import annotations
 
 import csv
 import json
-from collections import defaultdict
 from pathlib import Path
-from statistics import mean, stdev
-from typing import Dict, List, Tuple
+from typing import Iterator, List, Union
 
-from .utils import ensure_dir
+from .anomaly import apply_anomaly_rule, anomaly_rule_from
+from .columnar import ColumnarStore, store_path_for
+from .manifest import STATE_NAME
+from .stats import ExpenseAccumulator
+from .summary_io import write_summary_file
+from .utils import ensure_dir, file_size, incr, timed
+
+
+def iter_cleaned_expenses(cleaned_csv_path: str) -> Iterator[dict]:
+    """Yield cleaned_expenses.csv rows as dicts, one at a time."""
+    with open(cleaned_csv_path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
 
 
 def read_cleaned_expenses(cleaned_csv_path: str) -> List[dict]:
     """Read cleaned_expenses.csv into a list of dicts."""
-    rows: List[dict] = []
-    with open(cleaned_csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        next(reader)
-        for r in reader:
-            rows.append(r)
-    return rows
+    return list(iter_cleaned_expenses(cleaned_csv_path))
 
 
-def analyze_expenses(cleaned_csv_path: str) -> dict:
+def analyze_expenses(cleaned_csv_path: str, anomaly: Union[None, str, dict] = None) -> dict:
     """Compute required statistics from cleaned CSV.
 
     Required:
@@ -33,54 +36,42 @@ def analyze_expenses(cleaned_csv_path: str) -> dict:
     - largest_5_transactions (by amount)
     - anomalies (simple rule, e.g. > mean + 2*std)
 
-    TODO:
-    - Convert amounts to float safely (they SHOULD be clean already)
-    - Ensure outputs are JSON-serializable
+    Rows are streamed into an ExpenseAccumulator, so only the running
+    aggregates, the top-5 heap and the anomaly candidates are held in memory.
+    When an up-to-date columnar store sits next to the CSV it is used
+    instead, and the CSV is not parsed at all.
+
+    anomaly selects a pda.anomaly rule (name or {"type": ..., params});
+    the default is the global mean + 2*std rule.
     """
-    rows = read_cleaned_expenses(cleaned_csv_path)
-
-    amounts: List[float] = []
-    total_by_cat: Dict[str, float] = defaultdict(float)
-    count_by_cat: Dict[str, int] = defaultdict(int)
-
-    parsed_rows: List[dict] = []
-    for r in rows:
-        amt = float(r["amount"])
-        cat = r["category"]
-        amounts.append(amt)
-        total_by_cat[cat] += amt
-        count_by_cat[cat] += 1
-        parsed_rows.append({**r, "amount": amt})
-
-    if not amounts:
-        return {
-            "total_spend": 0.0,
-            "average_amount": 0.0,
-            "count_by_category": dict(count_by_cat),
-            "total_by_category": dict(total_by_cat),
-            "top_3_categories_by_total": [],
-            "largest_5_transactions": [],
-            "anomalies": [],
-        }
-
-    avg = mean(amounts)
-    sd = stdev(amounts) if len(amounts) >= 2 else 0.0
-    threshold = avg + 2 * sd
-
-    top3 = sorted(total_by_cat.items(), key=lambda x: x[1], reverse=True)[:3]
-    largest5 = sorted(parsed_rows, key=lambda x: x["amount"], reverse=True)[:5]
-    anomalies = [r for r in parsed_rows if r["amount"] > threshold]
-
-    return {
-        "total_spend": round(sum(amounts), 2),
-        "average_amount": round(avg, 2),
-        "count_by_category": dict(count_by_cat),
-        "total_by_category": {k: round(v, 2) for k, v in total_by_cat.items()},
-        "top_3_categories_by_total": [(k, round(v, 2)) for k, v in top3],
-        "largest_5_transactions": largest5,
-        "anomaly_rule": {"type": "mean_plus_2std", "threshold": round(threshold, 2)},
-        "anomalies": anomalies,
-    }
+    rule = anomaly_rule_from(anomaly)
+    store = ColumnarStore.open(store_path_for(cleaned_csv_path))
+    if store is not None:
+        with store:
+            incr("pda_rows_total", store.rows, stage="analyze", result="columnar")
+            return apply_anomaly_rule(analyze_columns(store), rule, store.iter_rows)
+
+    acc = ExpenseAccumulator()
+    for r in iter_cleaned_expenses(cleaned_csv_path):
+        acc.add(r)
+    incr("pda_rows_total", acc.stats.count, stage="analyze", result="csv")
+    incr("pda_bytes_read_total", file_size(cleaned_csv_path), stage="analyze")
+    rescan = lambda: iter_cleaned_expenses(cleaned_csv_path)  # noqa: E731
+    return apply_anomaly_rule(acc.result(rescan=rescan), rule, rescan)
+
+
+def analyze_columns(store: ColumnarStore) -> dict:
+    """analyze_expenses() over a memory-mapped columnar store.
+
+    Only row indexes are kept as accumulator records; rows are materialized
+    for the top-5 and anomaly output alone.
+    """
+    acc = ExpenseAccumulator()
+    add = acc.add_value
+    categories = store.categories
+    for i, (amount, code) in enumerate(zip(store.amounts, store.category_codes)):
+        add(amount, categories[code], i)
+    return acc.result(rescan=store.iter_rows, materialize=store.row)
 
 
 def analyze_notes(notes_json_path: str) -> dict:
@@ -88,25 +79,44 @@ def analyze_notes(notes_json_path: str) -> dict:
     return json.loads(Path(notes_json_path).read_text(encoding="utf-8"))
 
 
-def write_summary(output_dir: str, summary: dict) -> Path:
-    """Write summary.json to output_dir."""
-    out_dir = ensure_dir(output_dir)
-    out_path = out_dir / "summary.json"
-    out_path.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
-    return out_path
+def write_summary(output_dir: str, summary: dict, pretty: bool = False, fmt: str = "json") -> Path:
+    """Write summary.json to output_dir (compact unless pretty; fmt="msgpack" for summary.msgpack)."""
+    ensure_dir(output_dir)
+    return write_summary_file(output_dir, summary, pretty=pretty, fmt=fmt)
+
 
+@timed("analyze")
+def run_analyze(
+    input_dir: str,
+    incremental: bool = False,
+    anomaly: Union[None, str, dict] = None,
+    pretty: bool = False,
+    fmt: str = "json",
+) -> Path:
+    """Compute and write summary.json based on processed artifacts.
 
-def run_analyze(input_dir: str) -> Path:
-    """Compute and write summary.json based on processed artifacts."""
+    With incremental=True the ExpenseAccumulator state saved by an
+    incremental ingest is reused instead of re-reading the cleaned CSV.
+    anomaly selects the anomaly rule (see analyze_expenses); pretty/fmt
+    choose the summary encoding (see write_summary).
+    """
     input_dir = str(Path(input_dir))
     cleaned_csv = str(Path(input_dir) / "cleaned_expenses.csv")
     notes_json = str(Path(input_dir) / "notes_extracted.json")
-
-    expenses_summary = analyze_expenses(cleaned_csv)
+    state_path = Path(input_dir) / STATE_NAME
+
+    if incremental and state_path.exists():
+        acc = ExpenseAccumulator.from_state(json.loads(state_path.read_text(encoding="utf-8")))
+        rescan = lambda: iter_cleaned_expenses(cleaned_csv)  # noqa: E731
+        expenses_summary = apply_anomaly_rule(acc.result(rescan=rescan), anomaly_rule_from(anomaly), rescan)
+    else:
+        expenses_summary = analyze_expenses(cleaned_csv, anomaly=anomaly)
     notes_summary = analyze_notes(notes_json)
 
     combined = {
         "expenses": expenses_summary,
         "notes": notes_summary,
     }
-    return write_summary(input_dir, combined)
+    out_path = write_summary(input_dir, combined, pretty=pretty, fmt=fmt)
+    incr("pda_bytes_written_total", file_size(out_path), stage="analyze")
+    return out_path
@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import logging
+import math
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import date
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
+
+from .stats import RunningStats
+
+Rows = Callable[[], Iterable[dict]]
+
+# Consistency constant: MAD * 1.4826 estimates the standard deviation of normal data.
+MAD_SCALE = 1.4826
+
+
+class P2Quantile:
+    """Streaming estimate of the p-quantile in O(1) memory (Jain & Chlamtac's P² algorithm).
+
+    Five markers track the min, p/2, p, (1+p)/2 quantiles and the max and
+    are nudged with piecewise-parabolic interpolation as values arrive.
+    With fewer than five values the exact (interpolated) quantile is returned.
+    """
+
+    def __init__(self, p: float) -> None:
+        if not 0 < p < 1:
+            raise ValueError("p must be in (0, 1)")
+        self.p = p
+        self.count = 0
+        self._q: List[float] = []
+        self._n = [0, 1, 2, 3, 4]
+        self._want = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._step = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        q = self._q
+        if self.count <= 5:
+            q.append(x)
+            if self.count == 5:
+                q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        n = self._n
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._want[i] += self._step[i]
+
+        for i in (1, 2, 3):
+            d = self._want[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                s = 1 if d > 0 else -1
+                cand = q[i] + s / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < cand < q[i + 1]:
+                    cand = q[i] + s * (q[i + s] - q[i]) / (n[i + s] - n[i])
+                q[i] = cand
+                n[i] += s
+
+    def value(self) -> float:
+        if self.count == 0:
+            return 0.0
+        if self.count < 5:
+            xs = sorted(self._q)
+            pos = self.p * (len(xs) - 1)
+            lo = int(pos)
+            hi = min(lo + 1, len(xs) - 1)
+            return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+        return self._q[2]
+
+
+def _flag(rows: Rows, is_anomaly: Callable[[dict, float], bool]) -> List[dict]:
+    out = []
+    for r in rows():
+        amt = float(r["amount"])
+        if is_anomaly(r, amt):
+            out.append({**r, "amount": amt})
+    return out
+
+
+class AnomalyRule(ABC):
+    """Base class: detect(rows) -> (anomalies, anomaly_rule dict).
+
+    rows() re-yields the cleaned rows and may be called more than once;
+    rules keep only per-group state, never the rows themselves.
+    """
+
+    name = ""
+
+    def __init__(self, by_category: bool = False, **params: Any) -> None:
+        self.by_category = by_category
+        self.params = params
+
+    def group(self, row: dict) -> str:
+        return row["category"] if self.by_category else ""
+
+    @abstractmethod
+    def detect(self, rows: Rows) -> Tuple[List[dict], dict]:
+        """(anomalous rows with float amounts, anomaly_rule entry for the summary)."""
+
+    def describe(self, thresholds: Optional[Dict[str, float]] = None) -> dict:
+        """anomaly_rule entry: type, parameters and the thresholds used (per category or global)."""
+        out = {"type": self.name, "by_category": self.by_category, **self.params}
+        if thresholds is not None:
+            if self.by_category:
+                out["thresholds"] = {g: round(t, 2) for g, t in sorted(thresholds.items())}
+            else:
+                out["threshold"] = round(thresholds[""], 2) if "" in thresholds else None
+        return out
+
+
+class ZScoreRule(AnomalyRule):
+    """amount > mean + z*stdev, with mean/stdev per category (or global)."""
+
+    name = "zscore"
+
+    def __init__(self, z: float = 2.0, min_count: int = 3, by_category: bool = True) -> None:
+        super().__init__(by_category, z=z, min_count=min_count)
+        self.z = z
+        self.min_count = min_count
+
+    def detect(self, rows: Rows) -> Tuple[List[dict], dict]:
+        stats: Dict[str, RunningStats] = {}
+        for r in rows():
+            g = self.group(r)
+            s = stats.get(g)
+            if s is None:
+                s = stats[g] = RunningStats()
+            s.add(float(r["amount"]))
+        thresholds = {
+            g: s.mean() + self.z * s.stdev() for g, s in stats.items() if s.count >= self.min_count
+        }
+        anomalies = _flag(rows, lambda r, amt: amt > thresholds.get(self.group(r), math.inf))
+        return anomalies, self.describe(thresholds)
+
+
+class RollingZScoreRule(AnomalyRule):
+    """amount more than z stdevs above the trailing window_days of earlier rows.
+
+    One pass in input order, since cleaned rows keep the export's order and
+    exports are normally chronological. If a row is dated before the one
+    preceding it, the pass is abandoned and redone over the rows sorted by
+    date (holding them in memory). Each group keeps a deque of the rows
+    inside the window with a Welford mean/M2 that supports removal.
+    """
+
+    name = "rolling_zscore"
+
+    def __init__(self, window_days: int = 30, z: float = 3.0, min_count: int = 5, by_category: bool = True) -> None:
+        super().__init__(by_category, window_days=window_days, z=z, min_count=min_count)
+        self.window_days = window_days
+        self.z = z
+        self.min_count = min_count
+
+    def detect(self, rows: Rows) -> Tuple[List[dict], dict]:
+        out = self._scan(rows())
+        if out is None:
+            logging.info("Rows are not in date order; sorting them for the %s rule", self.name)
+            out = self._scan(iter(sorted(rows(), key=lambda r: r["date"])))
+        return out, self.describe()
+
+    def _scan(self, rows: Iterator[dict]) -> Optional[List[dict]]:
+        """Anomalies of date-ordered rows; None as soon as a row goes back in time."""
+        windows: Dict[str, Tuple[Deque[Tuple[int, float]], List[float]]] = {}
+        ordinals: Dict[str, int] = {}
+        out = []
+        last = ""
+        for r in rows:
+            if r["date"] < last:
+                return None
+            last = r["date"]
+            amt = float(r["amount"])
+            day = ordinals.get(r["date"])
+            if day is None:
+                day = ordinals[r["date"]] = date.fromisoformat(r["date"]).toordinal()
+            g = self.group(r)
+            if g not in windows:
+                windows[g] = (deque(), [0, 0.0, 0.0])
+            win, acc = windows[g]  # acc = [n, mean, m2]
+
+            while win and win[0][0] <= day - self.window_days:
+                _, old = win.popleft()
+                n = acc[0] - 1
+                if n == 0:
+                    acc[:] = [0, 0.0, 0.0]
+                else:
+                    delta = old - acc[1]
+                    acc[1] -= delta / n
+                    acc[2] = max(0.0, acc[2] - delta * (old - acc[1]))
+                    acc[0] = n
+
+            n, mean, m2 = acc
+            if n >= self.min_count and n > 1:
+                sd = math.sqrt(m2 / (n - 1))
+                if sd > 0 and (amt - mean) / sd > self.z:
+                    out.append({**r, "amount": amt})
+
+            win.append((day, amt))
+            acc[0] += 1
+            delta = amt - acc[1]
+            acc[1] += delta / acc[0]
+            acc[2] += delta * (amt - acc[1])
+        return out
+
+
+class MadRule(AnomalyRule):
+    """Robust rule: amount > median + k * 1.4826 * MAD.
+
+    Median and MAD come from P² sketches (one pass each), so the rule needs
+    three passes over the rows but constant memory per group. Groups whose
+    MAD is 0 (most values identical) flag nothing.
+    """
+
+    name = "median_mad"
+
+    def __init__(self, k: float = 3.5, min_count: int = 5, by_category: bool = False) -> None:
+        super().__init__(by_category, k=k, min_count=min_count)
+        self.k = k
+        self.min_count = min_count
+
+    def detect(self, rows: Rows) -> Tuple[List[dict], dict]:
+        medians: Dict[str, P2Quantile] = {}
+        for r in rows():
+            medians.setdefault(self.group(r), P2Quantile(0.5)).add(float(r["amount"]))
+        med = {g: q.value() for g, q in medians.items() if q.count >= self.min_count}
+
+        deviations: Dict[str, P2Quantile] = {}
+        for r in rows():
+            g = self.group(r)
+            if g in med:
+                deviations.setdefault(g, P2Quantile(0.5)).add(abs(float(r["amount"]) - med[g]))
+        thresholds = {}
+        for g, q in deviations.items():
+            mad = q.value()
+            if mad > 0:
+                thresholds[g] = med[g] + self.k * MAD_SCALE * mad
+
+        anomalies = _flag(rows, lambda r, amt: amt > thresholds.get(self.group(r), math.inf))
+        return anomalies, self.describe(thresholds)
+
+
+class QuantileRule(AnomalyRule):
+    """amount above the (P²-estimated) q-quantile of its group."""
+
+    name = "quantile"
+
+    def __init__(self, q: float = 0.99, min_count: int = 20, by_category: bool = False) -> None:
+        super().__init__(by_category, q=q, min_count=min_count)
+        self.q = q
+        self.min_count = min_count
+
+    def detect(self, rows: Rows) -> Tuple[List[dict], dict]:
+        sketches: Dict[str, P2Quantile] = {}
+        for r in rows():
+            sketches.setdefault(self.group(r), P2Quantile(self.q)).add(float(r["amount"]))
+        thresholds = {g: s.value() for g, s in sketches.items() if s.count >= self.min_count}
+        anomalies = _flag(rows, lambda r, amt: amt > thresholds.get(self.group(r), math.inf))
+        return anomalies, self.describe(thresholds)
+
+
+ANOMALY_RULES: Dict[str, Type[AnomalyRule]] = {
+    "zscore": ZScoreRule,
+    "rolling_zscore": RollingZScoreRule,
+    "median_mad": MadRule,
+    "quantile": QuantileRule,
+}
+# Names accepted besides the rule types; "global" is the built-in mean+2std.
+ALIASES = {"per_category": "zscore", "rolling": "rolling_zscore", "mad": "median_mad"}
+
+
+def anomaly_rule_from(config: Union[None, str, dict]) -> Optional[AnomalyRule]:
+    """Build a rule from a name or {"type": name, **params} (e.g. profile "anomaly_rule").
+
+    None / "global" / "mean_plus_2std" mean the default single global
+    mean + 2*stdev rule computed by ExpenseAccumulator, and return None.
+    """
+    if config is None:
+        return None
+    if isinstance(config, str):
+        config = {"type": config}
+    params = dict(config)
+    kind = str(params.pop("type", "global"))
+    if kind in ("global", "mean_plus_2std"):
+        return None
+    kind = ALIASES.get(kind, kind)
+    if kind not in ANOMALY_RULES:
+        raise ValueError(f"Unsupported anomaly rule: {kind}")
+    return ANOMALY_RULES[kind](**params)
+
+
+def apply_anomaly_rule(summary: dict, rule: Optional[AnomalyRule], rows: Rows) -> dict:
+    """Replace summary's anomalies/anomaly_rule with rule's (no-op for the default rule)."""
+    if rule is None or "anomaly_rule" not in summary:
+        return summary
+    anomalies, described = rule.detect(rows)
+    summary["anomaly_rule"] = described
+    summary["anomalies"] = anomalies
+    return summary
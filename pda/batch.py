@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import json
+import logging
+import re
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, List, Tuple
+
+from .utils import incr, observe
+
+RESULTS_NAME = "batch_results.jsonl"
+MODES = ("thread", "process")
+
+_TENANT_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+_PATH_KEYS = ("csv", "notes", "profile", "out", "report")
+
+
+def load_tenants(manifest_path: str) -> Tuple[List[dict], List[dict]]:
+    """Parse users.jsonl into (tenants, failures).
+
+    Each line is {"id", "csv", "notes"} plus optional "profile", "api",
+    "anomaly", "out" and "report"; relative paths are taken from the
+    manifest's directory. Lines that cannot be used (bad JSON, missing
+    keys, unsafe or repeated id) become failure records instead of
+    stopping the batch.
+    """
+    base = Path(manifest_path).resolve().parent
+    tenants: List[dict] = []
+    failures: List[dict] = []
+    seen = set()
+    with open(manifest_path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                if not isinstance(entry, dict):
+                    raise ValueError("not a JSON object")
+            except ValueError as e:
+                failures.append(_failure(f"line{lineno}", f"invalid JSON: {e}"))
+                continue
+            tenant_id = str(entry.get("id", ""))
+            missing = [k for k in ("id", "csv", "notes") if not entry.get(k)]
+            if missing:
+                error = f"missing {', '.join(missing)}"
+            elif not _TENANT_ID.fullmatch(tenant_id):
+                error = f"unsafe id {tenant_id!r} (letters, digits, '.', '_', '-')"
+            elif tenant_id in seen:
+                error = "duplicate id"
+            else:
+                error = None
+            if error:
+                failures.append(_failure(tenant_id or f"line{lineno}", error))
+                continue
+            seen.add(tenant_id)
+            for key in _PATH_KEYS:
+                if entry.get(key):
+                    entry[key] = str(base / entry[key])
+            tenants.append(entry)
+    return tenants, failures
+
+
+def _failure(tenant_id: str, error: str, seconds: float = 0.0) -> dict:
+    return {"id": tenant_id, "status": "failed", "seconds": round(seconds, 6), "rows": 0, "error": error}
+
+
+def tenant_paths(entry: dict, out_root: str) -> Tuple[str, str]:
+    """(processed dir, report path) for a tenant: out_root/<id>/processed and out_root/<id>/report.md by default."""
+    root = Path(out_root) / entry["id"]
+    return entry.get("out") or str(root / "processed"), entry.get("report") or str(root / "report.md")
+
+
+def run_tenant(entry: dict, out_root: str, cache_dir: str, options: dict) -> dict:
+    """Run one tenant's pipeline; never raises, so one bad tenant cannot stop the batch.
+
+    options holds the batch-wide run_pipeline keywords (api, anomaly,
+    report_options, ...); the tenant's own "api"/"anomaly" take precedence,
+    then the profile's anomaly_rule.
+    """
+    from .ingest import load_profile
+    from .pipeline import run_pipeline
+    from .summary_io import find_summary, load_summary
+
+    t0 = time.perf_counter()
+    out_dir, report_path = tenant_paths(entry, out_root)
+    opts = dict(options)
+    for key in ("api", "anomaly"):
+        if entry.get(key):
+            opts[key] = entry[key]
+    try:
+        if opts.get("anomaly") is None:
+            opts["anomaly"] = load_profile(entry.get("profile")).get("anomaly_rule")
+        Path(report_path).parent.mkdir(parents=True, exist_ok=True)
+        results = run_pipeline(
+            entry["csv"], entry["notes"], entry.get("profile"), out_dir, report_path, cache_dir=cache_dir, **opts
+        )
+        summary = load_summary(str(find_summary(out_dir)), with_enrichment=False)
+    except Exception as e:  # noqa: BLE001 - recorded per tenant
+        seconds = time.perf_counter() - t0
+        logging.error("Tenant %s failed after %.1fs: %s", entry["id"], seconds, e)
+        return _failure(entry["id"], f"{type(e).__name__}: {e}", seconds)
+    seconds = time.perf_counter() - t0
+    rows = sum(summary.get("expenses", {}).get("count_by_category", {}).values())
+    logging.info("Tenant %s: rows=%s in %.1fms", entry["id"], rows, seconds * 1000)
+    return {
+        "id": entry["id"],
+        "status": "ok",
+        "seconds": round(seconds, 6),
+        "rows": rows,
+        "cached_stages": sum(r.status == "cached" for r in results),
+        "out": out_dir,
+        "report": report_path,
+    }
+
+
+def run_batch(
+    manifest_path: str,
+    out_root: str = "batch",
+    cache_dir: str = "cache",
+    jobs: int = 4,
+    mode: str = "thread",
+    **options: Any,
+) -> dict:
+    """Run every tenant in manifest_path on a pool of jobs workers.
+
+    mode="thread" runs tenants in this process, so they share one
+    in-memory enrichment cache and one FetchEngine (HTTP session, rate
+    limit, and coalescing of identical in-flight lookups). mode="process"
+    uses a process pool for CPU-bound batches; workers are reused across
+    tenants and share the on-disk cache. Each tenant writes only under its
+    own directory. One line per tenant goes to out_root/batch_results.jsonl;
+    returns the aggregate {tenants, ok, failed, seconds, rows_per_sec, ...}.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown batch mode: {mode} (choose from {', '.join(MODES)})")
+    t0 = time.perf_counter()
+    Path(out_root).mkdir(parents=True, exist_ok=True)
+    results_path = Path(out_root) / RESULTS_NAME
+
+    def record(res: dict) -> None:
+        results.append(res)
+        out.write(json.dumps(res, ensure_ascii=False) + "\n")
+        out.flush()
+        incr("pda_batch_tenants_total", status=res["status"])
+        observe("pda_batch_tenant_seconds", res["seconds"])
+
+    tenants, failures = load_tenants(manifest_path)
+    results: List[dict] = []
+    pool: Executor = (ThreadPoolExecutor if mode == "thread" else ProcessPoolExecutor)(max_workers=max(1, jobs))
+    with open(results_path, "w", encoding="utf-8") as out, pool:
+        for res in failures:
+            record(res)
+        futures = {pool.submit(run_tenant, t, out_root, cache_dir, options): t for t in tenants}
+        for fut in as_completed(futures):
+            try:
+                res = fut.result()
+            except Exception as e:  # worker process died
+                res = _failure(futures[fut]["id"], f"{type(e).__name__}: {e}")
+            record(res)
+
+    seconds = time.perf_counter() - t0
+    ok = [r for r in results if r["status"] == "ok"]
+    rows = sum(r["rows"] for r in ok)
+    return {
+        "finished": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "tenants": len(results),
+        "ok": len(ok),
+        "failed": len(results) - len(ok),
+        "rows": rows,
+        "seconds": round(seconds, 6),
+        "tenants_per_sec": round(len(results) / seconds, 2) if seconds > 0 else None,
+        "rows_per_sec": round(rows / seconds) if seconds > 0 else None,
+        "failures": [{"id": r["id"], "error": r["error"]} for r in results if r["status"] != "ok"],
+        "results": str(results_path),
+    }
+
+
+def run_batch_command(manifest_path: str, **options: Any) -> int:
+    """Entry point for the batch command; returns 1 if any tenant failed."""
+    agg = run_batch(manifest_path, **options)
+    print(
+        f"tenants={agg['tenants']} ok={agg['ok']} failed={agg['failed']} rows={agg['rows']} "
+        f"in {agg['seconds']:.2f}s ({agg['tenants_per_sec']} tenants/s, {agg['rows_per_sec']} rows/s)"
+    )
+    for f in agg["failures"]:
+        print(f"FAILED {f['id']}: {f['error']}")
+    logging.info("Batch: %s", {k: v for k, v in agg.items() if k != "failures"})
+    return 1 if agg["failed"] else 0
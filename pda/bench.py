@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import csv
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCH_VERSION = 1
+STAGES = ("validate_row", "ingest_csv", "ingest_notes", "analyze_expenses", "generate_report")
+
+# validate_row is timed on at most this many rows held in memory, so the
+# 10^7 scale does not need 10^7 dicts at once.
+VALIDATE_SAMPLE = 200_000
+
+_DESCRIPTIONS = ("Coffee", "Uber ride", "Groceries", "Movie rental", "Hotel", "Lunch with team", "Gym membership")
+_NOTE_LINES = (
+    "Met with {name} to discuss the {topic} plan",
+    "TODO: review {topic} expenses #finance",
+    "ACTION: set a monthly {topic} budget cap #budget",
+    "Lunch discussion about #tax and #{topic}",
+    "FOLLOW UP: compare {topic} spending with last quarter",
+    "Random thought about {topic}",
+)
+_INVALID = (
+    lambda r: {**r, "date": r["date"].replace("-", "/")},
+    lambda r: {**r, "amount": "abc"},
+    lambda r: {**r, "amount": "250000.00"},
+    lambda r: {**r, "category": ""},
+)
+
+
+def generate_expenses(
+    path: Path, rows: int, categories: int = 12, invalid_rate: float = 0.02, seed: int = 0
+) -> Path:
+    """Write a synthetic expenses.csv with rows data rows (streamed, any size).
+
+    Dates advance about one day per 50 rows from 2020-01-01, amounts are
+    log-normal with a few large outliers, and invalid_rate of the rows are
+    broken in one of the ways validate_row rejects.
+    """
+    rnd = random.Random(seed)
+    cats = [f"Category{i:03d}" for i in range(categories)]
+    start = date(2020, 1, 1)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["date", "amount", "category", "description"])
+        for i in range(rows):
+            amount = rnd.lognormvariate(3.0, 1.0) * (20 if rnd.random() < 0.001 else 1)
+            row = {
+                "date": (start + timedelta(days=i // 50)).isoformat(),
+                "amount": f"{min(amount, 99999):.2f}",
+                "category": cats[min(int(rnd.paretovariate(1.2)) - 1, categories - 1)],
+                "description": rnd.choice(_DESCRIPTIONS),
+            }
+            if rnd.random() < invalid_rate:
+                row = rnd.choice(_INVALID)(row)
+            writer.writerow(row.values())
+    return Path(path)
+
+
+def generate_notes(path: Path, lines: int, seed: int = 0) -> Path:
+    """Write a synthetic notes.txt mixing action items, hashtags and plain lines."""
+    rnd = random.Random(seed)
+    topics = ("travel", "food", "health", "rent", "q1", "q2", "savings")
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(lines):
+            f.write(rnd.choice(_NOTE_LINES).format(name=rnd.choice(("Alex", "Sam", "Kim")), topic=rnd.choice(topics)))
+            f.write("\n")
+    return Path(path)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(fn: Callable[[], Any], rows: int, repeat: int = 1, memory: bool = True) -> Dict[str, Any]:
+    """Best-of-repeat wall time for fn, then one tracemalloc run for allocations.
+
+    Timing runs are untraced, since tracemalloc slows allocation-heavy code
+    several times over. peak_rss_mb is the process high-water mark after the
+    stage (it never goes down, so compare it stage by stage across commits).
+    """
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    out: Dict[str, Any] = {
+        "rows": rows,
+        "seconds": round(best, 6),
+        "rows_per_sec": round(rows / best) if best > 0 else None,
+    }
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        out["alloc_peak_mb"] = round(peak / 1e6, 2)
+        out["alloc_retained_mb"] = round(current / 1e6, 2)
+    out["peak_rss_mb"] = _peak_rss_mb()
+    return out
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        res = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=Path(__file__).resolve().parent,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return res.stdout.strip() or None
+
+
+def run_bench(
+    rows: int = 100_000,
+    categories: int = 12,
+    invalid_rate: float = 0.02,
+    notes_lines: Optional[int] = None,
+    seed: int = 0,
+    repeat: int = 1,
+    memory: bool = True,
+    workdir: Optional[str] = None,
+    stages: Optional[List[str]] = None,
+) -> dict:
+    """Generate synthetic inputs and time each pipeline stage on them.
+
+    Returns a JSON-ready result: run parameters, environment and per-stage
+    rows, seconds, rows_per_sec, allocations and peak RSS.
+    """
+    from .analyze import analyze_expenses, run_analyze
+    from .ingest import ingest_csv, ingest_notes
+    from .report import generate_report
+    from .summary_io import find_summary
+    from .validate import validate_row
+
+    notes_lines = rows // 10 if notes_lines is None else notes_lines
+    selected = list(stages or STAGES)
+    unknown = [s for s in selected if s not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown bench stage(s): {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        tmp_p = Path(tmp)
+        t0 = time.perf_counter()
+        csv_path = generate_expenses(tmp_p / "expenses.csv", rows, categories, invalid_rate, seed)
+        notes_path = generate_notes(tmp_p / "notes.txt", notes_lines, seed)
+        logging.info("Bench inputs generated in %.1fs (rows=%s notes=%s)", time.perf_counter() - t0, rows, notes_lines)
+        out_dir = str(tmp_p / "processed")
+
+        sample: List[dict] = []
+        if "validate_row" in selected:
+            with open(csv_path, newline="", encoding="utf-8") as f:
+                for i, r in enumerate(csv.DictReader(f)):
+                    if i >= VALIDATE_SAMPLE:
+                        break
+                    sample.append(r)
+
+        def validate_all() -> None:
+            for r in sample:
+                validate_row(r)
+
+        # later stages read the artifacts of earlier ones, so ingest always
+        # runs once even when it is not being measured
+        runners: Dict[str, Any] = {
+            "validate_row": (validate_all, len(sample)),
+            "ingest_csv": (lambda: ingest_csv(str(csv_path), out_dir), rows),
+            "ingest_notes": (lambda: ingest_notes(str(notes_path), out_dir), notes_lines),
+            "analyze_expenses": (lambda: analyze_expenses(str(Path(out_dir) / "cleaned_expenses.csv")), rows),
+            # force: otherwise repeats (and the tracemalloc pass) find report.md current and skip rendering
+            "generate_report": (
+                lambda: generate_report(str(find_summary(out_dir)), str(tmp_p / "report.md"), force=True), 1
+            ),
+        }
+        results: Dict[str, Any] = {}
+        for name in STAGES:
+            fn, n = runners[name]
+            if name in selected:
+                results[name] = measure(fn, n, repeat=repeat, memory=memory)
+                logging.info("Bench %s: %s", name, results[name])
+            elif name in ("ingest_csv", "ingest_notes"):
+                fn()
+            if name == "analyze_expenses" and "generate_report" in selected:
+                run_analyze(out_dir)
+
+    return {
+        "version": BENCH_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "rows": rows,
+            "categories": categories,
+            "invalid_rate": invalid_rate,
+            "notes_lines": notes_lines,
+            "seed": seed,
+            "repeat": repeat,
+        },
+        "stages": results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = 0.10) -> List[dict]:
+    """Per-stage throughput change vs baseline; regression if slower by more than threshold."""
+    out = []
+    for name, cur in current.get("stages", {}).items():
+        base = baseline.get("stages", {}).get(name)
+        if not base or not base.get("rows_per_sec") or not cur.get("rows_per_sec"):
+            continue
+        change = cur["rows_per_sec"] / base["rows_per_sec"] - 1
+        out.append({
+            "stage": name,
+            "baseline_rows_per_sec": base["rows_per_sec"],
+            "rows_per_sec": cur["rows_per_sec"],
+            "change": round(change, 4),
+            "regression": change < -threshold,
+        })
+    return out
+
+
+def format_results(result: dict) -> str:
+    lines = [f"{'stage':<18} {'rows':>10} {'seconds':>10} {'rows/sec':>12} {'alloc MB':>9} {'RSS MB':>8}"]
+    for name, r in result["stages"].items():
+        lines.append(
+            f"{name:<18} {r['rows']:>10} {r['seconds']:>10.3f} {r['rows_per_sec'] or 0:>12} "
+            f"{r.get('alloc_peak_mb', ''):>9} {r['peak_rss_mb'] if r['peak_rss_mb'] is not None else '':>8}"
+        )
+    return "\n".join(lines)
+
+
+def run_bench_command(
+    out_path: Optional[str] = None,
+    baseline_path: Optional[str] = None,
+    threshold: float = 0.10,
+    **options: Any,
+) -> int:
+    """Entry point for the bench command; returns 1 if a stage regressed vs baseline_path."""
+    result = run_bench(**options)
+    print(format_results(result))
+    if out_path:
+        Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(out_path).write_text(json.dumps(result, indent=2), encoding="utf-8")
+        logging.info("Bench results written to %s", out_path)
+    if not baseline_path:
+        return 0
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    if baseline.get("params") != result["params"]:
+        logging.warning("Baseline was run with different parameters: %s", baseline.get("params"))
+    regressed = False
+    for c in compare_results(baseline, result, threshold):
+        flag = "  REGRESSION" if c["regression"] else ""
+        print(f"{c['stage']:<18} {c['baseline_rows_per_sec']:>12} -> {c['rows_per_sec']:>12} ({c['change']:+.1%}){flag}")
+        regressed = regressed or c["regression"]
+    return 1 if regressed else 0
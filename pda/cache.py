@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .utils import atomic_write_text, ensure_dir
+
+ENTRY_VERSION = 1
+DEFAULT_MAX_MEMORY_ENTRIES = 1024
+DEFAULT_MAX_DISK_BYTES = 64 * 1024 * 1024
+
+
+class Cache:
+    """Two-level key -> JSON payload cache: an in-process LRU over a directory of files.
+
+    Disk entries are `<key>.json` holding {"v", "stored_at", "payload"} as
+    compact JSON, written via temp file + rename so a crash never leaves a
+    truncated entry. Entries older than ttl_seconds (or the ttl_seconds
+    passed to get()) are treated as misses.
+    Files written by the old cache (a bare payload) are still read, with
+    their mtime as the store time. When the directory grows past
+    max_disk_bytes, least recently used files (by mtime, refreshed on each
+    disk hit) are removed. Payloads returned from get() are shared with the
+    memory layer and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl_seconds: Optional[float] = None,
+        max_memory_entries: int = DEFAULT_MAX_MEMORY_ENTRIES,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+    ) -> None:
+        self.dir = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._mem: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._disk: Optional[Dict[str, Tuple[int, float]]] = None  # name -> (size, mtime), loaded lazily
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "writes": 0,
+        }
+
+    def _path(self, key: str) -> Path:
+        return self.dir / f"{key}.json"
+
+    def _fresh(self, stored_at: float, now: float, ttl_seconds: Optional[float]) -> bool:
+        return ttl_seconds is None or now - stored_at <= ttl_seconds
+
+    def _remember(self, key: str, stored_at: float, payload: Any) -> None:
+        self._mem[key] = (stored_at, payload)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_memory_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str, ttl_seconds: Optional[float] = None) -> Optional[Any]:
+        """Cached payload for key, or None if missing, unreadable or expired.
+
+        ttl_seconds applies to this lookup only (the cache's own TTL if None),
+        so callers sharing one instance can each keep their own expiry.
+        """
+        now = time.time()
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                if self._fresh(hit[0], now, ttl_seconds):
+                    self._mem.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return hit[1]
+                del self._mem[key]
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            p = self._path(key)
+            try:
+                st = p.stat()
+                data = json.loads(p.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.counters["misses"] += 1
+                return None
+            if isinstance(data, dict) and data.get("v") == ENTRY_VERSION and "payload" in data:
+                stored_at, payload = float(data.get("stored_at", st.st_mtime)), data["payload"]
+            else:
+                stored_at, payload = st.st_mtime, data
+            if not self._fresh(stored_at, now, ttl_seconds):
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            try:
+                os.utime(p)
+            except OSError:
+                pass
+            if self._disk is not None and p.name in self._disk:
+                self._disk[p.name] = (self._disk[p.name][0], now)
+            self._remember(key, stored_at, payload)
+            self.counters["disk_hits"] += 1
+            return payload
+
+    def set(self, key: str, payload: Any) -> Path:
+        """Store payload under key in memory and on disk; returns the entry path."""
+        now = time.time()
+        text = json.dumps(
+            {"v": ENTRY_VERSION, "stored_at": now, "payload": payload},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        with self._lock:
+            ensure_dir(str(self.dir))
+            p = atomic_write_text(self._path(key), text)
+            self._remember(key, now, payload)
+            self.counters["writes"] += 1
+            self._track(p.name, len(text.encode("utf-8")), now)
+        return p
+
+    def _track(self, name: str, size: int, mtime: float) -> None:
+        if self._disk is None:
+            self._disk = {}
+            for f in self.dir.glob("*.json"):
+                try:
+                    st = f.stat()
+                except OSError:
+                    continue
+                self._disk[f.name] = (st.st_size, st.st_mtime)
+            self._disk_bytes = sum(s for s, _ in self._disk.values())
+        else:
+            old = self._disk.get(name)
+            self._disk_bytes += size - (old[0] if old else 0)
+            self._disk[name] = (size, mtime)
+        if self._disk_bytes > self.max_disk_bytes:
+            self._evict(keep=name)
+
+    def _evict(self, keep: str) -> None:
+        for name, (size, _) in sorted(self._disk.items(), key=lambda kv: kv[1][1]):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                (self.dir / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError:
+                continue
+            del self._disk[name]
+            self._disk_bytes -= size
+            self._mem.pop(name[: -len(".json")], None)
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+_caches: Dict[str, Cache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(cache_dir: str) -> Cache:
+    """Process-wide Cache for cache_dir, so every caller shares one memory layer.
+
+    The shared instance has no TTL of its own; callers with an expiry (e.g.
+    a profile's cache_ttl_hours) pass it to each get().
+    """
+    key = str(Path(cache_dir).resolve())
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = Cache(cache_dir)
+    return cache
+
+
+def ttl_from_profile(profile: dict) -> Optional[float]:
+    """Cache TTL in seconds from profile["api_preferences"]["cache_ttl_hours"], if set."""
+    prefs = profile.get("api_preferences")
+    hours = prefs.get("cache_ttl_hours") if isinstance(prefs, dict) else None
+    if isinstance(hours, bool) or not isinstance(hours, (int, float)) or hours < 0:
+        return None
+    return float(hours) * 3600.0
+
+
+def log_stats(cache: Cache, before: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """Log counters accumulated since before (or since creation); returns them."""
+    now = cache.stats()
+    delta = {k: v - (before or {}).get(k, 0) for k, v in now.items()}
+    logging.info(
+        "Cache stats: memory_hits=%s disk_hits=%s misses=%s expired=%s evictions=%s writes=%s",
+        delta["memory_hits"], delta["disk_hits"], delta["misses"],
+        delta["expired"], delta["evictions"], delta["writes"],
+    )
+    return delta
@@ -2,70 +2,409 @@ from __future__ import annotations
 
 import argparse
 import logging
+import time
+from datetime import date, datetime, timezone
 from pathlib import Path
 
-from .utils import setup_logger
-from .ingest import run_ingest
-from .analyze import run_analyze
-from .enrich import run_enrich
-from .report import generate_report
+from .utils import incr, setup_logger, write_prometheus, write_run_record
+
+# Command modules are imported inside main() so short commands (e.g. analyze
+# from cron) do not pay for ingest/enrich/HTTP imports they never use.
+
+
+API_HELP = "Which tool/API to use (builtin: exchangerate, fx_convert; plus 'pda.enrichers' entry points)"
+
+
+PRETTY_HELP = "Indent the summary JSON (default: compact)"
+FORMAT_HELP = "Summary encoding: json (default) or msgpack (needs the msgpack package)"
+
+
+STORE_HELP = "Processed data store: files (CSV/JSON artifacts, default) or sqlite (output_dir/pda.sqlite)"
+
+
+DEDUP_HELP = "Add to the rows kept so far, dropping transactions already ingested (same date, amount, category, description); see duplicate_rows.csv"
+
+
+ANOMALY_HELP = "Anomaly rule: global (default), zscore, rolling_zscore, median_mad, quantile; overrides profile anomaly_rule"
 
 
 def build_parser() -> argparse.ArgumentParser:
-    parser = argparse.ArgumentParser(prog="pda", description="Personal Data Assistant (PDA)")
+    parser = argparse.ArgumentParser(prog="pda", description="Personal Data Assistant (PDA)", allow_abbrev=False)
     parser.add_argument("--log-file", default="logs/app.log", help="Log file path")
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
+    parser.add_argument("--metrics-file", default="logs/metrics.jsonl", help="Append a JSON run record here ('' to disable)")
+    parser.add_argument("--metrics-prom", default=None, help="Also write Prometheus text format here (e.g. for node-exporter)")
+    parser.add_argument("--profile-cpu", action="store_true", help="cProfile each stage (.pstats files) and print hot functions")
+    parser.add_argument("--profile-mem", action="store_true", help="tracemalloc each stage (top allocation sites per stage)")
+    parser.add_argument("--profile-dir", default="profiles", help="Where --profile-cpu/--profile-mem write their files")
 
     sub = parser.add_subparsers(dest="command", required=True)
 
     p_ingest = sub.add_parser("ingest", help="Ingest raw inputs and write processed artifacts")
     p_ingest.add_argument("--csv", required=True, help="Path to expenses.csv")
-    p_ingest.add_argument("--notes", required=True, help="Path to notes.txt")
+    p_ingest.add_argument("--notes", required=True, help="Path to notes.txt, a directory of note files, or a glob")
     p_ingest.add_argument("--profile", default=None, help="Optional profile.json")
     p_ingest.add_argument("--out", default="data/processed", help="Output directory for processed artifacts")
+    p_ingest.add_argument("--workers", type=int, default=1, help="Worker processes for CSV validation and note files")
+    p_ingest.add_argument("--incremental", action="store_true", help="Only ingest data appended since the last run")
+    p_ingest.add_argument("--dedup", action="store_true", help=DEDUP_HELP)
+    p_ingest.add_argument("--store", default="files", choices=["files", "sqlite"], help=STORE_HELP)
 
     p_analyze = sub.add_parser("analyze", help="Analyze processed artifacts and write summary.json")
     p_analyze.add_argument("--input", required=True, help="Processed artifacts directory (data/processed)")
+    p_analyze.add_argument("--profile", default=None, help="Optional profile.json (anomaly_rule)")
+    p_analyze.add_argument("--anomaly", default=None, help=ANOMALY_HELP)
+    p_analyze.add_argument("--pretty", action="store_true", help=PRETTY_HELP)
+    p_analyze.add_argument("--summary-format", default="json", choices=["json", "msgpack"], help=FORMAT_HELP)
+    p_analyze.add_argument("--store", default="files", choices=["files", "sqlite"], help=STORE_HELP)
 
     p_enrich = sub.add_parser("enrich", help="Enrich summary using an API tool (with caching)")
     p_enrich.add_argument("--input", required=True, help="Processed artifacts directory (data/processed)")
-    p_enrich.add_argument("--api", required=True, choices=["exchangerate"], help="Which tool/API to use")
+    p_enrich.add_argument("--api", required=True, help=API_HELP)
     p_enrich.add_argument("--cache", default="cache", help="Cache directory")
+    p_enrich.add_argument("--profile", default=None, help="Optional profile.json (api_preferences.cache_ttl_hours)")
+
+    p_query = sub.add_parser("query", help="Query cleaned expenses: matching rows, or per-period totals with --by")
+    p_query.add_argument("--input", default="data/processed", help="Processed artifacts directory (data/processed)")
+    p_query.add_argument("--from", dest="start", type=_iso_date, default=None, help="First date (YYYY-MM-DD), inclusive")
+    p_query.add_argument("--to", dest="end", type=_iso_date, default=None, help="Last date (YYYY-MM-DD), inclusive")
+    p_query.add_argument("--by", default=None, choices=["day", "week", "month"], help="Per-period totals from the rollups")
+    p_query.add_argument("--category", default=None, help="Only this category")
+    p_query.add_argument("--min-amount", type=float, default=None, help="Rows with amount >= this")
+    p_query.add_argument("--max-amount", type=float, default=None, help="Rows with amount <= this")
+    p_query.add_argument("--top", type=int, default=None, help="The K largest matching rows")
+    p_query.add_argument("--limit", type=int, default=None, help="At most this many rows (in date order)")
+    p_query.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    p_query.add_argument("--store", default="files", choices=["files", "sqlite"], help=STORE_HELP)
+
+    p_bench = sub.add_parser("bench", help="Time each pipeline stage on synthetic data")
+    p_bench.add_argument("--rows", type=int, default=100_000, help="Synthetic expense rows (e.g. 1000 to 10000000)")
+    p_bench.add_argument("--categories", type=int, default=12, help="Distinct categories")
+    p_bench.add_argument("--invalid-rate", type=float, default=0.02, help="Fraction of rows that fail validation")
+    p_bench.add_argument("--notes-lines", type=int, default=None, help="Synthetic note lines (default: rows/10)")
+    p_bench.add_argument("--seed", type=int, default=0)
+    p_bench.add_argument("--repeat", type=int, default=1, help="Timed runs per stage (best is reported)")
+    p_bench.add_argument("--stage", action="append", default=None, help="Only this stage (repeatable)")
+    p_bench.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc allocation run")
+    p_bench.add_argument("--workdir", default=None, help="Where to generate the data (default: system temp)")
+    p_bench.add_argument("--out", default=None, help="Write JSON results here")
+    p_bench.add_argument("--compare", default=None, help="Baseline results JSON; exit 1 on a regression")
+    p_bench.add_argument("--threshold", type=float, default=0.10, help="Allowed rows/sec drop vs baseline")
+
+    p_report = sub.add_parser("report", help="Render the report from summary.json (Markdown, HTML, CSV)")
+    p_report.add_argument("--input", default="data/processed", help="Processed artifacts directory (data/processed)")
+    p_report.add_argument("--out", default="reports/report.md", help="Report path; its suffix picks the main format")
+    _add_report_options(p_report, prefix="")
+    p_report.add_argument("--force", action="store_true", help="Regenerate even if the summary is unchanged")
 
     p_run = sub.add_parser("run", help="Run ingest → analyze → (optional enrich) → report")
     p_run.add_argument("--csv", required=True)
-    p_run.add_argument("--notes", required=True)
+    p_run.add_argument("--notes", required=True, help="Path to notes.txt, a directory of note files, or a glob")
     p_run.add_argument("--profile", default=None)
     p_run.add_argument("--out", default="data/processed")
     p_run.add_argument("--report", default="reports/report.md")
-    p_run.add_argument("--api", default=None, choices=[None, "exchangerate"], help="Optional enrichment tool")
+    p_run.add_argument("--api", default=None, help="Optional enrichment tool; " + API_HELP)
     p_run.add_argument("--cache", default="cache")
+    p_run.add_argument("--workers", type=int, default=1, help="Worker processes for CSV validation and note files")
+    p_run.add_argument("--incremental", action="store_true", help="Only process data appended since the last run")
+    p_run.add_argument("--dedup", action="store_true", help=DEDUP_HELP)
+    p_run.add_argument("--anomaly", default=None, help=ANOMALY_HELP)
+    p_run.add_argument("--streaming", action="store_true", help="Single-pass ingest+analyze in bounded memory")
+    p_run.add_argument("--pretty", action="store_true", help=PRETTY_HELP)
+    p_run.add_argument("--summary-format", default="json", choices=["json", "msgpack"], help=FORMAT_HELP)
+    _add_report_options(p_run, prefix="report-")
+    p_run.add_argument("--store", default="files", choices=["files", "sqlite"], help=STORE_HELP)
+    p_run.add_argument("--explain", action="store_true", help="Print which stages were cached or recomputed, with wall time")
+
+    p_batch = sub.add_parser("batch", help="Run the pipeline for every tenant in a users.jsonl manifest")
+    p_batch.add_argument("--manifest", required=True, help='JSONL, one {"id", "csv", "notes", "profile"?, "api"?} per line')
+    p_batch.add_argument("--out-root", default="batch", help="Each tenant writes under <out-root>/<id>/")
+    p_batch.add_argument("--cache", default="cache", help="Enrichment cache shared by all tenants")
+    p_batch.add_argument("--jobs", type=int, default=4, help="Tenants processed concurrently")
+    p_batch.add_argument("--mode", default="thread", choices=["thread", "process"],
+                         help="thread: one process, shared in-memory cache and HTTP pool; process: CPU-bound batches")
+    p_batch.add_argument("--api", default=None, help="Enrichment tool for tenants without their own 'api'; " + API_HELP)
+    p_batch.add_argument("--anomaly", default=None, help=ANOMALY_HELP)
+    p_batch.add_argument("--dedup", action="store_true", help=DEDUP_HELP)
+    p_batch.add_argument("--pretty", action="store_true", help=PRETTY_HELP)
+    p_batch.add_argument("--summary-format", default="json", choices=["json", "msgpack"], help=FORMAT_HELP)
+    _add_report_options(p_batch, prefix="report-")
+
+    p_watch = sub.add_parser("watch", help="Keep state in memory and refresh summary/report when the inputs change")
+    _add_watch_args(p_watch)
+
+    p_serve = sub.add_parser("serve", help="watch, plus a local HTTP endpoint for the current summary and queries")
+    _add_watch_args(p_serve)
+    p_serve.add_argument("--host", default="127.0.0.1", help="Address to bind (default: localhost only)")
+    p_serve.add_argument("--port", type=int, default=8765, help="HTTP port")
 
     return parser
 
 
+def _add_watch_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--csv", required=True)
+    p.add_argument("--notes", required=True, help="Path to notes.txt, a directory of note files, or a glob")
+    p.add_argument("--profile", default=None)
+    p.add_argument("--out", default="data/processed")
+    p.add_argument("--report", default="reports/report.md")
+    p.add_argument("--api", default=None, help="Optional enrichment tool; " + API_HELP)
+    p.add_argument("--cache", default="cache")
+    p.add_argument("--workers", type=int, default=1, help="Worker processes for CSV validation and note files")
+    p.add_argument("--dedup", action="store_true", help=DEDUP_HELP)
+    p.add_argument("--anomaly", default=None, help=ANOMALY_HELP)
+    p.add_argument("--pretty", action="store_true", help=PRETTY_HELP)
+    p.add_argument("--summary-format", default="json", choices=["json", "msgpack"], help=FORMAT_HELP)
+    _add_report_options(p, prefix="report-")
+    p.add_argument("--interval", type=float, default=1.0, help="Seconds between checks of the inputs")
+
+
+def _add_report_options(p: argparse.ArgumentParser, prefix: str) -> None:
+    p.add_argument(f"--{prefix}format", dest="report_formats", action="append", choices=["md", "html", "csv"],
+                   default=None, help="Also write this format next to the report (repeatable)")
+    p.add_argument(f"--{prefix}max-rows", dest="report_max_rows", type=int, default=100,
+                   help="Rows shown per section in Markdown/HTML (0: no cap)")
+    p.add_argument(f"--{prefix}paginate", dest="report_paginate", action="store_true",
+                   help="Write rows beyond the cap to linked page files instead of dropping them")
+
+
+def _report_options(args: argparse.Namespace) -> dict:
+    return {
+        "formats": args.report_formats,
+        "max_rows": args.report_max_rows or None,
+        "paginate": args.report_paginate,
+    }
+
+
+def _iso_date(value: str) -> str:
+    """argparse type for --from/--to: a valid calendar date, normalized to YYYY-MM-DD."""
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a date as YYYY-MM-DD, got {value!r}") from None
+
+
+def _anomaly_config(args: argparse.Namespace):
+    """--anomaly if given, else the profile's "anomaly_rule" (None: default rule)."""
+    if args.anomaly:
+        return args.anomaly
+    if not getattr(args, "profile", None):
+        return None
+    from .ingest import load_profile
+
+    return load_profile(args.profile).get("anomaly_rule")
+
+
 def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
 
+    if getattr(args, "api", None):
+        from .enrichers import available_enrichers
+
+        if args.api not in available_enrichers():
+            parser.error(f"unknown --api {args.api!r}; choose from: {', '.join(available_enrichers())}")
+
+    if hasattr(args, "anomaly"):
+        from .anomaly import anomaly_rule_from
+
+        config = _anomaly_config(args)
+        try:
+            anomaly_rule_from(config)
+        except (TypeError, ValueError) as e:
+            source = "--anomaly" if args.anomaly else f"anomaly_rule in {args.profile}"
+            parser.error(f"invalid {source}: {e}")
+
+    if getattr(args, "explain", False) and (args.incremental or args.streaming):
+        parser.error("--explain applies to the default run mode, not --incremental/--streaming")
+    if getattr(args, "store", "files") == "sqlite":
+        if getattr(args, "streaming", False) or getattr(args, "explain", False):
+            parser.error("--store sqlite cannot be combined with --streaming/--explain")
+        if getattr(args, "workers", 1) > 1:
+            parser.error("--workers applies to --store files only")
+        if getattr(args, "dedup", False):
+            parser.error("--dedup applies to --store files only")
+        if getattr(args, "pretty", False) or getattr(args, "summary_format", "json") != "json":
+            parser.error("--pretty/--summary-format apply to --store files only (the summary is stored in pda.sqlite)")
+
     level = logging.DEBUG if args.debug else logging.INFO
     setup_logger(args.log_file, level=level)
 
-    if args.command == "ingest":
-        run_ingest(args.csv, args.notes, args.profile, args.out)
+    profiler = None
+    if args.profile_cpu or args.profile_mem:
+        from .profiling import StageProfiler
+
+        profiler = StageProfiler(args.profile_dir, cpu=args.profile_cpu, mem=args.profile_mem).start()
+
+    started = datetime.now(timezone.utc)
+    t0 = time.perf_counter()
+    status = "error"
+    try:
+        _run_command(args)
+        status = "ok"
+    except SystemExit as e:
+        status = "ok" if not e.code else "error"
+        raise
+    finally:
+        _write_metrics(args, started, time.perf_counter() - t0, status)
+        if profiler is not None:
+            profiler.stop()
+            if profiler.cpu:
+                print(profiler.summary())
+            logging.info("Profiles written to %s", profiler.directory)
+
+
+def _write_metrics(args: argparse.Namespace, started: datetime, seconds: float, status: str) -> None:
+    """Emit the run record (and Prometheus file); never fails the command itself."""
+    record = {
+        "command": args.command,
+        "started": started.isoformat(timespec="seconds"),
+        "wall_seconds": round(seconds, 6),
+        "status": status,
+    }
+    incr("pda_runs_total", command=args.command, status=status)
+    try:
+        if args.metrics_file:
+            write_run_record(args.metrics_file, record)
+        if args.metrics_prom:
+            write_prometheus(args.metrics_prom)
+    except OSError as e:
+        logging.warning("Could not write metrics: %s", e)
+
+
+def _run_command(args: argparse.Namespace) -> None:
+    if args.command == "ingest" and args.store == "sqlite":
+        from .sqlstore import run_ingest_sqlite
+
+        run_ingest_sqlite(args.csv, args.notes, args.profile, args.out, incremental=args.incremental)
+
+    elif args.command == "ingest":
+        from .ingest import run_ingest
+
+        run_ingest(
+            args.csv, args.notes, args.profile, args.out, workers=args.workers, incremental=args.incremental,
+            dedup=args.dedup,
+        )
+
+    elif args.command == "analyze" and args.store == "sqlite":
+        from .sqlstore import run_analyze_sqlite
+
+        run_analyze_sqlite(args.input, anomaly=_anomaly_config(args))
 
     elif args.command == "analyze":
-        run_analyze(args.input)
+        from .analyze import run_analyze
+
+        run_analyze(args.input, anomaly=_anomaly_config(args), pretty=args.pretty, fmt=args.summary_format)
 
     elif args.command == "enrich":
-        run_enrich(args.input, args.api, args.cache)
+        from .enrich import run_enrich
+
+        run_enrich(args.input, args.api, args.cache, profile_path=args.profile)
+
+    elif args.command == "query":
+        from .query import run_query, run_row_query
+
+        try:
+            if args.by:
+                run_query(
+                    args.input, args.start, args.end, by=args.by, category=args.category, as_json=args.json,
+                    store=args.store,
+                )
+            else:
+                run_row_query(
+                    args.input, as_json=args.json, store=args.store, start=args.start, end=args.end,
+                    category=args.category, min_amount=args.min_amount, max_amount=args.max_amount, top=args.top,
+                    limit=args.limit,
+                )
+        except FileNotFoundError as e:
+            raise SystemExit(f"pda query: error: {e}")
+
+    elif args.command == "bench":
+        from .bench import run_bench_command
+
+        code = run_bench_command(
+            out_path=args.out, baseline_path=args.compare, threshold=args.threshold, rows=args.rows,
+            categories=args.categories, invalid_rate=args.invalid_rate, notes_lines=args.notes_lines, seed=args.seed,
+            repeat=args.repeat, memory=not args.no_memory, workdir=args.workdir, stages=args.stage,
+        )
+        if code:
+            raise SystemExit(code)
+
+    elif args.command == "report":
+        from .report import generate_report
+        from .summary_io import find_summary
+
+        generate_report(str(find_summary(args.input)), args.out, force=args.force, **_report_options(args))
+
+    elif args.command == "batch":
+        from .batch import run_batch_command
+
+        code = run_batch_command(
+            args.manifest, out_root=args.out_root, cache_dir=args.cache, jobs=args.jobs, mode=args.mode, api=args.api,
+            anomaly=args.anomaly, pretty=args.pretty, fmt=args.summary_format, report_options=_report_options(args),
+            dedup=args.dedup,
+        )
+        if code:
+            raise SystemExit(code)
+
+    elif args.command in ("watch", "serve"):
+        from .watch import run_watch
+
+        run_watch(
+            args.csv, args.notes, args.profile, args.out, args.report, interval=args.interval,
+            host=getattr(args, "host", "127.0.0.1"), port=getattr(args, "port", None), api=args.api,
+            cache_dir=args.cache, workers=args.workers, anomaly=_anomaly_config(args), pretty=args.pretty,
+            fmt=args.summary_format, report_options=_report_options(args), dedup=args.dedup,
+        )
 
     elif args.command == "run":
-        run_ingest(args.csv, args.notes, args.profile, args.out)
-        summary_path = run_analyze(args.out)
+        from .analyze import run_analyze
+        from .ingest import run_ingest
+        from .report import generate_report
+
+        encoding = {"pretty": args.pretty, "fmt": args.summary_format}
+        if args.store == "sqlite":
+            from .sqlstore import run_analyze_sqlite, run_ingest_sqlite
+            from .summary_io import find_summary
+
+            manifest = run_ingest_sqlite(args.csv, args.notes, args.profile, args.out, incremental=args.incremental)
+            if not manifest["changed"] and find_summary(args.out).exists() and Path(args.report).exists():
+                logging.info("Inputs unchanged; skipping analyze/enrich/report")
+                return
+            summary_path = run_analyze_sqlite(args.out, anomaly=_anomaly_config(args))
+        elif args.incremental:
+            from .summary_io import find_summary
+
+            manifest = run_ingest(
+                args.csv, args.notes, args.profile, args.out, workers=args.workers, incremental=True, dedup=args.dedup
+            )
+            if not manifest["changed"] and find_summary(args.out).exists() and Path(args.report).exists():
+                logging.info("Inputs unchanged; skipping analyze/enrich/report")
+                return
+            summary_path = run_analyze(args.out, incremental=True, anomaly=_anomaly_config(args), **encoding)
+        elif args.streaming:
+            from .pipeline import run_streaming
+
+            summary_path = run_streaming(
+                args.csv, args.notes, args.profile, args.out, workers=args.workers, anomaly=_anomaly_config(args),
+                dedup=args.dedup, **encoding,
+            )
+        else:
+            from .dag import format_explain
+            from .pipeline import run_pipeline
+
+            results = run_pipeline(
+                args.csv, args.notes, args.profile, args.out, args.report, api=args.api, cache_dir=args.cache,
+                workers=args.workers, anomaly=_anomaly_config(args), report_options=_report_options(args),
+                dedup=args.dedup, **encoding,
+            )
+            if args.explain:
+                print(format_explain(results))
+            return
         if args.api:
-            run_enrich(args.out, args.api, args.cache)
-        generate_report(str(summary_path), args.report)
+            from .enrich import run_enrich
+
+            run_enrich(args.out, args.api, args.cache, profile_path=args.profile)
+        generate_report(str(summary_path), args.report, **_report_options(args))
 
     else:
         raise ValueError(f"Unknown command: {args.command}")
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+STORE_NAME = "cleaned_expenses.cols"
+STORE_VERSION = 1
+
+# column file -> array typecode
+COLUMNS = {
+    "amount.f64": "d",
+    "date.i32": "i",
+    "category.i32": "i",
+    "description.off": "q",
+}
+_FLUSH_ROWS = 65536
+
+
+def store_path_for(cleaned_csv_path: str) -> Path:
+    """Columnar store that sits next to a cleaned_expenses.csv."""
+    return Path(cleaned_csv_path).with_name(STORE_NAME)
+
+
+class ColumnarWriter:
+    """Append cleaned rows to a column-per-file store.
+
+    Layout (native byte order, recorded in meta.json):
+      amount.f64       float64 amounts
+      date.i32         int32 proleptic Gregorian day ordinals
+      category.i32     int32 codes into categories.json
+      description.off  int64 end offset of each description in description.blob
+      description.blob UTF-8 descriptions, concatenated
+    meta.json is written last by close(), so a store without it (crash, or a
+    date that is not a real calendar day) is treated as absent by readers.
+    """
+
+    def __init__(self, path: Path, append: bool = False) -> None:
+        self.path = Path(path)
+        self.valid = True
+        self.rows = 0
+        self._blob_end = 0
+        self._codes: Dict[str, int] = {}
+
+        meta = _read_meta(self.path) if append else None
+        if append and meta is None:
+            logging.info("Columnar store missing or stale; not appending")
+            self.valid = False
+            return
+
+        if meta is not None:
+            self.rows = meta["rows"]
+            self._blob_end = meta["blob_bytes"]
+            cats = json.loads((self.path / "categories.json").read_text(encoding="utf-8"))
+            self._codes = {c: i for i, c in enumerate(cats)}
+        else:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / "meta.json").unlink(missing_ok=True)
+
+        self._bufs = {name: array(code) for name, code in COLUMNS.items()}
+        self._blob = bytearray()
+
+    def add(self, row: Dict[str, Any]) -> None:
+        if not self.valid:
+            return
+        try:
+            ordinal = date.fromisoformat(row["date"]).toordinal()
+        except ValueError:
+            logging.info("Columnar store disabled: %r is not a calendar date", row["date"])
+            self.valid = False
+            return
+
+        cat = row["category"]
+        code = self._codes.get(cat)
+        if code is None:
+            code = self._codes[cat] = len(self._codes)
+        desc = (row.get("description") or "").encode("utf-8")
+        self._blob += desc
+        self._blob_end += len(desc)
+
+        self._bufs["amount.f64"].append(float(row["amount"]))
+        self._bufs["date.i32"].append(ordinal)
+        self._bufs["category.i32"].append(code)
+        self._bufs["description.off"].append(self._blob_end)
+        self.rows += 1
+        if len(self._bufs["amount.f64"]) >= _FLUSH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        for name, buf in self._bufs.items():
+            with open(self.path / name, "ab") as f:
+                buf.tofile(f)
+            del buf[:]
+        with open(self.path / "description.blob", "ab") as f:
+            f.write(self._blob)
+        self._blob.clear()
+
+    def close(self, cleaned_csv_path: Path) -> None:
+        """Flush and stamp the store as matching cleaned_csv_path's current contents."""
+        if not self.valid:
+            shutil.rmtree(self.path, ignore_errors=True)
+            return
+        self._flush()
+        (self.path / "categories.json").write_text(
+            json.dumps(list(self._codes), ensure_ascii=False), encoding="utf-8"
+        )
+        st = os.stat(cleaned_csv_path)
+        meta = {
+            "version": STORE_VERSION,
+            "byteorder": sys.byteorder,
+            "rows": self.rows,
+            "blob_bytes": self._blob_end,
+            "csv_size": st.st_size,
+            "csv_mtime_ns": st.st_mtime_ns,
+        }
+        (self.path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+
+def map_file(path: Path, typecode: Optional[str], maps: List[mmap.mmap], views: List[memoryview]) -> memoryview:
+    """Read-only memoryview over path (cast to typecode if given); records the mmap/view for closing."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            view = memoryview(array(typecode or "B"))
+        else:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            maps.append(mm)
+            view = memoryview(mm)
+            if typecode:
+                view = view.cast(typecode)
+    views.append(view)
+    return view
+
+
+def _read_meta(path: Path) -> Optional[dict]:
+    """meta.json if the store is complete and still matches its cleaned CSV."""
+    try:
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        st = os.stat(path.with_name("cleaned_expenses.csv"))
+    except (OSError, ValueError):
+        return None
+    if (
+        meta.get("version") != STORE_VERSION
+        or meta.get("byteorder") != sys.byteorder
+        or meta.get("csv_size") != st.st_size
+        or meta.get("csv_mtime_ns") != st.st_mtime_ns
+    ):
+        return None
+    return meta
+
+
+class ColumnarStore:
+    """Read-only, memory-mapped view of a ColumnarWriter store.
+
+    amounts/dates/category_codes/description_ends are memoryviews straight
+    over the mapped files, so scanning them allocates no per-row objects
+    beyond the numbers themselves.
+    """
+
+    def __init__(self, path: Path, meta: dict) -> None:
+        self.path = Path(path)
+        self.rows: int = meta["rows"]
+        self.categories: List[str] = json.loads((self.path / "categories.json").read_text(encoding="utf-8"))
+        self._maps: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+        self.amounts = self._map("amount.f64")
+        self.dates = self._map("date.i32")
+        self.category_codes = self._map("category.i32")
+        self.description_ends = self._map("description.off")
+        self.description_blob = self._map("description.blob", cast=None)
+
+    @classmethod
+    def open(cls, path: Path) -> Optional["ColumnarStore"]:
+        """Open the store at path, or return None if it is absent or stale."""
+        meta = _read_meta(Path(path))
+        if meta is None:
+            return None
+        return cls(path, meta)
+
+    def _map(self, name: str, cast: Optional[str] = "") -> memoryview:
+        typecode = COLUMNS.get(name) if cast == "" else cast
+        return map_file(self.path / name, typecode, self._maps, self._views)
+
+    def description(self, i: int) -> str:
+        start = self.description_ends[i - 1] if i else 0
+        return bytes(self.description_blob[start : self.description_ends[i]]).decode("utf-8")
+
+    def row(self, i: int) -> dict:
+        """Materialize row i in cleaned_expenses.csv's column order."""
+        return {
+            "date": date.fromordinal(self.dates[i]).isoformat(),
+            "amount": self.amounts[i],
+            "category": self.categories[self.category_codes[i]],
+            "description": self.description(i),
+        }
+
+    def iter_rows(self) -> Iterator[dict]:
+        for i in range(self.rows):
+            yield self.row(i)
+
+    def close(self) -> None:
+        for view in self._views:
+            view.release()
+        for mm in self._maps:
+            mm.close()
+        self._views = []
+        self._maps = []
+
+    def __enter__(self) -> "ColumnarStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
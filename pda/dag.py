@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .manifest import write_json_atomic
+
+STAGES_NAME = "stage_cache.json"
+STAGES_VERSION = 1
+
+_HASH_BLOCK = 1024 * 1024
+
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """sha256 over the package's own sources: any code change invalidates cached stages."""
+    h = hashlib.sha256()
+    for p in sorted(Path(__file__).parent.glob("*.py")):
+        h.update(p.name.encode("utf-8"))
+        h.update(p.read_bytes())
+    return h.hexdigest()
+
+
+def _files(path: Path) -> List[Path]:
+    if path.is_dir():
+        return sorted(p for p in path.rglob("*") if p.is_file())
+    return [path] if path.exists() else []
+
+
+def output_stamp(path: str) -> Optional[list]:
+    """(name, size, mtime_ns) of a file or of every file under a directory; None if missing."""
+    p = Path(path)
+    if not p.exists():
+        return None
+    out = []
+    for f in _files(p):
+        st = f.stat()
+        out.append([str(f.relative_to(p)) if f != p else "", st.st_size, st.st_mtime_ns])
+    return out
+
+
+class Stage:
+    """One pipeline step: fn(results) -> value, reading inputs and writing outputs.
+
+    results maps each finished stage's name to its return value. inputs and
+    outputs are file or directory paths; a stage is skipped when the hash of
+    its inputs' contents, params and the code version matches the last run
+    and its outputs are still the files that run wrote. A stage without
+    outputs (e.g. loading the profile) always runs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Dict[str, Any]], Any],
+        deps: Iterable[str] = (),
+        inputs: Iterable[Optional[str]] = (),
+        outputs: Iterable[str] = (),
+        params: Optional[dict] = None,
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.inputs = [str(p) for p in inputs if p]
+        self.outputs = [str(p) for p in outputs]
+        self.params = params or {}
+
+    @property
+    def cacheable(self) -> bool:
+        return bool(self.outputs)
+
+
+class StageResult:
+    def __init__(self, name: str, status: str, seconds: float, value: Any = None) -> None:
+        self.name = name
+        self.status = status  # "ran", "cached" or "failed"
+        self.seconds = seconds
+        self.value = value
+
+
+class StageCache:
+    """Stage keys, output stamps and input content hashes kept in stage_cache.json.
+
+    Content hashes are reused while an input's size and mtime are unchanged,
+    so a skipped stage costs a few stat() calls.
+    """
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = Path(path) if path else None
+        self.stages: Dict[str, dict] = {}
+        self.hashes: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        if self.path is not None:
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                data = {}
+            if data.get("version") == STAGES_VERSION:
+                self.stages = data.get("stages", {})
+                self.hashes = data.get("hashes", {})
+
+    def content_hash(self, path: str) -> Optional[str]:
+        p = Path(path)
+        if not p.exists():
+            return None
+        h = hashlib.sha256()
+        for f in _files(p):
+            st = f.stat()
+            key = str(f.resolve())
+            with self._lock:
+                known = self.hashes.get(key)
+            if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns:
+                digest = known["sha256"]
+            else:
+                fh = hashlib.sha256()
+                with open(f, "rb") as src:
+                    for block in iter(lambda: src.read(_HASH_BLOCK), b""):
+                        fh.update(block)
+                digest = fh.hexdigest()
+                with self._lock:
+                    self.hashes[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+            h.update(str(f.relative_to(p) if f != p else "").encode("utf-8"))
+            h.update(digest.encode("ascii"))
+        return h.hexdigest()
+
+    def key(self, stage: Stage) -> str:
+        payload = {
+            "stage": stage.name,
+            "code": code_version(),
+            "params": stage.params,
+            "inputs": {p: self.content_hash(p) for p in stage.inputs},
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def fresh(self, stage: Stage, key: str) -> bool:
+        entry = self.stages.get(stage.name)
+        if not entry or entry.get("key") != key:
+            return False
+        return all(entry["outputs"].get(p) == output_stamp(p) and output_stamp(p) is not None for p in stage.outputs)
+
+    def record(self, stage: Stage, key: str) -> None:
+        with self._lock:
+            self.stages[stage.name] = {"key": key, "outputs": {p: output_stamp(p) for p in stage.outputs}}
+
+    def forget(self, name: str) -> None:
+        with self._lock:
+            self.stages.pop(name, None)
+
+    def save(self) -> None:
+        if self.path is not None:
+            with self._lock:
+                payload = {"version": STAGES_VERSION, "stages": self.stages, "hashes": self.hashes}
+            write_json_atomic(self.path, payload)
+
+
+def _check_graph(stages: List[Stage]) -> None:
+    names = {s.name for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in names]
+        if missing:
+            raise ValueError(f"Stage {s.name} depends on unknown stage(s): {', '.join(missing)}")
+    seen: Dict[str, int] = {}
+
+    def visit(s: Stage, path: Tuple[str, ...]) -> None:
+        if seen.get(s.name) == 2:
+            return
+        if seen.get(s.name) == 1:
+            raise ValueError(f"Stage cycle: {' -> '.join(path + (s.name,))}")
+        seen[s.name] = 1
+        for d in s.deps:
+            visit(by_name[d], path + (s.name,))
+        seen[s.name] = 2
+
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        visit(s, ())
+
+
+def run_stages(stages: List[Stage], cache_path: Optional[Path] = None, max_workers: int = 4) -> List[StageResult]:
+    """Run stages in dependency order, independent ones concurrently in threads.
+
+    With cache_path, stage keys are kept there and up-to-date stages are
+    skipped (status "cached"); without it every stage runs. The first
+    failure stops scheduling new stages and is re-raised once running ones
+    finish. Results come back in the order the stages were given.
+    """
+    _check_graph(stages)
+    cache = StageCache(cache_path)
+    results: Dict[str, StageResult] = {}
+    values: Dict[str, Any] = {}  # only touched by this thread
+    pending = {s.name: s for s in stages}
+    running: Dict[Future, Stage] = {}
+    error: Optional[BaseException] = None
+
+    def execute(stage: Stage, done: Dict[str, Any]) -> StageResult:
+        t0 = time.perf_counter()
+        key = cache.key(stage) if cache.path is not None and stage.cacheable else None
+        if key is not None and cache.fresh(stage, key):
+            return StageResult(stage.name, "cached", time.perf_counter() - t0)
+        cache.forget(stage.name)
+        value = stage.fn(done)
+        if key is not None:
+            cache.record(stage, key)
+        return StageResult(stage.name, "ran", time.perf_counter() - t0, value)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while pending or running:
+            if error is None:
+                for name, stage in list(pending.items()):
+                    if all(d in results for d in stage.deps):
+                        del pending[name]
+                        running[pool.submit(execute, stage, dict(values))] = stage
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage = running.pop(fut)
+                try:
+                    res = fut.result()
+                except BaseException as e:  # noqa: BLE001 - re-raised below
+                    logging.error("Stage %s failed: %s", stage.name, e)
+                    results[stage.name] = StageResult(stage.name, "failed", 0.0)
+                    error = error or e
+                    continue
+                results[stage.name] = res
+                values[stage.name] = res.value
+                logging.info("Stage %s: %s in %.1fms", res.name, res.status, res.seconds * 1000)
+    cache.save()
+    if error is not None:
+        raise error
+    return [results[s.name] for s in stages if s.name in results]
+
+
+def format_explain(results: List[StageResult]) -> str:
+    """Plain-text table of each stage's status and wall time."""
+    width = max([len("stage")] + [len(r.name) for r in results])
+    lines = [f"{'stage'.ljust(width)}  status   time"]
+    for r in results:
+        lines.append(f"{r.name.ljust(width)}  {r.status.ljust(7)}  {r.seconds * 1000:.1f}ms")
+    return "\n".join(lines)
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import heapq
+import json
+import logging
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .columnar import map_file
+from .utils import file_size
+
+FP_NAME = "cleaned_expenses.fp"
+FP_VERSION = 2
+DUPLICATES_NAME = "duplicate_rows.csv"
+DUPLICATE_FIELDS = ["date", "amount", "category", "description", "fingerprint", "occurrence"]
+
+# Bloom filter size; about 1-2% of new rows need an exact lookup at this density
+BLOOM_BITS_PER_ROW = 12
+# fingerprints added in one run are spilled to a sorted segment file this often
+SEGMENT_ROWS = 1_000_000
+# close() merges the segments into one once there are more than this
+MAX_SEGMENTS = 8
+_WRITE_ROWS = 65536
+
+
+def estimate_rows(n_bytes: int) -> int:
+    """Generous row count for n_bytes of expenses CSV, for sizing the Bloom filter."""
+    return n_bytes // 24
+
+
+def normalize_text(value: Any) -> str:
+    """Case-folded with runs of whitespace collapsed, so "Uber  ride" == "uber ride"."""
+    return " ".join(str(value or "").split()).casefold()
+
+
+def row_fingerprint(row: Dict[str, Any]) -> int:
+    """64-bit hash of a cleaned row's date, amount in cents and normalized category/description."""
+    key = "\x1f".join((
+        str(row["date"]),
+        str(round(float(row["amount"]) * 100)),
+        normalize_text(row["category"]),
+        normalize_text(row.get("description")),
+    ))
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def occurrence_key(fp: int, occurrence: int) -> int:
+    """Set key for the occurrence-th copy (0-based) of fp in one input; the first copy is fp itself."""
+    if not occurrence:
+        return fp
+    data = fp.to_bytes(8, "little") + occurrence.to_bytes(8, "little")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class BloomFilter:
+    """Blocked Bloom filter over 64-bit fingerprints.
+
+    Each fingerprint maps to one 64-bit word (fp % words) and sets four bits
+    in it chosen by its top 24 bits, so a lookup is one array read and a
+    mask compare rather than one probe per hash.
+    """
+
+    def __init__(self, n_words: int, words: Optional[array] = None) -> None:
+        self.words = words if words is not None else array("Q", bytes(8 * max(1, n_words)))
+
+    @classmethod
+    def for_rows(cls, rows: int) -> "BloomFilter":
+        return cls(max(rows, 1024) * BLOOM_BITS_PER_ROW // 64)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.words) * 64 // BLOOM_BITS_PER_ROW
+
+    def add(self, fp: int) -> bool:
+        """Set fp's bits; True if they were all set already (fp may have been added before)."""
+        words = self.words
+        i = fp % len(words)
+        mask = 1 << (fp >> 40 & 63) | 1 << (fp >> 46 & 63) | 1 << (fp >> 52 & 63) | 1 << (fp >> 58)
+        word = words[i]
+        if word & mask == mask:
+            return True
+        words[i] = word | mask
+        return False
+
+    def __contains__(self, fp: int) -> bool:
+        mask = 1 << (fp >> 40 & 63) | 1 << (fp >> 46 & 63) | 1 << (fp >> 52 & 63) | 1 << (fp >> 58)
+        return self.words[fp % len(self.words)] & mask == mask
+
+
+class FingerprintSet:
+    """Occurrence keys of every row in cleaned_expenses.csv, kept on disk next to it.
+
+    Layout (native byte order, recorded in meta.json):
+      seg-NNNN.u64  sorted uint64 fingerprints, one file per spill
+      bloom.bits    Bloom filter over all of them
+    A lookup probes the Bloom filter first, so a new row costs one word
+    test; only Bloom hits (duplicates and ~1-2% false positives) are
+    confirmed by binary search in the memory-mapped segments. Fingerprints
+    added in this run are held in a set until SEGMENT_ROWS of them are
+    spilled to a new segment. As with the columnar store, meta.json is
+    removed while the set is being written and restamped against the
+    cleaned CSV by close(), so an interrupted run leaves it stale.
+    """
+
+    def __init__(self, path: Path, append: bool = False, expected_rows: int = 0) -> None:
+        self.path = Path(path)
+        self.count = 0
+        self.segments: List[str] = []
+        self._next_segment = 0
+        self._new: set = set()
+        self._maps: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+
+        meta = _read_meta(self.path) if append else None
+        self.valid = meta is not None or not append
+        if meta is not None:
+            self.count = meta["count"]
+            self.segments = meta["segments"]
+            self._next_segment = meta["next_segment"]
+            words = array("Q")
+            with open(self.path / "bloom.bits", "rb") as f:
+                words.fromfile(f, meta["bloom_words"])
+            self.bloom = BloomFilter(len(words), words)
+            for name in self.segments:
+                map_file(self.path / name, "Q", self._maps, self._views)
+        else:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path.mkdir(parents=True, exist_ok=True)
+            self.bloom = BloomFilter.for_rows(expected_rows)
+        (self.path / "meta.json").unlink(missing_ok=True)
+        self._ensure_capacity(self.count + expected_rows)
+
+    def add(self, fp: int) -> bool:
+        """Record fp; False if it was already in the set."""
+        if self.bloom.add(fp) and (fp in self._new or self._in_segments(fp)):
+            return False
+        self._new.add(fp)
+        self.count += 1
+        if len(self._new) >= SEGMENT_ROWS:
+            self._spill()
+        return True
+
+    def __contains__(self, fp: int) -> bool:
+        return fp in self.bloom and (fp in self._new or self._in_segments(fp))
+
+    def _in_segments(self, fp: int) -> bool:
+        for view in self._views:
+            i = bisect_left(view, fp)
+            if i < len(view) and view[i] == fp:
+                return True
+        return False
+
+    def _spill(self) -> None:
+        if not self._new:
+            return
+        name = f"seg-{self._next_segment:04d}.u64"
+        self._next_segment += 1
+        with open(self.path / name, "wb") as f:
+            array("Q", sorted(self._new)).tofile(f)
+        self._new.clear()
+        self.segments.append(name)
+        map_file(self.path / name, "Q", self._maps, self._views)
+
+    def _release(self) -> None:
+        for view in self._views:
+            view.release()
+        for mm in self._maps:
+            mm.close()
+        self._views = []
+        self._maps = []
+
+    def _merge_segments(self) -> None:
+        """Rewrite all segments as one sorted file (a streaming k-way merge)."""
+        name = f"seg-{self._next_segment:04d}.u64"
+        self._next_segment += 1
+        buf = array("Q")
+        with open(self.path / name, "wb") as f:
+            for fp in heapq.merge(*self._views):
+                buf.append(fp)
+                if len(buf) >= _WRITE_ROWS:
+                    buf.tofile(f)
+                    del buf[:]
+            buf.tofile(f)
+        self._release()
+        for old in self.segments:
+            (self.path / old).unlink(missing_ok=True)
+        self.segments = [name]
+        map_file(self.path / name, "Q", self._maps, self._views)
+
+    def _ensure_capacity(self, rows: int) -> None:
+        """Regrow the Bloom filter (to twice rows) once it holds more than it was sized for."""
+        if rows <= self.bloom.capacity:
+            return
+        self._spill()
+        bloom = BloomFilter.for_rows(2 * rows)
+        for view in self._views:
+            for fp in view:
+                bloom.add(fp)
+        self.bloom = bloom
+
+    def close(self, cleaned_csv_path: Path) -> None:
+        """Write out new fingerprints and stamp the set as matching cleaned_csv_path."""
+        self._spill()
+        if len(self.segments) > MAX_SEGMENTS:
+            self._merge_segments()
+        self._ensure_capacity(self.count)
+        self._release()
+        with open(self.path / "bloom.bits", "wb") as f:
+            self.bloom.words.tofile(f)
+        st = os.stat(cleaned_csv_path)
+        meta = {
+            "version": FP_VERSION,
+            "byteorder": sys.byteorder,
+            "count": self.count,
+            "segments": self.segments,
+            "next_segment": self._next_segment,
+            "bloom_words": len(self.bloom.words),
+            "csv_size": st.st_size,
+            "csv_mtime_ns": st.st_mtime_ns,
+        }
+        (self.path / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+
+def _read_meta(path: Path) -> Optional[dict]:
+    """meta.json if the set is complete and still matches its cleaned CSV."""
+    try:
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        st = os.stat(path.with_name("cleaned_expenses.csv"))
+    except (OSError, ValueError):
+        return None
+    if (
+        meta.get("version") != FP_VERSION
+        or meta.get("byteorder") != sys.byteorder
+        or meta.get("csv_size") != st.st_size
+        or meta.get("csv_mtime_ns") != st.st_mtime_ns
+    ):
+        return None
+    return meta
+
+
+def has_history(output_dir: str) -> bool:
+    """True if output_dir holds rows of an earlier --dedup ingest, which the next one adds to."""
+    out_dir = Path(output_dir)
+    return (out_dir / FP_NAME).is_dir() and (out_dir / "cleaned_expenses.csv").is_file()
+
+
+class Deduper:
+    """The dedup stage of ingest_csv: drops transactions already ingested.
+
+    Rows are keyed on (fingerprint, occurrence), where occurrence counts the
+    identical rows (see row_fingerprint) before it in the same export: one
+    input file, the bytes appended to it, or the part of a concatenated CSV
+    after a repeated header line (see new_export). The k-th copy of a row
+    is a duplicate only if the kept history already holds k copies, so two
+    equal coffees in one export are both kept, while an export that repeats
+    rows ingested before has those dropped. Duplicates are written to
+    duplicate_rows.csv with their fingerprint and occurrence instead of
+    going on to the cleaned outputs. The per-export occurrence counts take
+    one entry per distinct row in the export.
+    """
+
+    def __init__(self, output_dir: str, append: bool = False, expected_rows: int = 0) -> None:
+        out_dir = Path(output_dir)
+        self.duplicates = 0
+        self._occurrences: Dict[int, int] = {}
+        self.seen = FingerprintSet(out_dir / FP_NAME, append=append, expected_rows=expected_rows)
+        if not self.seen.valid:
+            logging.info("Fingerprint set missing or stale; rebuilding it from the cleaned CSV")
+            cleaned = out_dir / "cleaned_expenses.csv"
+            self.seen = FingerprintSet(out_dir / FP_NAME, expected_rows=expected_rows + estimate_rows(file_size(cleaned)))
+            with open(cleaned, newline="", encoding="utf-8") as f:
+                _add_all(self.seen, csv.DictReader(f))
+
+        dup_path = out_dir / DUPLICATES_NAME
+        append_dups = append and dup_path.exists()
+        self.path = dup_path
+        self._file = open(dup_path, "a" if append_dups else "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=DUPLICATE_FIELDS, extrasaction="ignore")
+        if not append_dups:
+            self._writer.writeheader()
+
+    def new_export(self) -> None:
+        """Start counting occurrences afresh: the following rows are another export."""
+        self._occurrences.clear()
+
+    def is_new(self, row: Dict[str, Any]) -> bool:
+        """True if row should be kept; otherwise it is recorded as a duplicate."""
+        fp = row_fingerprint(row)
+        occurrence = self._occurrences.get(fp, 0)
+        self._occurrences[fp] = occurrence + 1
+        if self.seen.add(occurrence_key(fp, occurrence)):
+            return True
+        self._writer.writerow({**row, "fingerprint": f"{fp:016x}", "occurrence": occurrence})
+        self.duplicates += 1
+        return False
+
+    def close(self, cleaned_csv_path: Path) -> None:
+        self._file.close()
+        self.seen.close(cleaned_csv_path)
+
+
+def _add_all(seen: FingerprintSet, rows: Iterable[Dict[str, Any]]) -> None:
+    occurrences: Dict[int, int] = {}
+    for row in rows:
+        fp = row_fingerprint(row)
+        occurrence = occurrences.get(fp, 0)
+        occurrences[fp] = occurrence + 1
+        seen.add(occurrence_key(fp, occurrence))
+
+
+def remove_dedup_outputs(output_dir: str) -> None:
+    """Drop the fingerprint set and duplicates report of an earlier --dedup run."""
+    out_dir = Path(output_dir)
+    shutil.rmtree(out_dir / FP_NAME, ignore_errors=True)
+    (out_dir / DUPLICATES_NAME).unlink(missing_ok=True)
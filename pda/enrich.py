@@ -1,65 +1,54 @@
 from __future__ import annotations
 
-import json
 import logging
 from pathlib import Path
 from typing import Any, Dict, Optional
 
-import requests
+from .cache import get_cache, log_stats, ttl_from_profile
+from .fetch import get_engine
+from .utils import incr, timed
+from .summary_io import find_summary, load_summary, write_enrichment
 
-from .utils import ensure_dir
 
-
-def cache_get(cache_dir: str, key: str) -> Optional[dict]:
-    """Return cached payload if exists, else None."""
-    p = Path(cache_dir) / f"{key}.json"
-    if p.exists():
-        try:
-            return json.loads(p.read_text(encoding="utf-8"))
-        except Exception:
-            return None
-    return None
+def cache_get(cache_dir: str, key: str, ttl_seconds: Optional[float] = None) -> Optional[dict]:
+    """Return cached payload if present and not older than ttl_seconds, else None."""
+    return get_cache(cache_dir).get(key, ttl_seconds=ttl_seconds)
 
 
 def cache_set(cache_dir: str, key: str, payload: dict) -> Path:
     """Write payload to cache and return path."""
-    ensure_dir(cache_dir)
-    p = Path(cache_dir) / f"{key}.json"
-    p.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
-    return p
+    return get_cache(cache_dir).set(key, payload)
 
 
 def fetch_exchange_rate(base: str, target: str) -> float:
     """Fetch FX rate from a public endpoint.
 
-    TODO:
-    - Add robust error handling for non-200, JSON errors
-    - Use timeout (required)
-    - Consider retry (optional stretch)
+    Goes through the shared FetchEngine: pooled session, timeouts,
+    rate limiting, retries with backoff and a circuit breaker. Concurrent
+    callers (e.g. batch tenants) asking for the same base share one request.
     """
     url = "https://api.exchangerate.host/latest"
-    resp = requests.get(url, params={"base": base}, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+    engine = get_engine()
+    data = engine.submit(("fx_latest", url, base), engine.get_json, url, params={"base": base}).result()
     rate = float(data["rates"][target])
     return rate
 
 
-def enrich_summary_with_fx(summary_path: str, cache_dir: str, base: str = "USD", target: str = "EUR") -> dict:
+def enrich_summary_with_fx(
+    summary_path: str, cache_dir: str, base: str = "USD", target: str = "EUR", ttl_seconds: Optional[float] = None
+) -> dict:
     """Example enrichment: add FX rate info to summary.json.
 
     Required features:
     - Cache hit/miss logging
     - API failure should NOT crash pipeline; must fallback gracefully
 
-    TODO:
-    - Read summary.json
-    - Get FX rate (cache first, otherwise API)
-    - Add fields under summary['enrichment']
-    - Write summary.json back (or write a new enriched_summary.json)
+    The rate goes to the enrichment sidecar (summary.enrichment.json), so
+    the summary itself is not rewritten; the returned summary has it merged
+    under summary['enrichment'].
     """
     cache_key = f"fx_{base}_{target}".lower()
-    cached = cache_get(cache_dir, cache_key)
+    cached = cache_get(cache_dir, cache_key, ttl_seconds=ttl_seconds)
 
     if cached and "rate" in cached:
         logging.info("FX cache hit: %s", cache_key)
@@ -77,36 +66,53 @@ def enrich_summary_with_fx(summary_path: str, cache_dir: str, base: str = "USD",
             source = "failed"
 
     p = Path(summary_path)
-    summary = json.loads(p.read_text(encoding="utf-8"))
-    summary["enrichment"] = {
+    write_enrichment(str(p.parent), {
         "type": "exchange_rate",
         "base": base,
         "target": target,
         "rate": rate,
         "source": source,
-    }
+    })
+    return load_summary(str(p))
+
 
-    # TODO: decide whether to overwrite summary.json or write a new file
-    #write stored_data'summary.json' to a file
-    p.write_text(json.dumps(summary, indent=2, ensure_ascii=False), encoding="utf-8")
-    #return stored_data to use directly
-    return summary
+def enrich_exchangerate(input_dir: str, cache_dir: str, profile: dict) -> dict:
+    """"exchangerate" enricher: attach the current USD->EUR rate to summary.json."""
+    return enrich_summary_with_fx(
+        str(find_summary(input_dir)), cache_dir, base="USD", target="EUR", ttl_seconds=ttl_from_profile(profile)
+    )
 
 
-def run_enrich(input_dir: str, api_name: str, cache_dir: str) -> Path:
+def run_enrich(input_dir: str, api_name: str, cache_dir: str, profile_path: Optional[str] = None) -> Path:
     """Entry point for enrich command.
 
-    Currently supports:
+    api_name selects an enricher from pda.enrichers; builtins are
     - exchangerate: enrich summary.json with FX rate info
+    - fx_convert: convert every transaction to the profile's preferred_currency
+      at its date's rate (see pda.fx)
+    and installed packages can add more via "pda.enrichers" entry points.
 
-    TODO:
-    - Add more tools (weather, wiki) as stretch
+    Cache entries expire after profile api_preferences.cache_ttl_hours
+    (no expiry without a profile); cache counters are logged at the end.
     """
-    input_dir_p = Path(input_dir)
-    summary_path = str(input_dir_p / "summary.json")
-
-    if api_name == "exchangerate":
-        enrich_summary_with_fx(summary_path, cache_dir, base="USD", target="EUR")
-        return Path(summary_path)
+    from .enrichers import get_enricher
+    from .ingest import load_profile
 
-    raise ValueError(f"Unsupported api: {api_name}")
+    enricher = get_enricher(api_name)
+    input_dir_p = Path(input_dir)
+    profile = load_profile(profile_path)
+    cache = get_cache(cache_dir)
+    before = cache.stats()
+    fetch_before = get_engine().stats()
+
+    try:
+        with timed("enrich"):
+            enricher(str(input_dir_p), cache_dir, profile)
+        return find_summary(str(input_dir_p))
+    finally:
+        for event, n in log_stats(cache, before).items():
+            incr("pda_cache_events_total", n, event=event)
+        fetch = get_engine().stats()
+        for event, n in fetch.items():
+            incr("pda_http_events_total", n - fetch_before.get(event, 0), event=event)
+        logging.info("Fetch stats: %s", fetch)
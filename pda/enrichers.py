@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from importlib import import_module
+from typing import Any, Callable, Dict, Union
+
+ENTRY_POINT_GROUP = "pda.enrichers"
+
+# name -> "module:function"; modules are imported only when the tool is selected.
+# An enricher is called as fn(input_dir, cache_dir, profile) and records its
+# result in input_dir's enrichment sidecar (see summary_io.write_enrichment).
+BUILTIN_ENRICHERS: Dict[str, str] = {
+    "exchangerate": "pda.enrich:enrich_exchangerate",
+    "fx_convert": "pda.fx:enrich_fx_convert",
+}
+
+Enricher = Callable[[str, str, dict], Any]
+_registered: Dict[str, Union[str, Enricher]] = {}
+
+
+def register_enricher(name: str, target: Union[str, Enricher]) -> None:
+    """Register an enricher by "module:function" spec or callable (overrides builtins)."""
+    _registered[name] = target
+
+
+def _entry_points() -> Dict[str, Any]:
+    from importlib.metadata import entry_points
+
+    return {ep.name: ep for ep in entry_points(group=ENTRY_POINT_GROUP)}
+
+
+def available_enrichers() -> Dict[str, str]:
+    """All selectable enricher names -> spec, without importing any of them."""
+    found = {name: ep.value for name, ep in _entry_points().items()}
+    found.update(BUILTIN_ENRICHERS)
+    found.update({k: v if isinstance(v, str) else repr(v) for k, v in _registered.items()})
+    return dict(sorted(found.items()))
+
+
+def _load_spec(spec: str) -> Enricher:
+    module, _, attr = spec.partition(":")
+    obj: Any = import_module(module)
+    for part in attr.split("."):
+        obj = getattr(obj, part)
+    return obj
+
+
+def get_enricher(name: str) -> Enricher:
+    """Resolve name to its enricher, importing only that plugin.
+
+    Lookup order: register_enricher(), builtins, then installed packages'
+    "pda.enrichers" entry points (only scanned when the name is not builtin).
+    """
+    target = _registered.get(name) or BUILTIN_ENRICHERS.get(name)
+    if target is None:
+        ep = _entry_points().get(name)
+        if ep is None:
+            raise ValueError(f"Unsupported api: {name}")
+        return ep.load()
+    return _load_spec(target) if isinstance(target, str) else target
@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an API that has failed repeatedly."""
+
+
+class TokenBucket:
+    """Rate limiter: rate tokens per second, bursts of up to capacity."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns the time waited."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; after reset_seconds one trial call is let through."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if self._clock() - self._opened_at >= self.reset_seconds else "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._clock() - self._opened_at < self.reset_seconds or self._trial:
+                raise CircuitOpenError("circuit open: API failing, not calling")
+            self._trial = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+def _retry_after(resp) -> Optional[float]:
+    value = resp.headers.get("Retry-After") if resp is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class FetchEngine:
+    """Concurrent JSON-over-HTTP lookups for enrichment tools.
+
+    One pooled requests.Session is shared by a bounded thread pool
+    (max_workers concurrent requests). Every attempt takes a token from a
+    shared TokenBucket, connection errors / timeouts / 429 / 5xx are
+    retried with jittered exponential backoff (honouring Retry-After), and
+    a CircuitBreaker makes calls fail fast once the API looks dead.
+    submit() coalesces identical keys: while a lookup for a key is in
+    flight, further submits for it get the same Future.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        rate_per_second: float = 10.0,
+        burst: Optional[float] = None,
+        retries: int = 3,
+        backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 8.0,
+        timeout: Any = (3.05, 10),
+        breaker: Optional[CircuitBreaker] = None,
+        session=None,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate_per_second, burst, sleep=sleep)
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._session = session
+        self._session_lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"requests": 0, "retries": 0, "failures": 0, "coalesced": 0, "short_circuited": 0}
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_workers)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                self._session = s
+            return self._session
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def get_json(self, url: str, params: Optional[dict] = None) -> Any:
+        """GET url and decode JSON, with rate limiting, retries and circuit breaking."""
+        import requests
+
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("short_circuited")
+                raise
+            self.bucket.acquire()
+            self._count("requests")
+            resp = None
+            try:
+                resp = self.session.get(url, params=params, timeout=self.timeout)
+                if resp.status_code in RETRY_STATUSES:
+                    raise requests.HTTPError(f"{resp.status_code} from {url}", response=resp)
+                resp.raise_for_status()
+                data = resp.json()
+            except ValueError:
+                # undecodable body (requests' JSONDecodeError is also a RequestException)
+                self.breaker.record_failure()
+                self._count("failures")
+                raise
+            except requests.RequestException as e:
+                retryable = resp is None or resp.status_code in RETRY_STATUSES
+                if not retryable:
+                    # the API answered; a 4xx is the request's fault, not an outage
+                    self.breaker.record_success()
+                    self._count("failures")
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.retries:
+                    self._count("failures")
+                    raise
+                delay = _retry_after(resp)
+                if delay is None:
+                    delay = self.backoff_seconds * 2 ** attempt * (0.5 + random.random() / 2)
+                delay = min(self.max_backoff_seconds, delay)
+                logging.debug("Retrying %s in %.2fs after: %s", url, delay, e)
+                self._count("retries")
+                attempt += 1
+                self._sleep(delay)
+                continue
+            except BaseException:
+                # every exit must settle the breaker, or a half-open trial never ends
+                self.breaker.record_failure()
+                self._count("failures")
+                raise
+            self.breaker.record_success()
+            return data
+
+    def submit(self, key: Hashable, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Run fn(*args, **kwargs) on the pool, sharing one Future per in-flight key."""
+        with self._lock:
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.counters["coalesced"] += 1
+                return fut
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pda-fetch")
+            fut = self._pool.submit(fn, *args, **kwargs)
+            self._inflight[key] = fut
+
+        def _done(_: Future) -> None:
+            with self._lock:
+                if self._inflight.get(key) is fut:
+                    del self._inflight[key]
+
+        fut.add_done_callback(_done)
+        return fut
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def __enter__(self) -> "FetchEngine":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+_default: Optional[FetchEngine] = None
+_default_lock = threading.Lock()
+
+
+def get_engine() -> FetchEngine:
+    """Process-wide FetchEngine, so all enrichment tools share one session, pool and limits."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = FetchEngine()
+        return _default
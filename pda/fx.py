@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+import bisect
+import csv
+import logging
+import os
+from datetime import date
+from fractions import Fraction
+from itertools import tee
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .cache import get_cache, ttl_from_profile
+from .fetch import get_engine
+from .summary_io import find_summary, load_summary, write_enrichment
+
+FX_API_URL = "https://api.exchangerate.host"
+FX_API_ENV = "PDA_FX_API_URL"
+DEFAULT_BASE = "USD"
+CONVERTED_NAME = "converted_expenses.csv"
+CONVERTED_FIELDS = ["date", "amount", "category", "description", "rate", "converted_amount", "currency"]
+
+# One timeseries request covers at most this many days, and dates further
+# apart than MAX_GAP_DAYS go to separate requests rather than fetching the gap.
+MAX_RANGE_DAYS = 365
+MAX_GAP_DAYS = 31
+
+FxKey = Tuple[str, str, str]  # (YYYY-MM-DD, base, target)
+Fetcher = Callable[[str, str, str, str], Dict[str, float]]
+
+
+def fx_api_url(api_url: Optional[str] = None) -> str:
+    """API root: explicit argument, then $PDA_FX_API_URL, then the public endpoint."""
+    return (api_url or os.environ.get(FX_API_ENV) or FX_API_URL).rstrip("/")
+
+
+def fx_cache_key(key: FxKey) -> str:
+    day, base, target = key
+    return f"fx_{base}_{target}_{day}".lower()
+
+
+def date_ranges(days: Iterable[str], max_days: int = MAX_RANGE_DAYS, max_gap: int = MAX_GAP_DAYS) -> List[Tuple[str, str]]:
+    """Group ISO dates into inclusive (start, end) ranges, one per request."""
+    ordinals = sorted({date.fromisoformat(d).toordinal() for d in days})
+    ranges: List[Tuple[int, int]] = []
+    for o in ordinals:
+        if ranges and o - ranges[-1][1] <= max_gap and o - ranges[-1][0] < max_days:
+            ranges[-1] = (ranges[-1][0], o)
+        else:
+            ranges.append((o, o))
+    return [(date.fromordinal(a).isoformat(), date.fromordinal(b).isoformat()) for a, b in ranges]
+
+
+def fetch_timeseries(base: str, target: str, start: str, end: str, api_url: Optional[str] = None, engine=None) -> Dict[str, float]:
+    """Daily base->target rates for start..end as {YYYY-MM-DD: rate}.
+
+    Uses the exchangerate.host /timeseries shape:
+    {"rates": {"2024-01-03": {"EUR": 0.91}, ...}}. Days the API has no
+    quote for (weekends, holidays) are simply absent.
+    """
+    engine = engine or get_engine()
+    data = engine.get_json(
+        f"{fx_api_url(api_url)}/timeseries",
+        params={"start_date": start, "end_date": end, "base": base, "symbols": target},
+    )
+    out: Dict[str, float] = {}
+    for day, quotes in (data.get("rates") or {}).items():
+        if isinstance(quotes, dict) and target in quotes:
+            out[day] = float(quotes[target])
+    return out
+
+
+def _rate_for(day: str, series_days: List[str], series: Dict[str, float]) -> Optional[float]:
+    """Rate quoted on day, else the last quote before it, else the first after it."""
+    if day in series:
+        return series[day]
+    if not series_days:
+        return None
+    i = bisect.bisect_left(series_days, day)
+    return series[series_days[i - 1] if i else series_days[0]]
+
+
+def resolve_rates(
+    keys: Iterable[FxKey],
+    cache_dir: str,
+    fetch: Optional[Fetcher] = None,
+    api_url: Optional[str] = None,
+    ttl_seconds: Optional[float] = None,
+) -> Tuple[Dict[FxKey, Optional[float]], Dict[str, int]]:
+    """Rates for distinct (date, base, target) keys: cache first, then one fetch per date range.
+
+    Range fetches run concurrently on the shared FetchEngine; cached rates
+    older than ttl_seconds count as missing.
+
+    Keys whose range request fails map to None; failures are logged, not raised.
+    Returns (rates, counts) with counts of cached/fetched/missing keys and requests made.
+    """
+    cache = get_cache(cache_dir)
+    rates: Dict[FxKey, Optional[float]] = {}
+    todo: Dict[Tuple[str, str], List[str]] = {}
+    for key in set(keys):
+        day, base, target = key
+        if base == target:
+            rates[key] = 1.0
+            continue
+        hit = cache.get(fx_cache_key(key), ttl_seconds=ttl_seconds)
+        if hit is not None and "rate" in hit:
+            rates[key] = float(hit["rate"])
+        else:
+            todo.setdefault((base, target), []).append(day)
+    counts = {"cached": len(rates), "fetched": 0, "missing": 0, "requests": 0}
+
+    if fetch is None:
+        fetch = lambda b, t, s, e: fetch_timeseries(b, t, s, e, api_url=api_url)  # noqa: E731
+    engine = get_engine()
+    pending = []
+    for (base, target), days in sorted(todo.items()):
+        for start, end in date_ranges(days):
+            wanted = [d for d in days if start <= d <= end]
+            key = ("fx_timeseries", fx_api_url(api_url), base, target, start, end)
+            pending.append((base, target, start, end, wanted, engine.submit(key, fetch, base, target, start, end)))
+            counts["requests"] += 1
+
+    for base, target, start, end, wanted, fut in pending:
+        try:
+            series = fut.result()
+        except Exception as e:
+            logging.error("FX API failed for %s->%s %s..%s: %s", base, target, start, end, e)
+            series = {}
+        series_days = sorted(series)
+        for day in wanted:
+            key = (day, base, target)
+            rate = _rate_for(day, series_days, series)
+            rates[key] = rate
+            if rate is None:
+                counts["missing"] += 1
+            else:
+                counts["fetched"] += 1
+                cache.set(fx_cache_key(key), {"rate": rate})
+    return rates, counts
+
+
+def convert_columns(
+    amounts: Iterable[float], days: Iterable[int], rate_by_day: Dict[int, Optional[float]]
+) -> Iterator[Optional[float]]:
+    """amount * rate for each row, lazily, from the amount/day columns (None without a rate)."""
+    for a, d in zip(amounts, days):
+        rate = rate_by_day.get(d)
+        yield None if rate is None else a * rate
+
+
+def _open_columns(cleaned_csv_path: Path):
+    """(iter_days, iter_columns, close) over the columnar store, or the CSV if there is none.
+
+    iter_days() yields every row's day ordinal; iter_columns() returns
+    (rows, amounts, days) iterators meant to be consumed in step. Without
+    a store each call re-reads the CSV, so conversion takes two streaming
+    passes over it.
+    """
+    from .analyze import iter_cleaned_expenses
+    from .columnar import ColumnarStore, store_path_for
+
+    store = ColumnarStore.open(store_path_for(str(cleaned_csv_path)))
+    if store is not None:
+        return (lambda: iter(store.dates)), (lambda: (store.iter_rows(), store.amounts, store.dates)), store.close
+
+    def rows_with_days() -> Iterator[Tuple[dict, int]]:
+        for r in iter_cleaned_expenses(str(cleaned_csv_path)):
+            yield r, date.fromisoformat(r["date"]).toordinal()
+
+    def iter_columns():
+        a, b, c = tee(rows_with_days(), 3)
+        return (r for r, _ in a), (float(r["amount"]) for r, _ in b), (d for _, d in c)
+
+    return (lambda: (d for _, d in rows_with_days())), iter_columns, lambda: None
+
+
+def _resolve_days(days: Iterable[int], cache_dir, base, target, api_url, fetch, ttl_seconds):
+    distinct_days = sorted(set(days))
+    keys = [(date.fromordinal(d).isoformat(), base, target) for d in distinct_days]
+    rates, counts = resolve_rates(keys, cache_dir, fetch=fetch, api_url=api_url, ttl_seconds=ttl_seconds)
+    rate_by_day = {d: rates[k] for d, k in zip(distinct_days, keys)}
+    return rate_by_day, keys, counts
+
+
+def _add_exact(sums: Dict[int, int], x: float) -> None:
+    n, den = x.as_integer_ratio()
+    sums[den] = sums.get(den, 0) + n
+
+
+def _exact_total(sums: Dict[int, int]) -> float:
+    return float(sum((Fraction(n, den) for den, n in sums.items()), Fraction(0)))
+
+
+def _write_converted(out_path: Path, rows: Iterable[dict], converted, days, rate_by_day, target: str) -> dict:
+    """Write converted_expenses.csv row by row; returns row counts and exact converted totals.
+
+    Totals are kept as integer partials keyed by each float's (power-of-two)
+    denominator, as RunningStats does, so they take memory per category
+    rather than per row and equal math.fsum of the amounts.
+    """
+    n_rows = n_missing = 0
+    total: Dict[int, int] = {}
+    partials: Dict[str, Dict[int, int]] = {}
+    with open(out_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(CONVERTED_FIELDS)
+        for r, c, d in zip(rows, converted, days):
+            rate = rate_by_day[d]
+            w.writerow([
+                r["date"], r["amount"], r["category"], r["description"],
+                "" if rate is None else rate,
+                "" if c is None else f"{c:.2f}",
+                target,
+            ])
+            n_rows += 1
+            if c is None:
+                n_missing += 1
+            else:
+                _add_exact(total, c)
+                _add_exact(partials.setdefault(r["category"], {}), c)
+    return {
+        "rows": n_rows,
+        "missing": n_missing,
+        "total": _exact_total(total),
+        "by_category": {k: _exact_total(sums) for k, sums in partials.items()},
+    }
+
+
+def enrich_with_fx_conversion(
+    input_dir: str,
+    cache_dir: str,
+    target: str,
+    base: str = DEFAULT_BASE,
+    api_url: Optional[str] = None,
+    fetch: Optional[Fetcher] = None,
+    ttl_seconds: Optional[float] = None,
+) -> dict:
+    """Convert every cleaned transaction to target at its date's rate.
+
+    Writes converted_expenses.csv next to cleaned_expenses.csv and records
+    totals in the enrichment sidecar (merged as summary["enrichment"]). Rows without a rate (API down and
+    not cached) keep an empty converted_amount and are counted as missing.
+    Rows are streamed: memory grows with the number of distinct dates and
+    categories, not with the row count.
+    """
+    in_dir = Path(input_dir)
+    iter_days, iter_columns, close = _open_columns(in_dir / "cleaned_expenses.csv")
+    try:
+        rate_by_day, keys, counts = _resolve_days(iter_days(), cache_dir, base, target, api_url, fetch, ttl_seconds)
+        rows, amounts, days = iter_columns()
+        days, row_days = tee(days)
+        converted = convert_columns(amounts, days, rate_by_day)
+        totals = _write_converted(in_dir / CONVERTED_NAME, rows, converted, row_days, rate_by_day, target)
+    finally:
+        close()
+    missing_rows = totals["missing"]
+    logging.info(
+        "FX conversion %s->%s: rows=%s dates=%s cached=%s fetched=%s requests=%s missing_rows=%s",
+        base, target, totals["rows"], len(keys), counts["cached"], counts["fetched"], counts["requests"], missing_rows,
+    )
+
+    if not keys:
+        source = "none"
+    elif counts["missing"] == len(keys):
+        source = "failed"
+    elif counts["requests"] == 0:
+        source = "cache"
+    else:
+        source = "api"
+    write_enrichment(str(in_dir), {
+        "type": "fx_conversion",
+        "base": base,
+        "target": target,
+        "source": source,
+        "converted_rows": totals["rows"] - missing_rows,
+        "missing_rows": missing_rows,
+        "total_spend_converted": round(totals["total"], 2),
+        "total_by_category_converted": {k: round(v, 2) for k, v in totals["by_category"].items()},
+        "distinct_dates": len(keys),
+        "cached_rates": counts["cached"],
+        "fetched_rates": counts["fetched"],
+        "requests": counts["requests"],
+        "output": CONVERTED_NAME,
+    })
+    return load_summary(str(find_summary(str(in_dir))))
+
+
+def enrich_fx_convert(input_dir: str, cache_dir: str, profile: dict) -> dict:
+    """"fx_convert" enricher: convert to profile["preferred_currency"] (EUR if unset)."""
+    target = str(profile.get("preferred_currency") or "EUR").upper()
+    return enrich_with_fx_conversion(input_dir, cache_dir, target=target, ttl_seconds=ttl_from_profile(profile))
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import bisect
+import json
+import mmap
+import os
+import shutil
+from array import array
+from datetime import date
+from pathlib import Path
+from typing import Any, Iterable, List, Optional
+
+from .columnar import ColumnarStore, map_file, store_path_for
+
+INDEX_NAME = "cleaned_expenses.idx"
+INDEX_VERSION = 1
+
+# index file -> array typecode
+INDEX_FILES = {
+    "date.perm": "i",       # row ids ordered by (date, row id)
+    "date.sorted": "i",     # day ordinals in date.perm order
+    "amount.perm": "i",     # row ids ordered by amount, later row first among equal amounts
+    "amount.sorted": "d",   # amounts in amount.perm order
+    "category.rows": "i",   # row ids grouped by category code, ascending within a code
+}
+
+
+def index_path_for(cleaned_csv_path: str) -> Path:
+    """Index directory that sits next to a cleaned_expenses.csv."""
+    return Path(cleaned_csv_path).with_name(INDEX_NAME)
+
+
+def build_index(store: ColumnarStore, path: Path, cleaned_csv_path: Path) -> Path:
+    """Write date, amount and category indexes for store's rows to path.
+
+    Row ids address the columnar store, so a query reads only the rows it
+    returns. meta.json is written last and stamped with the cleaned CSV's
+    size/mtime, like the store itself.
+    """
+    path = Path(path)
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True)
+    n = store.rows
+
+    date_perm = array("i", sorted(range(n), key=store.dates.__getitem__))
+    # stable sort of descending ids: walking it backwards gives the largest
+    # amounts with the earliest row first, as the analyze top-5 does
+    amount_perm = array("i", sorted(range(n - 1, -1, -1), key=store.amounts.__getitem__))
+    by_code: List[array] = [array("i") for _ in store.categories]
+    for i, code in enumerate(store.category_codes):
+        by_code[code].append(i)
+    offsets = [0]
+    cat_rows = array("i")
+    for rows in by_code:
+        cat_rows.extend(rows)
+        offsets.append(len(cat_rows))
+
+    columns = {
+        "date.perm": date_perm,
+        "date.sorted": array("i", (store.dates[i] for i in date_perm)),
+        "amount.perm": amount_perm,
+        "amount.sorted": array("d", (store.amounts[i] for i in amount_perm)),
+        "category.rows": cat_rows,
+    }
+    for name, arr in columns.items():
+        with open(path / name, "wb") as f:
+            arr.tofile(f)
+
+    st = os.stat(cleaned_csv_path)
+    meta = {
+        "version": INDEX_VERSION,
+        "rows": n,
+        "categories": store.categories,
+        "category_offsets": offsets,
+        "csv_size": st.st_size,
+        "csv_mtime_ns": st.st_mtime_ns,
+    }
+    (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def invalidate_index(cleaned_csv_path: Path) -> None:
+    """Mark the index next to cleaned_csv_path stale; the next query rebuilds it."""
+    (index_path_for(str(cleaned_csv_path)) / "meta.json").unlink(missing_ok=True)
+
+
+def build_index_for(output_dir: str) -> Optional[Path]:
+    """(Re)build the index for output_dir's columnar store; None if there is no usable store."""
+    cleaned = Path(output_dir) / "cleaned_expenses.csv"
+    store = ColumnarStore.open(store_path_for(str(cleaned)))
+    if store is None:
+        return None
+    with store:
+        return build_index(store, index_path_for(str(cleaned)), cleaned)
+
+
+class ExpenseIndex:
+    """Memory-mapped indexes over a ColumnarStore (see build_index)."""
+
+    def __init__(self, path: Path, meta: dict) -> None:
+        self.path = Path(path)
+        self.rows: int = meta["rows"]
+        self.categories: List[str] = meta["categories"]
+        self.category_offsets: List[int] = meta["category_offsets"]
+        self._maps: List[mmap.mmap] = []
+        self._views: List[memoryview] = []
+        for name, code in INDEX_FILES.items():
+            setattr(self, name.replace(".", "_"), map_file(self.path / name, code, self._maps, self._views))
+
+    @classmethod
+    def open(cls, path: Path, store: ColumnarStore) -> Optional["ExpenseIndex"]:
+        """Open the index at path, or None if absent or not built from store's current rows."""
+        try:
+            meta = json.loads((Path(path) / "meta.json").read_text(encoding="utf-8"))
+            st = os.stat(Path(path).with_name("cleaned_expenses.csv"))
+        except (OSError, ValueError):
+            return None
+        if (
+            meta.get("version") != INDEX_VERSION
+            or meta.get("rows") != store.rows
+            or meta.get("categories") != store.categories
+            or meta.get("csv_size") != st.st_size
+            or meta.get("csv_mtime_ns") != st.st_mtime_ns
+        ):
+            return None
+        return cls(path, meta)
+
+    def date_range(self, start: Optional[int], end: Optional[int]) -> memoryview:
+        """Row ids with start <= day ordinal <= end, in date order."""
+        lo = 0 if start is None else bisect.bisect_left(self.date_sorted, start)
+        hi = len(self.date_sorted) if end is None else bisect.bisect_right(self.date_sorted, end)
+        return self.date_perm[lo:hi]
+
+    def amount_range(self, low: Optional[float], high: Optional[float]) -> memoryview:
+        """Row ids with low <= amount <= high, in ascending amount order."""
+        lo = 0 if low is None else bisect.bisect_left(self.amount_sorted, low)
+        hi = len(self.amount_sorted) if high is None else bisect.bisect_right(self.amount_sorted, high)
+        return self.amount_perm[lo:hi]
+
+    def category(self, name: str) -> memoryview:
+        """Row ids in category name, in row order (empty if unknown)."""
+        try:
+            code = self.categories.index(name)
+        except ValueError:
+            return self.category_rows[0:0]
+        return self.category_rows[self.category_offsets[code] : self.category_offsets[code + 1]]
+
+    def close(self) -> None:
+        for view in self._views:
+            view.release()
+        for mm in self._maps:
+            mm.close()
+        self._views = []
+        self._maps = []
+
+    def __enter__(self) -> "ExpenseIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def _ordinal(day: Optional[str]) -> Optional[int]:
+    return date.fromisoformat(day).toordinal() if day else None
+
+
+def query_rows(
+    store: ColumnarStore,
+    index: ExpenseIndex,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    top: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """Rows matching every given filter.
+
+    With top=K the K largest amounts are returned (largest first), walking
+    the amount index from the top. Otherwise the most selective of the
+    date / category / amount index slices is scanned, the other filters are
+    checked against the columns, and rows come back in date order.
+    """
+    lo_day, hi_day = _ordinal(start), _ordinal(end)
+    code = store.categories.index(category) if category in store.categories else None
+    if category is not None and code is None:
+        return []
+    dates, amounts, codes = store.dates, store.amounts, store.category_codes
+
+    def keep(i: int) -> bool:
+        d = dates[i]
+        a = amounts[i]
+        return (
+            (lo_day is None or d >= lo_day)
+            and (hi_day is None or d <= hi_day)
+            and (code is None or codes[i] == code)
+            and (min_amount is None or a >= min_amount)
+            and (max_amount is None or a <= max_amount)
+        )
+
+    if top is not None:
+        ids: List[int] = []
+        for i in reversed(index.amount_range(min_amount, max_amount)):
+            if keep(i):
+                ids.append(i)
+                if len(ids) >= top:
+                    break
+        return [store.row(i) for i in ids]
+
+    candidates: List[Iterable[int]] = [index.date_range(lo_day, hi_day)]
+    if category is not None:
+        candidates.append(index.category(category))
+    if min_amount is not None or max_amount is not None:
+        candidates.append(index.amount_range(min_amount, max_amount))
+    best = min(candidates, key=len)
+    ids = [i for i in best if keep(i)]
+    if best is not candidates[0]:
+        ids.sort(key=lambda i: (dates[i], i))
+    if limit is not None:
+        ids = ids[:limit]
+    return [store.row(i) for i in ids]
+
+
+def scan_rows(
+    rows: Iterable[dict],
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    top: Optional[int] = None,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """query_rows() semantics by scanning rows; used when there is no columnar store."""
+    out = []
+    for r in rows:
+        a = float(r["amount"])
+        if (
+            (start is None or r["date"] >= start)
+            and (end is None or r["date"] <= end)
+            and (category is None or r["category"] == category)
+            and (min_amount is None or a >= min_amount)
+            and (max_amount is None or a <= max_amount)
+        ):
+            out.append({**r, "amount": a})
+    if top is not None:
+        out.sort(key=lambda r: r["amount"], reverse=True)
+        return out[:top]
+    out.sort(key=lambda r: r["date"])
+    return out if limit is None else out[:limit]
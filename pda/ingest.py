@@ -3,65 +3,285 @@ from __future__ import annotations
 import csv
 import json
 import logging
+import os
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .utils import ensure_dir
-from .validate import validate_row
+from .analyze import iter_cleaned_expenses
+from .columnar import STORE_NAME, ColumnarWriter
+from .dag import Stage, run_stages
+from .dedup import DUPLICATES_NAME, Deduper, estimate_rows, has_history, remove_dedup_outputs
+from .index import invalidate_index
+from .keywords import DEFAULT_ACTION_KEYWORDS, NoteMatcher, keywords_from_profile
+from .manifest import (
+    STATE_NAME,
+    clear_manifest,
+    complete_lines_end,
+    fingerprint,
+    load_manifest,
+    plan_input,
+    save_manifest,
+    write_json_atomic,
+)
+from .notes_parallel import ingest_notes_many, is_multi_notes, resolve_notes_paths
+from .parallel_ingest import complete_records_end, ingest_parallel, read_header
+from .rollups import ROLLUPS_NAME, Rollups, load_rollups
+from .stats import ExpenseAccumulator
+from .utils import ensure_dir, file_size, incr, open_byte_range, timed
+from .validate import validate_rows
 
 
-ACTION_KEYWORDS = ("TODO", "ACTION", "FOLLOW UP", "FOLLOW-UP", "NEXT")
+ACTION_KEYWORDS = DEFAULT_ACTION_KEYWORDS
 
 
-def ingest_csv(csv_path: str, output_dir: str) -> Tuple[Path, Path]:
+CLEANED_FIELDS = ["date", "amount", "category", "description"]
+REJECTED_FIELDS = CLEANED_FIELDS + ["error"]
+
+
+BATCH_ROWS = 4096
+
+
+def _as_dict(fieldnames: List[str], values: List[str]) -> Dict[Any, Any]:
+    """Build the dict csv.DictReader would have produced for values."""
+    row: Dict[Any, Any] = dict(zip(fieldnames, values))
+    if len(values) > len(fieldnames):
+        row[None] = values[len(fieldnames):]
+    elif len(values) < len(fieldnames):
+        for key in fieldnames[len(values):]:
+            row[key] = None
+    return row
+
+
+def validate_records(
+    records: Iterable[List[str]], fieldnames: List[str], batch_rows: int = BATCH_ROWS
+) -> Iterator[Tuple[bool, Dict[str, Any]]]:
+    """Validate csv.reader records in column batches via validate_rows.
+
+    Yields (ok, row) in input order exactly like validating DictReader rows
+    one by one with validate_row; dicts for rejected rows are only built
+    for the rows that are rejected.
+    """
+    index = {name: i for i, name in enumerate(fieldnames)}
+    wanted = [(name, index[name]) for name in CLEANED_FIELDS if name in index]
+    batch: List[List[str]] = []
+
+    def flush() -> Iterator[Tuple[bool, Dict[str, Any]]]:
+        columns = {
+            name: [rec[i] if i < len(rec) else None for rec in batch]
+            for name, i in wanted
+        }
+        cleaned, rejected = validate_rows(columns)
+        out: List[Any] = [None] * len(batch)
+        for i, row in cleaned:
+            out[i] = (True, row)
+        for i, err in rejected:
+            row = _as_dict(fieldnames, batch[i])
+            row["error"] = err
+            out[i] = (False, row)
+        batch.clear()
+        return iter(out)
+
+    for rec in records:
+        if not rec:
+            continue
+        batch.append(rec)
+        if len(batch) >= batch_rows:
+            yield from flush()
+    if batch:
+        yield from flush()
+
+
+def iter_validated_rows(
+    csv_path: str, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[bool, Dict[str, Any]]]:
+    """Yield (ok, row) for every CSV row without buffering the file.
+
+    ok rows are the cleaned dicts from validate_row; rejected rows are the
+    original dicts with an added 'error' key. A non-zero start (a record
+    boundary past the header) and/or end limit reading to that byte range.
+    """
+    fieldnames = read_header(csv_path)[0] if start else None
+    with open_byte_range(csv_path, start, end) as f:
+        reader = csv.reader(f)
+        if fieldnames is None:
+            fieldnames = next(reader, [])
+        yield from validate_records(reader, fieldnames)
+
+
+def is_header_repeat(row: Dict[str, Any]) -> bool:
+    """True for a rejected row that is the header line again (exports concatenated with their headers)."""
+    return all(k == v for k, v in row.items() if k != "error")
+
+
+def reason_label(error: str) -> str:
+    """Rejection reason without the offending value (e.g. float()'s ": 'abc'"), for metrics."""
+    return error.split(":", 1)[0]
+
+
+@timed("ingest_csv")
+def ingest_csv(
+    csv_path: str,
+    output_dir: str,
+    sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+    workers: int = 1,
+    start: int = 0,
+    end: Optional[int] = None,
+    dedup: bool = False,
+) -> Tuple[Path, Path]:
     """Read CSV, validate rows, write cleaned + rejected CSV.
 
     Outputs:
       - cleaned_expenses.csv
       - rejected_rows.csv
 
-    TODO:
-    - Use csv.DictReader for reading
-    - For rejected rows: include an 'error' column with reason
-    - Log counts
-    - Return output Paths (cleaned_path, rejected_path)
+    Rows are streamed straight to both writers, so memory use does not grow
+    with the input. If sink is given, every cleaned row is also passed to it
+    (e.g. ExpenseAccumulator.add) in input order.
+
+    With workers > 1 the file is split into newline-aligned byte ranges that
+    are validated in a process pool; output keeps the original row order.
+
+    With start > 0 only the bytes from start (up to end) are read and the
+    resulting rows are appended to the existing outputs.
+
+    Cleaned rows are also written to the columnar store
+    (cleaned_expenses.cols/) that analyze prefers over re-parsing the CSV,
+    and folded into the day/week/month rollups (rollups.json). The query
+    indexes (cleaned_expenses.idx/) are only marked stale: the first query
+    after the store changes rebuilds them, so appends and watch refreshes
+    do not pay for a full re-sort.
+
+    With dedup, the k-th copy in this export of a row (same date, amount
+    and normalized category/description) goes to duplicate_rows.csv
+    instead of the cleaned outputs and sink if the rows already kept hold k
+    copies of it (see pda.dedup.Deduper). A repeated header line starts a
+    new export. The keys of kept rows persist in cleaned_expenses.fp/, and
+    while they exist every ingest, full or not, appends to the outputs: a
+    new export file is checked against everything ingested before.
     """
     out_dir = ensure_dir(output_dir)
     cleaned_path = out_dir / "cleaned_expenses.csv"
     rejected_path = out_dir / "rejected_rows.csv"
 
-    cleaned_rows: List[Dict[str, str]] = []
-    rejected_rows: List[Dict[str, str]] = []
-
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            ok, cleaned, err = validate_row(row)
-            if ok and cleaned:
-                cleaned_rows.append(cleaned)
-            else:
-                row = dict(row)
-                row["error"] = err or "Unknown error"
-                rejected_rows.append(row)
-
-    # TODO: write cleaned_path (columns: date, amount, category, description)
-    with open(cleaned_path,'w') as file:
-        write = csv.DictWriter(file,fieldnames=['date','amount','category','description'])
-        write.writeheader()
-        for rows in cleaned_rows:
-            write.writerow({'date':rows['date'],'amount':rows['amount'],'category':rows['category'],'description':rows['description']})
-    # TODO: write rejected_path (original columns + error)
-    with open(rejected_path,'w') as file:
-        write = csv.DictWriter(file,fieldnames=['date','amount','category','description','error'])
-        write.writeheader()
-        for rows in rejected_rows:
-            write.writerow({'date':rows['date'],'amount':rows['amount'],'category':rows['category'],'description':rows['description'],'error':rows['error']})
-
-    logging.info("Ingest CSV: cleaned=%s rejected=%s", len(cleaned_rows), len(rejected_rows))
+    n_cleaned = 0
+    n_rejected = 0
+    reasons: Dict[str, int] = {}
+    append = bool(start) or (dedup and has_history(output_dir))
+    mode = "a" if append else "w"
+    written_before = file_size(cleaned_path) + file_size(rejected_path) if append else 0
+
+    store = ColumnarWriter(out_dir / STORE_NAME, append=append)
+    invalidate_index(cleaned_path)
+    rollups = load_rollups(output_dir) if append else Rollups()
+    deduper = None
+    if dedup:
+        n_bytes = (file_size(csv_path) if end is None else end) - start
+        deduper = Deduper(output_dir, append=append, expected_rows=estimate_rows(n_bytes))
+    elif not start:
+        remove_dedup_outputs(output_dir)
+    keep = deduper.is_new if deduper is not None else None
+    new_export = deduper.new_export if deduper is not None else None
+
+    def emit(row: Dict[str, Any]) -> None:
+        store.add(row)
+        rollups.add(row)
+        if sink is not None:
+            sink(row)
+
+    with open(cleaned_path, mode, newline="", encoding="utf-8") as cf, \
+            open(rejected_path, mode, newline="", encoding="utf-8") as rf:
+        cleaned_writer = csv.DictWriter(cf, fieldnames=CLEANED_FIELDS, extrasaction="ignore")
+        rejected_writer = csv.DictWriter(rf, fieldnames=REJECTED_FIELDS, extrasaction="ignore")
+        if not append:
+            cleaned_writer.writeheader()
+            rejected_writer.writeheader()
+
+        if workers > 1:
+            n_cleaned, n_rejected = ingest_parallel(
+                csv_path, cf, rf, workers, sink=emit, start=start or None, end=end, reasons=reasons, keep=keep,
+                new_export=new_export,
+            )
+        else:
+            for ok, row in iter_validated_rows(csv_path, start, end):
+                if ok:
+                    if keep is not None and not keep(row):
+                        continue
+                    cleaned_writer.writerow(row)
+                    n_cleaned += 1
+                    emit(row)
+                elif new_export is not None and is_header_repeat(row):
+                    new_export()
+                else:
+                    rejected_writer.writerow(row)
+                    n_rejected += 1
+                    reason = reason_label(row["error"])
+                    reasons[reason] = reasons.get(reason, 0) + 1
+
+    store.close(cleaned_path)
+    if deduper is not None:
+        deduper.close(cleaned_path)
+        incr("pda_rows_total", deduper.duplicates, stage="ingest_csv", result="duplicate")
+    rollups.save(out_dir / ROLLUPS_NAME, cleaned_path)
+    incr("pda_rows_total", n_cleaned, stage="ingest_csv", result="cleaned")
+    incr("pda_rows_total", n_rejected, stage="ingest_csv", result="rejected")
+    for reason, n in reasons.items():
+        incr("pda_rows_rejected_total", n, reason=reason)
+    incr("pda_bytes_read_total", (file_size(csv_path) if end is None else end) - start, stage="ingest_csv")
+    incr("pda_bytes_written_total", file_size(cleaned_path) + file_size(rejected_path) - written_before, stage="ingest_csv")
+    if deduper is not None:
+        logging.info("Ingest CSV: cleaned=%s rejected=%s duplicates=%s", n_cleaned, n_rejected, deduper.duplicates)
+    else:
+        logging.info("Ingest CSV: cleaned=%s rejected=%s", n_cleaned, n_rejected)
     return cleaned_path, rejected_path
 
 
-def ingest_notes(notes_path: str, output_dir: str) -> Path:
+def extract_notes(lines: Iterable[str], matcher: Optional[NoteMatcher] = None) -> dict:
+    """Extract action items, hashtag topics and the line count from note lines."""
+    scan = (matcher or NoteMatcher()).scan
+    action_items: List[str] = []
+    topics: Dict[str, int] = {}
+    total_lines = 0
+
+    for line in lines:
+        total_lines += 1
+        s = line.strip()
+        if not s:
+            continue
+
+        is_action, tags = scan(s)
+        if is_action:
+            action_items.append(s)
+        for token in tags:
+            topics[token] = topics.get(token, 0) + 1
+
+    return {
+        "action_items": action_items,
+        "topics": topics,
+        "total_lines": total_lines,
+    }
+
+
+def merge_notes(base: dict, extra: dict) -> dict:
+    """Append extra's notes payload to base (base's topics keep their order)."""
+    topics = dict(base.get("topics", {}))
+    for t, c in extra.get("topics", {}).items():
+        topics[t] = topics.get(t, 0) + c
+    return {
+        "action_items": list(base.get("action_items", [])) + list(extra.get("action_items", [])),
+        "topics": topics,
+        "total_lines": base.get("total_lines", 0) + extra.get("total_lines", 0),
+    }
+
+
+@timed("ingest_notes")
+def ingest_notes(
+    notes_path: str,
+    output_dir: str,
+    start: int = 0,
+    end: Optional[int] = None,
+    keywords: Optional[Iterable[str]] = None,
+    workers: int = 1,
+) -> Path:
     """Read notes.txt and extract action items + hashtag topics.
 
     Output:
@@ -70,42 +290,31 @@ def ingest_notes(notes_path: str, output_dir: str) -> Path:
           topics: dict[str,int]
           total_lines: int
 
-    TODO:
-    - Extract action items by keyword match (case-insensitive)
-    - Extract topics as hashtags (#finance, #health, etc.)
-    - Log how many action items were found
+    With start > 0 only the bytes from start (up to end) are read and the
+    result is folded into the existing notes_extracted.json. keywords
+    replaces the default ACTION_KEYWORDS.
+
+    notes_path may also be a directory or glob of note files; see
+    notes_parallel.ingest_notes_many.
     """
+    if is_multi_notes(notes_path):
+        return ingest_notes_many(notes_path, output_dir, keywords=keywords, workers=workers)[0]
+
     out_dir = ensure_dir(output_dir)
     out_path = out_dir / "notes_extracted.json"
 
-    action_items: List[str] = []
-    topics: Dict[str, int] = {}
-    total_lines = 0
-
-    with open(notes_path, encoding="utf-8") as f:
-        for line in f:
-            total_lines += 1
-            s = line.strip()
-            if not s:
-                continue
-
-            upper = s.upper()
-            if any(k in upper for k in ACTION_KEYWORDS):
-                action_items.append(s)
+    with open_byte_range(notes_path, start, end) as f:
+        payload = extract_notes(f, NoteMatcher(keywords))
+    n_lines = payload["total_lines"]
 
-            for token in s.split():
-                if token.startswith("#") and len(token) > 1:
-                    topics[token] = topics.get(token, 0) + 1
+    if start and out_path.exists():
+        payload = merge_notes(json.loads(out_path.read_text(encoding="utf-8")), payload)
 
-    payload = {
-        "action_items": action_items,
-        "topics": topics,
-        "total_lines": total_lines,
-    }
-
-    # TODO: write payload to out_path as JSON (pretty-printed)
-    out_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False),encoding="utf-8")
-    logging.info("Ingest notes: action_items=%s topics=%s", len(action_items), len(topics))
+    out_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    incr("pda_rows_total", n_lines, stage="ingest_notes", result="lines")
+    incr("pda_bytes_read_total", (file_size(notes_path) if end is None else end) - start, stage="ingest_notes")
+    incr("pda_bytes_written_total", file_size(out_path), stage="ingest_notes")
+    logging.info("Ingest notes: action_items=%s topics=%s", len(payload["action_items"]), len(payload["topics"]))
     return out_path
 
 
@@ -127,16 +336,195 @@ def load_profile(profile_path: str | None) -> dict:
         return {}
 
 
-def run_ingest(csv_path: str, notes_path: str, profile_path: str | None, output_dir: str) -> dict:
+def run_ingest(
+    csv_path: str,
+    notes_path: str,
+    profile_path: str | None,
+    output_dir: str,
+    workers: int = 1,
+    incremental: bool = False,
+    dedup: bool = False,
+) -> dict:
     """Run ingestion for all inputs and return a small manifest dict."""
-    cleaned_path, rejected_path = ingest_csv(csv_path, output_dir)
-    notes_out = ingest_notes(notes_path, output_dir)
-    profile = load_profile(profile_path)
+    if incremental:
+        return run_ingest_incremental(csv_path, notes_path, profile_path, output_dir, workers=workers, dedup=dedup)
+
+    clear_manifest(output_dir)
+    stages = ingest_stages(csv_path, notes_path, profile_path, output_dir, workers, dedup=dedup)
+    results = {r.name: r.value for r in run_stages(stages)}
+    cleaned_path, rejected_path = results["ingest_csv"]
 
     manifest = {
+        "cleaned_csv": str(cleaned_path),
+        "rejected_csv": str(rejected_path),
+        "notes_json": str(results["ingest_notes"]),
+        "profile_loaded": bool(results["profile"]),
+    }
+    if dedup:
+        manifest["duplicates_csv"] = str(Path(output_dir) / DUPLICATES_NAME)
+    return manifest
+
+
+def ingest_stages(
+    csv_path: str, notes_path: str, profile_path: str | None, output_dir: str, workers: int = 1, dedup: bool = False
+) -> List[Stage]:
+    """Stages of a full ingest: the CSV runs alongside profile load -> notes.
+
+    Notes depend on the profile only for its action keywords, so they are
+    keyed on the profile file's contents; a notes directory/glob is keyed
+    on the files it currently matches. The columnar store and indexes are
+    not declared outputs: readers check them against the cleaned CSV.
+    """
+    out_dir = Path(output_dir)
+    cleaned = out_dir / "cleaned_expenses.csv"
+    notes_inputs = [str(p) for p in resolve_notes_paths(notes_path)] if is_multi_notes(notes_path) else [notes_path]
+
+    def csv_stage(_: dict) -> Tuple[Path, Path]:
+        return ingest_csv(csv_path, output_dir, workers=workers, dedup=dedup)
+
+    def notes_stage(results: dict) -> Path:
+        keywords = keywords_from_profile(results["profile"])
+        return ingest_notes(notes_path, output_dir, keywords=keywords, workers=workers)
+
+    return [
+        Stage("profile", lambda _: load_profile(profile_path)),
+        Stage(
+            "ingest_csv",
+            csv_stage,
+            inputs=[csv_path],
+            outputs=[cleaned, out_dir / "rejected_rows.csv", out_dir / ROLLUPS_NAME]
+            + ([out_dir / DUPLICATES_NAME] if dedup else []),
+            params={"dedup": dedup},
+        ),
+        Stage(
+            "ingest_notes",
+            notes_stage,
+            deps=["profile"],
+            inputs=notes_inputs + [profile_path],
+            outputs=[out_dir / "notes_extracted.json"],
+            params={"notes": notes_path},
+        ),
+    ]
+
+
+def _log_held_back(path: str, end: int) -> None:
+    held = os.path.getsize(path) - end
+    if held:
+        logging.info("Leaving %s trailing bytes of %s for the next run (no final newline yet)", held, path)
+
+
+def run_ingest_incremental(
+    csv_path: str,
+    notes_path: str,
+    profile_path: str | None,
+    output_dir: str,
+    workers: int = 1,
+    dedup: bool = False,
+) -> dict:
+    """Ingest only what changed since the last incremental run (see ingest_incremental)."""
+    result, _ = ingest_incremental(csv_path, notes_path, profile_path, output_dir, workers=workers, dedup=dedup)
+    return result
+
+
+def ingest_incremental(
+    csv_path: str,
+    notes_path: str,
+    profile_path: str | None,
+    output_dir: str,
+    workers: int = 1,
+    acc: Optional[ExpenseAccumulator] = None,
+    dedup: bool = False,
+) -> Tuple[dict, Optional[ExpenseAccumulator]]:
+    """Ingest only what changed since the last incremental run; returns (result, accumulator).
+
+    ingest_manifest.json in output_dir records size, mtime, processed byte
+    offset and a hash of the processed prefix for each input. Appended bytes
+    are validated and folded into the existing cleaned/rejected CSVs, notes
+    JSON and the saved ExpenseAccumulator state (expense_state.json); a
+    rewritten input is re-ingested in full; unchanged inputs are skipped.
+    Reading stops at the last complete record/line, so a trailing one that
+    is still being written is picked up by a later run instead.
+
+    A long-running caller (see pda.watch) passes its in-memory acc to skip
+    reloading expense_state.json and keeps the returned accumulator, which
+    matches the cleaned CSV (acc as given if the CSV is unchanged). result
+    is JSON-ready. Switching dedup on or off re-ingests the CSV in full.
+    """
+    out_dir = ensure_dir(output_dir)
+    prev = load_manifest(output_dir)
+    profile = load_profile(profile_path)
+    keywords = keywords_from_profile(profile)
+    cleaned_path = out_dir / "cleaned_expenses.csv"
+    rejected_path = out_dir / "rejected_rows.csv"
+    notes_out = out_dir / "notes_extracted.json"
+    state_path = out_dir / STATE_NAME
+
+    have_csv_outputs = cleaned_path.exists() and rejected_path.exists() and state_path.exists()
+    same_dedup = bool(prev.get("dedup")) == dedup
+    csv_action, csv_offset = plan_input(csv_path, prev.get("csv")) if have_csv_outputs and same_dedup else ("full", 0)
+    multi_notes = is_multi_notes(notes_path)
+    if multi_notes or not notes_out.exists() or prev.get("action_keywords") != keywords:
+        notes_action, notes_offset = "full", 0
+    else:
+        notes_action, notes_offset = plan_input(notes_path, prev.get("notes"))
+
+    manifest = dict(prev)
+    if csv_action != "unchanged":
+        # stop at the last complete record; a half-written row waits for the next run
+        end = complete_records_end(csv_path, csv_offset)
+        if csv_action == "append" and end <= csv_offset:
+            csv_action = "unchanged"
+            manifest["csv"] = fingerprint(csv_path, csv_offset)
+        _log_held_back(csv_path, end)
+    if csv_action != "unchanged":
+        if csv_action == "append":
+            if acc is None:
+                acc = ExpenseAccumulator.from_state(json.loads(state_path.read_text(encoding="utf-8")))
+        else:
+            if not (dedup and has_history(output_dir)):
+                acc = ExpenseAccumulator()
+            elif acc is None:
+                # another export joins the --dedup history: carry on from the rows kept so far
+                acc = ExpenseAccumulator.from_rows(iter_cleaned_expenses(str(cleaned_path)))
+            csv_offset = 0
+        ingest_csv(csv_path, output_dir, sink=acc.add, workers=workers, start=csv_offset, end=end, dedup=dedup)
+        write_json_atomic(state_path, acc.to_state())
+        manifest["csv"] = fingerprint(csv_path, end)
+        manifest["dedup"] = dedup
+
+    if multi_notes:
+        # Per-file results are cached by content hash, so re-merging is cheap;
+        # the digest of the file listing tells whether anything changed.
+        had_notes = notes_out.exists() and prev.get("action_keywords") == keywords
+        _, digest = ingest_notes_many(notes_path, output_dir, keywords=keywords, workers=workers)
+        if had_notes and prev.get("notes_digest") == digest:
+            notes_action = "unchanged"
+        manifest["notes_digest"] = digest
+        manifest["action_keywords"] = keywords
+    elif notes_action != "unchanged":
+        start = notes_offset if notes_action == "append" else 0
+        end = complete_lines_end(notes_path, start)
+        _log_held_back(notes_path, end)
+        if notes_action == "append" and end <= start:
+            notes_action = "unchanged"
+        else:
+            ingest_notes(notes_path, output_dir, start=start, end=end, keywords=keywords)
+            manifest["action_keywords"] = keywords
+        manifest["notes"] = fingerprint(notes_path, end)
+    changed = csv_action != "unchanged" or notes_action != "unchanged"
+    if changed or manifest != prev:
+        save_manifest(output_dir, manifest)
+    logging.info("Incremental ingest: csv=%s notes=%s", csv_action, notes_action)
+
+    result = {
         "cleaned_csv": str(cleaned_path),
         "rejected_csv": str(rejected_path),
         "notes_json": str(notes_out),
         "profile_loaded": bool(profile),
+        "csv_action": csv_action,
+        "notes_action": notes_action,
+        "changed": changed,
     }
-    return manifest
+    if dedup:
+        result["duplicates_csv"] = str(out_dir / DUPLICATES_NAME)
+    return result, acc
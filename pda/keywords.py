@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_ACTION_KEYWORDS = ("TODO", "ACTION", "FOLLOW UP", "FOLLOW-UP", "NEXT")
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """Regex alternation for words with common prefixes factored out.
+
+    The regex engine then walks one branch per shared prefix instead of
+    trying every keyword at every position, so matching cost grows with the
+    length of the matched prefix rather than the number of keywords.
+    """
+    trie: Dict[str, dict] = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        ends = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not ends:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if ends else body
+
+    return build(trie)
+
+
+HASHTAG_PATTERN = re.compile(r"(?<!\S)#\S+")
+
+
+class NoteMatcher:
+    """Finds action keywords and #hashtags in a note line.
+
+    All keywords are compiled into a single prefix-trie regex that is run
+    once over the uppercased line, so `k in line.upper()` semantics are kept
+    while the cost no longer grows linearly with the number of keywords.
+    Hashtags (whitespace-delimited tokens starting with '#', at least two
+    characters, as in `line.split()`) are found with one regex, and only on
+    lines that contain a '#'.
+    """
+
+    def __init__(self, keywords: Optional[Iterable[str]] = None) -> None:
+        words = DEFAULT_ACTION_KEYWORDS if keywords is None else keywords
+        self.keywords: Tuple[str, ...] = tuple(dict.fromkeys(w.upper() for w in words if w))
+        self._search = re.compile(_trie_regex(self.keywords)).search if self.keywords else None
+
+    def scan(self, line: str) -> Tuple[bool, List[str]]:
+        """Return (has_action_keyword, hashtags) for one stripped line."""
+        is_action = self._search is not None and self._search(line.upper()) is not None
+        tags = HASHTAG_PATTERN.findall(line) if "#" in line else []
+        return is_action, tags
+
+
+def keywords_from_profile(profile: dict) -> Optional[List[str]]:
+    """Extra action keywords from profile.json ("action_keywords"), added to the defaults."""
+    extra = profile.get("action_keywords")
+    if not isinstance(extra, list):
+        return None
+    return list(DEFAULT_ACTION_KEYWORDS) + [str(k) for k in extra]
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .utils import atomic_write_text
+
+MANIFEST_NAME = "ingest_manifest.json"
+STATE_NAME = "expense_state.json"
+MANIFEST_VERSION = 1
+
+_HASH_BLOCK = 1024 * 1024
+
+
+def sha256_prefix(path: str, length: int) -> str:
+    """Hex sha256 of the first length bytes of path."""
+    h = hashlib.sha256()
+    left = length
+    with open(path, "rb") as f:
+        while left > 0:
+            buf = f.read(min(_HASH_BLOCK, left))
+            if not buf:
+                break
+            h.update(buf)
+            left -= len(buf)
+    return h.hexdigest()
+
+
+def fingerprint(path: str, offset: int) -> dict:
+    """Manifest entry for an input processed up to byte offset."""
+    st = os.stat(path)
+    return {
+        "path": str(Path(path).resolve()),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "offset": offset,
+        "sha256": sha256_prefix(path, offset),
+    }
+
+
+def complete_lines_end(path: str, start: int = 0, end: Optional[int] = None) -> int:
+    """Offset just past the last newline in [start, end) of path, or start if there is none.
+
+    A trailing line without its newline may still be being written, so
+    incremental runs stop before it and pick it up once it is complete.
+    """
+    end = os.path.getsize(path) if end is None else end
+    pos = end
+    with open(path, "rb") as f:
+        while pos > start:
+            size = min(_HASH_BLOCK, pos - start)
+            f.seek(pos - size)
+            j = f.read(size).rfind(b"\n")
+            if j != -1:
+                return pos - size + j + 1
+            pos -= size
+    return start
+
+
+def plan_input(path: str, entry: Optional[dict]) -> Tuple[str, int]:
+    """Decide how to process an input given its previous manifest entry.
+
+    Returns (action, offset):
+      - ("unchanged", offset): same size and mtime as last time; nothing to do
+        (bytes past offset, if any, are an unfinished trailing record)
+      - ("append", offset): the file grew and its first offset bytes still
+        hash the same, so only bytes from offset on are new
+      - ("full", 0): first run, rewritten or truncated input
+    When size and mtime both match only a stat() is needed; otherwise the
+    previously processed prefix is re-hashed.
+    """
+    if not entry or entry.get("path") != str(Path(path).resolve()):
+        return "full", 0
+    st = os.stat(path)
+    offset = entry.get("offset", 0)
+    if st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns"):
+        return "unchanged", offset
+    if st.st_size >= offset and sha256_prefix(path, offset) == entry.get("sha256"):
+        return ("append" if st.st_size > offset else "unchanged"), offset
+    return "full", 0
+
+
+def load_manifest(output_dir: str) -> dict:
+    """Load the ingest manifest from output_dir ({} if missing or unreadable)."""
+    p = Path(output_dir) / MANIFEST_NAME
+    if not p.exists():
+        return {}
+    try:
+        manifest = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def write_json_atomic(path: Path, payload: dict) -> Path:
+    """Write JSON via a temp file + rename so readers never see a partial file."""
+    return atomic_write_text(path, json.dumps(payload, ensure_ascii=False))
+
+
+def save_manifest(output_dir: str, manifest: dict) -> Path:
+    return write_json_atomic(Path(output_dir) / MANIFEST_NAME, {**manifest, "version": MANIFEST_VERSION})
+
+
+def clear_manifest(output_dir: str) -> None:
+    """Forget incremental state, e.g. after a full non-incremental ingest."""
+    for name in (MANIFEST_NAME, STATE_NAME):
+        p = Path(output_dir) / name
+        if p.exists():
+            p.unlink()
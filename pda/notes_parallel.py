@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .keywords import NoteMatcher
+from .manifest import write_json_atomic
+from .utils import ensure_dir
+
+NOTES_CACHE_DIR = ".notes_cache"
+NOTE_SUFFIXES = (".txt", ".md")
+_GLOB_CHARS = set("*?[")
+
+
+def is_multi_notes(spec: str) -> bool:
+    """True if spec names a directory or a glob rather than one notes file.
+
+    An existing file is always a single notes file, even if its name
+    contains glob characters (e.g. notes[2024].txt).
+    """
+    p = Path(spec)
+    if p.is_file():
+        return False
+    return p.is_dir() or bool(_GLOB_CHARS & set(spec))
+
+
+def resolve_notes_paths(spec: str) -> List[Path]:
+    """Note files for a directory (recursive *.txt/*.md), glob or single path, in stable order."""
+    p = Path(spec)
+    if p.is_dir():
+        files = [f for f in p.rglob("*") if f.is_file() and f.suffix.lower() in NOTE_SUFFIXES]
+        return sorted(files, key=lambda f: f.relative_to(p).as_posix())
+    if not p.is_file() and _GLOB_CHARS & set(spec):
+        return sorted((Path(f) for f in glob.glob(spec, recursive=True) if os.path.isfile(f)), key=str)
+    return [p]
+
+
+def _sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=8)
+def _matcher(keywords: Optional[Tuple[str, ...]]) -> NoteMatcher:
+    return NoteMatcher(keywords)
+
+
+def extract_notes_file(path: str, keywords: Optional[Tuple[str, ...]] = None) -> dict:
+    """Partial {action_items, topics, total_lines} for one note file; runs in a worker."""
+    from .ingest import extract_notes
+
+    with open(path, encoding="utf-8") as f:
+        return extract_notes(f, _matcher(keywords))
+
+
+class NotesCache:
+    """Per-file partial results keyed by content hash (+ keyword set).
+
+    index.json maps each path to its last (size, mtime_ns, sha256), so files
+    that were not touched are recognized with a stat() instead of a re-hash.
+    """
+
+    def __init__(self, cache_dir: Path, keywords: Optional[Sequence[str]]) -> None:
+        self.dir = ensure_dir(str(cache_dir))
+        sig = json.dumps(list(keywords) if keywords is not None else None)
+        self._kw = hashlib.sha256(sig.encode("utf-8")).hexdigest()[:12]
+        self._index_path = self.dir / "index.json"
+        try:
+            self._index: Dict[str, list] = json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._index = {}
+
+    def content_hash(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path.resolve())
+        entry = self._index.get(key)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        digest = _sha256_file(path)
+        self._index[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def _entry(self, digest: str) -> Path:
+        return self.dir / f"{digest}-{self._kw}.json"
+
+    def get(self, digest: str) -> Optional[dict]:
+        try:
+            return json.loads(self._entry(digest).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def set(self, digest: str, partial: dict) -> None:
+        write_json_atomic(self._entry(digest), partial)
+
+    def save(self) -> None:
+        write_json_atomic(self._index_path, self._index)
+
+
+def ingest_notes_many(
+    spec: str,
+    output_dir: str,
+    keywords: Optional[Sequence[str]] = None,
+    workers: int = 1,
+) -> Tuple[Path, str]:
+    """Extract notes from every file under a directory/glob into one notes_extracted.json.
+
+    Files whose content hash is already cached are not re-read; the rest are
+    processed in a process pool when workers > 1. Partials are merged in
+    sorted path order, so the output does not depend on scheduling. Returns
+    the output path and a digest of the (path, content hash) list.
+    """
+    out_dir = ensure_dir(output_dir)
+    out_path = out_dir / "notes_extracted.json"
+    paths = resolve_notes_paths(spec)
+    kw = tuple(keywords) if keywords is not None else None
+
+    cache = NotesCache(out_dir / NOTES_CACHE_DIR, keywords)
+    digests = [cache.content_hash(p) for p in paths]
+    partials: Dict[str, dict] = {}
+    for d in digests:
+        if d not in partials:
+            cached = cache.get(d)
+            if cached is not None:
+                partials[d] = cached
+
+    n_cached = sum(1 for d in digests if d in partials)
+    todo = list({d: (p, d) for p, d in zip(paths, digests) if d not in partials}.values())
+    if workers > 1 and len(todo) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(todo) // (workers * 4))
+            results = pool.map(extract_notes_file, [str(p) for p, _ in todo], [kw] * len(todo), chunksize=chunksize)
+            for (_, d), partial in zip(todo, results):
+                partials[d] = partial
+                cache.set(d, partial)
+    else:
+        for p, d in todo:
+            partials[d] = extract_notes_file(str(p), kw)
+            cache.set(d, partials[d])
+    cache.save()
+
+    action_items: List[str] = []
+    topics: Dict[str, int] = {}
+    total_lines = 0
+    for d in digests:
+        part = partials[d]
+        action_items.extend(part["action_items"])
+        for t, c in part["topics"].items():
+            topics[t] = topics.get(t, 0) + c
+        total_lines += part["total_lines"]
+    payload = {"action_items": action_items, "topics": topics, "total_lines": total_lines}
+
+    out_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    logging.info(
+        "Ingest notes: files=%s cached=%s action_items=%s topics=%s",
+        len(paths), n_cached, len(payload["action_items"]), len(payload["topics"]),
+    )
+    listing = "\n".join(f"{p.as_posix()}\t{d}" for p, d in zip(paths, digests))
+    return out_path, hashlib.sha256(listing.encode("utf-8")).hexdigest()
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import csv
+import io
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+CHUNK_BYTES = 8 * 1024 * 1024
+_SCAN_BLOCK = 1024 * 1024
+
+
+def find_record_starts(csv_path: str, targets: List[int]) -> List[int]:
+    """Return the offset just past the first record-ending newline at or after each target.
+
+    A newline ends a record when it is outside any quoted field, i.e. it is
+    preceded by an even number of '"' bytes (RFC 4180 escapes a quote as
+    '""', which keeps the parity). Quotes are counted with bytes.count, so
+    the scan runs at memory speed. Targets past the last record map to the
+    file size.
+    """
+    size = os.path.getsize(csv_path)
+    starts: List[int] = []
+    quotes = 0
+    pos = 0
+    ti = 0
+    with open(csv_path, "rb") as f:
+        while ti < len(targets):
+            buf = f.read(_SCAN_BLOCK)
+            if not buf:
+                break
+            i = max(0, targets[ti] - pos)
+            q = quotes + buf.count(b'"', 0, i)
+            while ti < len(targets) and i < len(buf):
+                j = buf.find(b"\n", i)
+                if j == -1:
+                    break
+                q += buf.count(b'"', i, j)
+                i = j + 1
+                if q % 2:
+                    continue
+                start = pos + i
+                while ti < len(targets) and targets[ti] < start:
+                    starts.append(start)
+                    ti += 1
+                if ti < len(targets) and targets[ti] - pos > i:
+                    q += buf.count(b'"', i, targets[ti] - pos)
+                    i = targets[ti] - pos
+            quotes += buf.count(b'"')
+            pos += len(buf)
+    starts.extend([size] * (len(targets) - ti))
+    return starts
+
+
+def complete_records_end(csv_path: str, start: int = 0, end: Optional[int] = None) -> int:
+    """Offset just past the last record-ending newline in [start, end), or start if there is none.
+
+    start must be a record start, since quote parity is counted from there.
+    Bytes after the returned offset are an unfinished record (e.g. a writer
+    caught mid-append) and are left for a later run. Blocks without quotes
+    are settled with one rfind.
+    """
+    end = os.path.getsize(csv_path) if end is None else end
+    last = start
+    quotes = 0
+    pos = start
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        while pos < end:
+            buf = f.read(min(_SCAN_BLOCK, end - pos))
+            if not buf:
+                break
+            if not quotes % 2 and b'"' not in buf:
+                j = buf.rfind(b"\n")
+                if j != -1:
+                    last = pos + j + 1
+            else:
+                i = 0
+                while True:
+                    j = buf.find(b"\n", i)
+                    if j == -1:
+                        break
+                    quotes += buf.count(b'"', i, j)
+                    i = j + 1
+                    if not quotes % 2:
+                        last = pos + i
+                quotes += buf.count(b'"', i)
+            pos += len(buf)
+    return last
+
+
+def read_header(csv_path: str) -> Tuple[List[str], int]:
+    """Return the CSV fieldnames and the byte offset where the first data row starts."""
+    (header_end,) = find_record_starts(csv_path, [0])
+    with open(csv_path, "rb") as f:
+        header_text = f.read(header_end).decode("utf-8")
+    header = next(csv.reader(io.StringIO(header_text, newline="")), [])
+    return header, header_end
+
+
+def split_byte_ranges(
+    csv_path: str, n_chunks: int, start: Optional[int] = None, end: Optional[int] = None
+) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Split a CSV into newline-aligned (start, end) byte ranges after the header.
+
+    start/end restrict the split to part of the file (start must be a record
+    start, e.g. a previously recorded end offset).
+    """
+    header, header_end = read_header(csv_path)
+    start = header_end if start is None else max(start, header_end)
+    end = os.path.getsize(csv_path) if end is None else end
+
+    body = max(0, end - start)
+    n_chunks = max(1, n_chunks)
+    targets = [start + body * k // n_chunks for k in range(1, n_chunks)]
+    bounds = [start] + [min(b, end) for b in find_record_starts(csv_path, targets)] + [end]
+    ranges = [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+    return header, ranges
+
+
+def validate_chunk(
+    csv_path: str, fieldnames: List[str], start: int, end: int, want_rows: bool, split_exports: bool = False
+) -> Tuple[str, str, List[Optional[Dict[str, Any]]], int, Dict[str, int], float]:
+    """Validate one byte range; runs in a worker process.
+
+    Returns the rendered cleaned and rejected CSV text (no header), the
+    cleaned dicts when want_rows is set, the cleaned count, rejected counts
+    per reason_label and the elapsed seconds. With split_exports a repeated
+    header line is not rejected but marked by a None in the cleaned dicts.
+    """
+    t0 = time.perf_counter()
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    from .ingest import CLEANED_FIELDS, REJECTED_FIELDS, is_header_repeat, reason_label, validate_records
+
+    cleaned_buf = io.StringIO(newline="")
+    rejected_buf = io.StringIO(newline="")
+    cleaned_writer = csv.DictWriter(cleaned_buf, fieldnames=CLEANED_FIELDS, extrasaction="ignore")
+    rejected_writer = csv.DictWriter(rejected_buf, fieldnames=REJECTED_FIELDS, extrasaction="ignore")
+    rows: List[Optional[Dict[str, Any]]] = []
+    n_cleaned = 0
+    reasons: Dict[str, int] = {}
+
+    for ok, row in validate_records(csv.reader(io.StringIO(text, newline="")), fieldnames):
+        if ok:
+            cleaned_writer.writerow(row)
+            n_cleaned += 1
+            if want_rows:
+                rows.append(row)
+        elif split_exports and is_header_repeat(row):
+            rows.append(None)
+        else:
+            rejected_writer.writerow(row)
+            reason = reason_label(row["error"])
+            reasons[reason] = reasons.get(reason, 0) + 1
+
+    return cleaned_buf.getvalue(), rejected_buf.getvalue(), rows, n_cleaned, reasons, time.perf_counter() - t0
+
+
+def iter_chunk_results(
+    csv_path: str,
+    workers: int,
+    want_rows: bool,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    chunk_bytes: int = CHUNK_BYTES,
+    split_exports: bool = False,
+) -> Iterator[Tuple[str, str, List[Optional[Dict[str, Any]]], int, Dict[str, int]]]:
+    """Validate csv_path across a process pool, yielding chunk results in file order.
+
+    At most 2*workers chunks are in flight, so memory is bounded by the chunk
+    size rather than the file size.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    size = (os.path.getsize(csv_path) if end is None else end) - (start or 0)
+    n_chunks = max(workers, -(-size // chunk_bytes))
+    header, ranges = split_byte_ranges(csv_path, n_chunks, start, end)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque[Tuple[int, Tuple[int, int], Future]] = deque()
+        todo = iter(enumerate(ranges))
+
+        def submit_next() -> None:
+            item = next(todo, None)
+            if item is not None:
+                idx, (start, end) = item
+                fut = pool.submit(validate_chunk, csv_path, header, start, end, want_rows, split_exports)
+                pending.append((idx, (start, end), fut))
+
+        for _ in range(2 * workers):
+            submit_next()
+        while pending:
+            idx, (start, end), fut = pending.popleft()
+            cleaned_text, rejected_text, rows, n_cleaned, reasons, secs = fut.result()
+            submit_next()
+            n_rows = n_cleaned + sum(reasons.values())
+            logging.info(
+                "Ingest chunk %s/%s: bytes=%s rows=%s %.1f MB/s %.0f rows/s",
+                idx + 1, len(ranges), end - start, n_rows,
+                (end - start) / 1e6 / secs if secs else 0.0,
+                n_rows / secs if secs else 0.0,
+            )
+            yield cleaned_text, rejected_text, rows, n_cleaned, reasons
+
+
+def ingest_parallel(
+    csv_path: str,
+    cleaned_file: Any,
+    rejected_file: Any,
+    workers: int,
+    sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    reasons: Optional[Dict[str, int]] = None,
+    keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    new_export: Optional[Callable[[], None]] = None,
+) -> Tuple[int, int]:
+    """Write validated rows from a parallel run to already-open output files.
+
+    reasons, if given, is updated with rejection counts per reason_label.
+    keep, if given, is asked about every cleaned row in input order; rows
+    it turns down are left out of the cleaned file and the sink. new_export
+    (only used together with keep) is called in order at each repeated
+    header line instead of rejecting it.
+    """
+    from .ingest import CLEANED_FIELDS
+
+    n_cleaned = n_rejected = 0
+    cleaned_writer = csv.DictWriter(cleaned_file, fieldnames=CLEANED_FIELDS, extrasaction="ignore")
+    results = iter_chunk_results(
+        csv_path, workers, sink is not None or keep is not None, start=start, end=end,
+        split_exports=keep is not None and new_export is not None,
+    )
+    for cleaned_text, rejected_text, rows, c, chunk_reasons in results:
+        if keep is not None:
+            kept = []
+            for row in rows:
+                if row is None:
+                    new_export()
+                elif keep(row):
+                    kept.append(row)
+            rows = kept
+            cleaned_writer.writerows(rows)
+            c = len(rows)
+        else:
+            cleaned_file.write(cleaned_text)
+        rejected_file.write(rejected_text)
+        n_cleaned += c
+        n_rejected += sum(chunk_reasons.values())
+        if reasons is not None:
+            for reason, n in chunk_reasons.items():
+                reasons[reason] = reasons.get(reason, 0) + n
+        if sink is not None:
+            for row in rows:
+                sink(row)
+    return n_cleaned, n_rejected
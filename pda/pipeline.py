@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional, Union
+
+from .analyze import analyze_notes, iter_cleaned_expenses, run_analyze, write_summary
+from .anomaly import anomaly_rule_from, apply_anomaly_rule
+from .dag import STAGES_NAME, Stage, StageResult, run_stages
+from .dedup import has_history
+from .ingest import ingest_csv, ingest_notes, ingest_stages, load_profile
+from .keywords import keywords_from_profile
+from .manifest import clear_manifest
+from .stats import ExpenseAccumulator
+from .summary_io import ENRICHMENT_NAME, find_summary, resolve_format, summary_path_in
+from .utils import ensure_dir
+
+
+def run_streaming(
+    csv_path: str,
+    notes_path: str,
+    profile_path: str | None,
+    output_dir: str,
+    workers: int = 1,
+    anomaly: Union[None, str, dict] = None,
+    pretty: bool = False,
+    fmt: str = "json",
+    dedup: bool = False,
+) -> Path:
+    """Single-pass ingest → analyze that never materializes the row lists.
+
+    Validated rows go straight to the cleaned/rejected writers and into an
+    ExpenseAccumulator, whose anomaly candidates normally settle the default
+    rule on their own: the cleaned CSV is streamed back only if a row dropped
+    from the candidates exceeds the final threshold (see
+    ExpenseAccumulator.result's rescan), or by a non-default anomaly rule,
+    which makes its own passes. Writes the same artifacts as run_ingest +
+    run_analyze and returns the summary.json path. anomaly (or else the
+    profile's "anomaly_rule") selects the anomaly rule; dedup drops
+    repeated transactions as in ingest_csv, adding to the rows kept before.
+    """
+    clear_manifest(output_dir)
+    if dedup and has_history(output_dir):
+        # the ingest appends to the rows kept by earlier --dedup runs
+        acc = ExpenseAccumulator.from_rows(iter_cleaned_expenses(str(Path(output_dir) / "cleaned_expenses.csv")))
+    else:
+        acc = ExpenseAccumulator()
+    profile = load_profile(profile_path)
+    cleaned_path, _ = ingest_csv(csv_path, output_dir, sink=acc.add, workers=workers, dedup=dedup)
+    notes_out = ingest_notes(notes_path, output_dir, keywords=keywords_from_profile(profile))
+
+    rule = anomaly_rule_from(anomaly if anomaly is not None else profile.get("anomaly_rule"))
+    rescan = lambda: iter_cleaned_expenses(str(cleaned_path))  # noqa: E731
+    combined = {
+        "expenses": apply_anomaly_rule(acc.result(rescan=rescan), rule, rescan),
+        "notes": analyze_notes(str(notes_out)),
+    }
+    return write_summary(output_dir, combined, pretty=pretty, fmt=fmt)
+
+
+def run_pipeline(
+    csv_path: str,
+    notes_path: str,
+    profile_path: str | None,
+    output_dir: str,
+    report_path: str,
+    api: Optional[str] = None,
+    cache_dir: str = "cache",
+    workers: int = 1,
+    anomaly: Union[None, str, dict] = None,
+    pretty: bool = False,
+    fmt: str = "json",
+    report_options: Optional[dict] = None,
+    dedup: bool = False,
+) -> List[StageResult]:
+    """ingest -> analyze -> (enrich) -> report as a stage graph with cached outputs.
+
+    Stage keys live in output_dir/stage_cache.json; a stage whose inputs,
+    parameters and code are unchanged since it last ran (and whose outputs
+    are untouched) is skipped. Enrichment always runs (its HTTP responses
+    have their own cache), and the report is only rebuilt when the summary
+    or enrichment content changed. report_options are passed on to
+    generate_report (formats, max_rows, paginate). Returns each stage's
+    result for --explain.
+    """
+    from .enrich import run_enrich
+    from .report import generate_report, report_outputs
+
+    report_options = report_options or {}
+    out_dir = ensure_dir(output_dir)
+    clear_manifest(output_dir)
+    enrichment = out_dir / ENRICHMENT_NAME
+    if not api:
+        # the report should not pick up enrichment from an earlier --api run
+        enrichment.unlink(missing_ok=True)
+    summary_path = summary_path_in(output_dir, resolve_format(fmt))
+
+    stages = ingest_stages(csv_path, notes_path, profile_path, output_dir, workers, dedup=dedup)
+    stages.append(
+        Stage(
+            "analyze",
+            lambda _: run_analyze(output_dir, anomaly=anomaly, pretty=pretty, fmt=fmt),
+            deps=["ingest_csv", "ingest_notes"],
+            inputs=[out_dir / "cleaned_expenses.csv", out_dir / "notes_extracted.json"],
+            outputs=[summary_path],
+            params={"anomaly": anomaly, "pretty": pretty, "fmt": fmt},
+        )
+    )
+    report_deps = ["analyze"]
+    if api:
+        stages.append(Stage("enrich", lambda _: run_enrich(output_dir, api, cache_dir, profile_path=profile_path), deps=["analyze"]))
+        report_deps.append("enrich")
+    stages.append(
+        Stage(
+            "report",
+            lambda _: generate_report(str(find_summary(output_dir)), report_path, **report_options),
+            deps=report_deps,
+            inputs=[summary_path, enrichment],
+            outputs=list(report_outputs(report_path, report_options.get("formats")).values()),
+            params=report_options,
+        )
+    )
+    return run_stages(stages, cache_path=out_dir / STAGES_NAME)
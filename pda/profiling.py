@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import cProfile
+import logging
+import pstats
+import threading
+import tracemalloc
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from .utils import ensure_dir, set_stage_profiler
+
+ALLOC_FRAMES = 10
+
+
+# allocations made by the profilers themselves are left out of the reports
+_IGNORED = [tracemalloc.__file__, cProfile.__file__, pstats.__file__, __file__]
+
+
+def _own_traces(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces([tracemalloc.Filter(False, f) for f in _IGNORED])
+
+
+class StageProfiler:
+    """cProfile and/or tracemalloc capture for every timed() stage.
+
+    Each stage run writes <n>-<stage>.pstats (cpu) and <n>-<stage>.alloc.txt
+    (mem: the top allocation sites that grew during the stage) to directory.
+    A stage nested in another one on the same thread is covered by the
+    outer stage's capture. tracemalloc is process-wide, so stages running
+    concurrently in other threads show up in each other's allocation
+    reports; work done in worker processes is not captured.
+    """
+
+    def __init__(self, directory: str, cpu: bool = False, mem: bool = False, top: int = 15) -> None:
+        self.directory = ensure_dir(directory)
+        self.cpu = cpu
+        self.mem = mem
+        self.top = top
+        self.pstats_files: List[Path] = []
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self) -> "StageProfiler":
+        if self.mem and not tracemalloc.is_tracing():
+            tracemalloc.start(ALLOC_FRAMES)
+        set_stage_profiler(self)
+        return self
+
+    def stop(self) -> None:
+        set_stage_profiler(None)
+        if self.mem and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            logging.info("tracemalloc: current=%.1f MB peak=%.1f MB", current / 1e6, peak / 1e6)
+            tracemalloc.stop()
+
+    def enter(self, stage: str) -> Optional[Tuple[Any, ...]]:
+        if getattr(self._local, "active", False):
+            return None
+        self._local.active = True
+        before = tracemalloc.take_snapshot() if self.mem else None
+        prof = None
+        if self.cpu:
+            prof = cProfile.Profile()
+            prof.enable()
+        return stage, prof, before
+
+    def exit(self, token: Optional[Tuple[Any, ...]]) -> None:
+        if token is None:
+            return
+        stage, prof, before = token
+        if prof is not None:
+            prof.disable()
+        after = tracemalloc.take_snapshot() if before is not None else None
+        self._local.active = False
+        with self._lock:
+            self._seq += 1
+            base = self.directory / f"{self._seq:02d}-{stage.replace('/', '_')}"
+        if prof is not None:
+            prof.dump_stats(str(base.with_suffix(".pstats")))
+            with self._lock:
+                self.pstats_files.append(base.with_suffix(".pstats"))
+        if after is not None:
+            diff = _own_traces(after).compare_to(_own_traces(before), "lineno")
+            lines = [f"Top allocation growth during {stage}:"]
+            lines += [str(d) for d in diff[: self.top]]
+            base.with_suffix(".alloc.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def summary(self) -> str:
+        """Top functions by own time across every captured stage."""
+        if not self.pstats_files:
+            return ""
+        stats = pstats.Stats(*[str(p) for p in self.pstats_files])
+        rows = sorted(stats.stats.items(), key=lambda kv: kv[1][2], reverse=True)[: self.top]
+        lines = [f"Top {len(rows)} functions by own time ({stats.total_tt:.3f}s profiled; files in {self.directory}):"]
+        lines.append(f"{'ncalls':>10} {'tottime':>9} {'cumtime':>9}  function")
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in rows:
+            where = f"{Path(filename).name}:{line}({func})" if line else func
+            lines.append(f"{ncalls:>10} {tottime:>9.3f} {cumtime:>9.3f}  {where}")
+        return "\n".join(lines)
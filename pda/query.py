@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from .columnar import ColumnarStore, store_path_for
+from .index import ExpenseIndex, build_index_for, index_path_for, query_rows, scan_rows
+from .rollups import load_rollups
+
+
+def format_table(rows: List[dict]) -> str:
+    """Plain aligned text table of rows (dicts sharing the same keys)."""
+    if not rows:
+        return "(no rows)"
+    cols = list(rows[0])
+    cells = [[str(r.get(c, "")) for c in cols] for r in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(cols)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(cols, widths)).rstrip()]
+    lines += ["  ".join(v.ljust(w) for v, w in zip(row, widths)).rstrip() for row in cells]
+    return "\n".join(lines)
+
+
+def _require_cleaned(input_dir: str) -> str:
+    """Path of input_dir's cleaned_expenses.csv; FileNotFoundError if nothing was ingested there."""
+    cleaned = Path(input_dir) / "cleaned_expenses.csv"
+    if not cleaned.is_file():
+        raise FileNotFoundError(f"{cleaned} not found; run ingest first")
+    return str(cleaned)
+
+
+def run_query(
+    input_dir: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    by: str = "month",
+    category: Optional[str] = None,
+    as_json: bool = False,
+    store: str = "files",
+) -> List[dict]:
+    """Entry point for the query command: per-period totals from the rollups (or the sqlite store)."""
+    t0 = time.perf_counter()
+    if store == "sqlite":
+        from .sqlstore import query_periods
+
+        rows = query_periods(input_dir, start, end, by=by, category=category)
+    else:
+        _require_cleaned(input_dir)
+        rows = load_rollups(input_dir).query(start, end, by=by, category=category)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    print(json.dumps(rows, ensure_ascii=False) if as_json else format_table(rows))
+    logging.info("Query by=%s from=%s to=%s category=%s: rows=%s in %.2fms", by, start, end, category, len(rows), elapsed_ms)
+    return rows
+
+
+def find_rows(input_dir: str, store: str = "files", **filters) -> List[dict]:
+    """Rows of input_dir's cleaned expenses matching filters (see index.query_rows).
+
+    Uses the columnar store and its indexes, building the indexes on the
+    first query after an ingest; without a store the cleaned CSV is
+    scanned. store="sqlite" queries pda.sqlite instead.
+    """
+    if store == "sqlite":
+        from .sqlstore import find_rows_sql
+
+        return find_rows_sql(input_dir, **filters)
+    cleaned = _require_cleaned(input_dir)
+    cols = ColumnarStore.open(store_path_for(cleaned))
+    if cols is None:
+        from .analyze import iter_cleaned_expenses
+
+        logging.info("No columnar store; scanning %s", cleaned)
+        return scan_rows(iter_cleaned_expenses(cleaned), **filters)
+    with cols:
+        index = ExpenseIndex.open(index_path_for(cleaned), cols)
+        if index is None:
+            logging.info("Query index missing or stale; rebuilding")
+            build_index_for(input_dir)
+            index = ExpenseIndex.open(index_path_for(cleaned), cols)
+        with index:
+            return query_rows(cols, index, **filters)
+
+
+def run_row_query(input_dir: str, as_json: bool = False, store: str = "files", **filters) -> List[dict]:
+    """Entry point for the query command without --by: matching rows, with latency logged."""
+    t0 = time.perf_counter()
+    rows = find_rows(input_dir, store=store, **filters)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    print(json.dumps(rows, ensure_ascii=False) if as_json else format_table(rows))
+    shown = {k: v for k, v in filters.items() if v is not None}
+    logging.info("Query rows %s: rows=%s in %.2fms", shown, len(rows), elapsed_ms)
+    return rows
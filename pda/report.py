@@ -1,83 +1,465 @@
 from __future__ import annotations
 
+import csv
+import hashlib
+import heapq
+import html
 import json
+import logging
+from contextlib import ExitStack
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
+from .summary_io import DB_SUFFIX, ENRICHMENT_NAME, load_summary
+from .utils import atomic_open, file_size, incr, timed
 
-def generate_report(summary_json_path: str, report_path: str) -> Path:
-    """Generate a Markdown report from summary.json.
+REPORT_TITLE = "Personal Data Assistant Report"
+FORMATS = {"md": ".md", "html": ".html", "csv": ".csv"}
+STAMP_VERSION = 1
+DEFAULT_MAX_ROWS = 100
 
-    Required sections:
-    - Overview
-    - Expenses summary (total, average)
-    - Top categories table
-    - Largest transactions
-    - Notes: action items + topics
-    - Enrichment (if present)
+# (header, right-aligned)
+Column = Tuple[str, bool]
+Row = Tuple[str, ...]
 
-    TODO:
-    - Make formatting clean and readable
-    - Use Markdown tables where appropriate
+
+class Section:
+    """One report section: a table, a bullet list or label/value fields.
+
+    rows yields tuples of display strings (for "fields": label, value,
+    "1" to emphasize). total is the number of rows when known, used for
+    the "showing N of M" note when a section is capped.
     """
-    summary = json.loads(Path(summary_json_path).read_text(encoding="utf-8"))
 
+    def __init__(
+        self,
+        key: str,
+        title: str,
+        kind: str,
+        rows: Iterable[Row],
+        columns: Sequence[Column] = (),
+        total: Optional[int] = None,
+        empty: Optional[str] = None,
+    ) -> None:
+        self.key = key
+        self.title = title
+        self.kind = kind
+        self.rows = rows
+        self.columns = list(columns)
+        self.total = total
+        self.empty = empty
+
+
+def _money(x: Any) -> str:
+    return f"{float(x or 0):.2f}"
+
+
+def _transactions(rows: Iterable[dict]) -> Iterator[Row]:
+    for r in rows:
+        yield r.get("date", ""), r.get("category", ""), _money(r.get("amount", 0)), r.get("description", "")
+
+
+TRANSACTION_COLUMNS: List[Column] = [("Date", False), ("Category", False), ("Amount", True), ("Description", False)]
+
+
+def build_sections(summary: dict, limit: Optional[int] = None) -> List[Section]:
+    """Report sections for summary; rows are generated lazily as sections are written.
+
+    limit is the most rows any renderer will read from a section; long
+    sections that need sorting (topics) then use a bounded heap instead of
+    sorting everything.
+    """
     expenses = summary.get("expenses", {})
     notes = summary.get("notes", {})
     enrichment = summary.get("enrichment")
 
-    lines: List[str] = []
-    lines.append("# Personal Data Assistant Report\n")
-
-    # Overview
-    lines.append("## Overview")
-    lines.append(f"- Total spend: **${expenses.get('total_spend', 0):.2f}**")
-    lines.append(f"- Average amount: **${expenses.get('average_amount', 0):.2f}**\n")
-
-    # Top categories
-    lines.append("## Top Categories")
-    lines.append("| Category | Total |")
-    lines.append("|---|---:|")
-    for cat, total in expenses.get("top_3_categories_by_total", []):
-        lines.append(f"| {cat} | {total:.2f} |")
-    lines.append("")
-
-    # Largest transactions
-    lines.append("## Largest Transactions")
-    lines.append("| Date | Category | Amount | Description |")
-    lines.append("|---|---|---:|---|")
-    for r in expenses.get("largest_5_transactions", []):
-        lines.append(f"| {r.get('date','')} | {r.get('category','')} | {float(r.get('amount',0)):.2f} | {r.get('description','')} |")
-    lines.append("")
-
-    # Notes
-    lines.append("## Notes — Action Items")
-    for item in notes.get("action_items", []):
-        lines.append(f"- {item}")
-    lines.append("")
-
-    lines.append("## Notes — Topics")
     topics = notes.get("topics", {})
-    if topics:
-        lines.append("| Topic | Count |")
-        lines.append("|---|---:|")
-        for t, c in sorted(topics.items(), key=lambda x: x[1], reverse=True):
-            lines.append(f"| {t} | {c} |")
+    by_count = lambda kv: kv[1]  # noqa: E731
+    if limit is not None and limit < len(topics):
+        ranked: Iterable[Tuple[str, int]] = heapq.nlargest(limit, topics.items(), key=by_count)
     else:
-        lines.append("_No topics found._")
-    lines.append("")
+        ranked = sorted(topics.items(), key=by_count, reverse=True)
 
-    # Enrichment
-    lines.append("## Enrichment")
+    fields: List[Row] = []
     if enrichment:
-        lines.append(f"- Type: {enrichment.get('type')}")
-        lines.append(f"- Source: {enrichment.get('source')}")
-        lines.append(f"- Base/Target: {enrichment.get('base')}→{enrichment.get('target')}")
-        lines.append(f"- Rate: {enrichment.get('rate')}")
-    else:
-        lines.append("_No enrichment performed._")
+        fields += [
+            ("Type", str(enrichment.get("type")), ""),
+            ("Source", str(enrichment.get("source")), ""),
+            ("Base/Target", f"{enrichment.get('base')}→{enrichment.get('target')}", ""),
+        ]
+        if "total_spend_converted" in enrichment:
+            fields.append(("Converted total", f"{enrichment.get('total_spend_converted', 0):.2f} {enrichment.get('target')}", "1"))
+            fields.append(("Converted rows", f"{enrichment.get('converted_rows')} (missing rate: {enrichment.get('missing_rows')})", ""))
+        else:
+            fields.append(("Rate", str(enrichment.get("rate")), ""))
+
+    top = expenses.get("top_3_categories_by_total", [])
+    largest = expenses.get("largest_5_transactions", [])
+    anomalies = expenses.get("anomalies", [])
+    items = notes.get("action_items", [])
+    return [
+        Section("overview", "Overview", "fields", [
+            ("Total spend", f"${expenses.get('total_spend', 0):.2f}", "1"),
+            ("Average amount", f"${expenses.get('average_amount', 0):.2f}", "1"),
+        ]),
+        Section("top_categories", "Top Categories", "table", ((c, _money(t)) for c, t in top),
+                [("Category", False), ("Total", True)], len(top)),
+        Section("largest_transactions", "Largest Transactions", "table", _transactions(largest),
+                TRANSACTION_COLUMNS, len(largest)),
+        Section("anomalies", "Anomalies", "table", _transactions(anomalies), TRANSACTION_COLUMNS, len(anomalies),
+                empty="_No anomalies found._"),
+        Section("action_items", "Notes — Action Items", "list", ((i,) for i in items), total=len(items)),
+        Section("topics", "Notes — Topics", "table", ((t, str(c)) for t, c in ranked),
+                [("Topic", False), ("Count", True)], len(topics), empty="_No topics found._"),
+        Section("enrichment", "Enrichment", "fields", fields, total=len(fields), empty="_No enrichment performed._"),
+    ]
+
+
+class Markdown:
+    """Markdown writer; per-section row templates are compiled once, then filled per row."""
+
+    capped = True
+    suffix = ".md"
+
+    def __init__(self, f: IO[str]) -> None:
+        self.f = f
+
+    def begin(self, title: str) -> None:
+        self.f.write(f"# {title}\n\n")
+
+    def start(self, section: Section, title: Optional[str] = None) -> None:
+        self.f.write(f"## {title or section.title}\n")
+        # the table header is only written once the first row arrives
+        self.header = ""
+        if section.kind == "table":
+            self.row_tpl = "| " + " | ".join("{%d}" % i for i in range(len(section.columns))) + " |\n"
+            self.header = (
+                "| " + " | ".join(h for h, _ in section.columns) + " |\n"
+                + "|" + "|".join("---:" if right else "---" for _, right in section.columns) + "|\n"
+            )
+        elif section.kind == "list":
+            self.row_tpl = "- {0}\n"
+
+    def row(self, section: Section, cells: Row) -> None:
+        if self.header:
+            self.f.write(self.header)
+            self.header = ""
+        if section.kind == "table":
+            self.f.write(self.row_tpl.format(*(c.replace("|", "\\|") for c in cells)))
+        elif section.kind == "list":
+            self.f.write(self.row_tpl.format(*cells))
+        else:
+            label, value, strong = cells
+            self.f.write(f"- {label}: **{value}**\n" if strong else f"- {label}: {value}\n")
+
+    def empty(self, text: str) -> None:
+        self.f.write(text + "\n")
+
+    def more(self, shown: int, total: Optional[int], pages: List[str]) -> None:
+        of = f" of {total}" if total is not None else ""
+        links = ", ".join(f"[page {i + 2}]({p})" for i, p in enumerate(pages))
+        self.f.write(f"\n_Showing {shown}{of}." + (f" More: {links}_\n" if links else "_\n"))
+
+    def end_section(self) -> None:
+        self.f.write("\n")
+
+    def end(self) -> None:
+        pass
+
+
+class Html(Markdown):
+    suffix = ".html"
+
+    def begin(self, title: str) -> None:
+        t = html.escape(title)
+        self.f.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{t}</title></head>\n<body>\n<h1>{t}</h1>\n")
+
+    def start(self, section: Section, title: Optional[str] = None) -> None:
+        self.f.write(f"<h2>{html.escape(title or section.title)}</h2>\n")
+        if section.kind == "table":
+            cells = "".join(
+                '<td style="text-align:right">{%d}</td>' % i if right else "<td>{%d}</td>" % i
+                for i, (_, right) in enumerate(section.columns)
+            )
+            self.row_tpl = f"<tr>{cells}</tr>\n"
+            self.header = "<table>\n<tr>" + "".join(f"<th>{html.escape(h)}</th>" for h, _ in section.columns) + "</tr>\n"
+            self.footer = "</table>\n"
+        else:
+            self.row_tpl = "<li>{0}</li>\n"
+            self.header, self.footer = "<ul>\n", "</ul>\n"
+        self._open = ""
+
+    def row(self, section: Section, cells: Row) -> None:
+        if self.header:
+            self.f.write(self.header)
+            self.header, self._open = "", self.footer
+        if section.kind == "fields":
+            label, value, strong = cells
+            value = f"<strong>{html.escape(value)}</strong>" if strong else html.escape(value)
+            self.f.write(f"<li>{html.escape(label)}: {value}</li>\n")
+        else:
+            self.f.write(self.row_tpl.format(*(html.escape(c) for c in cells)))
+
+    def empty(self, text: str) -> None:
+        self.header = ""
+        self.f.write(f"<p><em>{html.escape(text.strip('_'))}</em></p>\n")
+
+    def more(self, shown: int, total: Optional[int], pages: List[str]) -> None:
+        self._close()
+        of = f" of {total}" if total is not None else ""
+        links = ", ".join(f'<a href="{html.escape(p)}">page {i + 2}</a>' for i, p in enumerate(pages))
+        self.f.write(f"<p><em>Showing {shown}{of}." + (f" More: {links}" if links else "") + "</em></p>\n")
+
+    def _close(self) -> None:
+        if self._open:
+            self.f.write(self._open)
+            self._open = ""
+
+    def end_section(self) -> None:
+        self._close()
+
+    def end(self) -> None:
+        self.f.write("</body></html>\n")
+
+
+class Csv:
+    """Every section as its own block: a [section, headers...] row, then [section, cells...] rows.
+
+    CSV output is meant for spreadsheets, so sections are never capped.
+    """
+
+    capped = False
+    suffix = ".csv"
+
+    def __init__(self, f: IO[str]) -> None:
+        self.writer = csv.writer(f)
 
-    out = Path(report_path)
-    out.parent.mkdir(parents=True, exist_ok=True)
-    out.write_text("\n".join(lines), encoding="utf-8")
+    def begin(self, title: str) -> None:
+        pass
+
+    def start(self, section: Section, title: Optional[str] = None) -> None:
+        if section.kind == "table":
+            self.writer.writerow([section.key] + [h for h, _ in section.columns])
+        elif section.kind == "list":
+            self.writer.writerow([section.key, "item"])
+        else:
+            self.writer.writerow([section.key, "field", "value"])
+
+    def row(self, section: Section, cells: Row) -> None:
+        self.writer.writerow([section.key] + list(cells[:2] if section.kind == "fields" else cells))
+
+    def empty(self, text: str) -> None:
+        pass
+
+    def more(self, shown: int, total: Optional[int], pages: List[str]) -> None:
+        pass
+
+    def end_section(self) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+RENDERERS = {"md": Markdown, "html": Html, "csv": Csv}
+
+
+def page_path(report_path: Path, key: str, page: int) -> Path:
+    """Where page (2, 3, ...) of a paginated section is written, next to the report."""
+    return report_path.with_name(f"{report_path.stem}.{key}.p{page}{report_path.suffix}")
+
+
+class _Pages:
+    """Writes a section's overflow rows to page files, max_rows per page, as they arrive."""
+
+    def __init__(self, section: Section, outputs: Dict[str, Path], renderers: Dict[str, Any], per_page: int) -> None:
+        self.section = section
+        self.targets = [(fmt, path) for fmt, path in outputs.items() if renderers[fmt].capped]
+        self.per_page = per_page
+        self.count = 0
+        self.stack: Optional[ExitStack] = None
+        self.open: List[Any] = []
+        self.names: Dict[str, List[str]] = {fmt: [] for fmt in outputs}
+        self.written: List[Path] = []
+        total = section.total
+        self.n_pages = None if total is None else 1 + -(-(total - per_page) // per_page)
+
+    def row(self, cells: Row) -> None:
+        if self.count % self.per_page == 0:
+            self._next_page(self.count // self.per_page + 2)
+        self.count += 1
+        for r in self.open:
+            r.row(self.section, cells)
+
+    def _next_page(self, page: int) -> None:
+        self.close()
+        self.stack = ExitStack()
+        of = f" of {self.n_pages}" if self.n_pages else ""
+        self.open = []
+        for fmt, path in self.targets:
+            p = page_path(path, self.section.key, page)
+            r = RENDERERS[fmt](self.stack.enter_context(atomic_open(p)))
+            r.begin(REPORT_TITLE)
+            r.start(self.section, f"{self.section.title} (page {page}{of})")
+            self.open.append(r)
+            self.names[fmt].append(p.name)
+            self.written.append(p)
+
+    def close(self) -> None:
+        for r in self.open:
+            r.end_section()
+            r.end()
+        if self.stack is not None:
+            self.stack.close()
+        self.stack, self.open = None, []
+
+
+def render_sections(
+    sections: Iterable[Section],
+    outputs: Dict[str, Path],
+    max_rows: Optional[int] = DEFAULT_MAX_ROWS,
+    paginate: bool = False,
+) -> List[Path]:
+    """Write sections to every output in one pass; returns all files written.
+
+    Each section's rows are read once and fanned out to the renderers, which
+    write straight to their (atomically replaced) files. Markdown and HTML
+    show at most max_rows rows per section; with paginate the rest go to
+    page files of max_rows rows linked from the section, otherwise a
+    "showing N of M" note is written. CSV always gets every row.
+    """
+    written = list(outputs.values())
+    with ExitStack() as stack:
+        renderers = {fmt: RENDERERS[fmt](stack.enter_context(atomic_open(p))) for fmt, p in outputs.items()}
+        uncapped = [r for r in renderers.values() if not r.capped]
+        for r in renderers.values():
+            r.begin(REPORT_TITLE)
+
+        for section in sections:
+            for r in renderers.values():
+                r.start(section)
+            rows = iter(section.rows)
+            limit = None if max_rows is None or section.kind == "fields" else max_rows
+            shown = 0
+            for cells in rows if limit is None else islice(rows, limit):
+                shown += 1
+                for r in renderers.values():
+                    r.row(section, cells)
+
+            pages = _Pages(section, outputs, renderers, limit) if paginate and limit else None
+            if limit is not None and (uncapped or pages):
+                for cells in rows:
+                    for r in uncapped:
+                        r.row(section, cells)
+                    if pages is not None:
+                        pages.row(cells)
+            if pages is not None:
+                pages.close()
+                written += pages.written
+
+            if shown == 0 and section.empty:
+                for r in renderers.values():
+                    r.empty(section.empty)
+            elif limit is not None and section.total is not None and section.total > shown:
+                for fmt, r in renderers.items():
+                    r.more(shown, section.total, pages.names[fmt] if pages else [])
+            for r in renderers.values():
+                r.end_section()
+        for r in renderers.values():
+            r.end()
+    return written
+
+
+def report_outputs(report_path: str, formats: Optional[Sequence[str]] = None) -> Dict[str, Path]:
+    """format -> output path: report_path itself, plus the same stem with each other format's suffix.
+
+    Without formats, the format is taken from report_path's suffix (Markdown by default).
+    """
+    path = Path(report_path)
+    by_suffix = {v: k for k, v in FORMATS.items()}
+    primary = by_suffix.get(path.suffix.lower(), "md")
+    out = {primary: path}
+    for fmt in formats or ():
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported report format: {fmt}")
+        out.setdefault(fmt, path.with_suffix(FORMATS[fmt]))
     return out
+
+
+def _stamp_path(report_path: Path) -> Path:
+    return report_path.with_name(f".{report_path.name}.stamp")
+
+
+def _input_key(summary_path: Path, options: dict) -> str:
+    """sha256 of the summary and enrichment (sidecar or sqlite documents) plus the render options."""
+    from .dag import code_version
+
+    h = hashlib.sha256()
+    if summary_path.suffix == DB_SUFFIX:
+        from .sqlstore import document_text
+
+        # hash the stored documents, not the whole database file
+        for name in ("summary", "enrichment"):
+            h.update((document_text(summary_path, name) or "-").encode("utf-8"))
+        paths = ()
+    else:
+        paths = (summary_path, summary_path.parent / ENRICHMENT_NAME)
+    for p in paths:
+        h.update(p.name.encode("utf-8"))
+        try:
+            with open(p, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        except FileNotFoundError:
+            h.update(b"-")
+    h.update(json.dumps({**options, "code": code_version(), "v": STAMP_VERSION}, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+@timed("report")
+def generate_report(
+    summary_json_path: str,
+    report_path: str,
+    formats: Optional[Sequence[str]] = None,
+    max_rows: Optional[int] = DEFAULT_MAX_ROWS,
+    paginate: bool = False,
+    force: bool = False,
+) -> Path:
+    """Generate the report (Markdown, HTML and/or CSV) from summary.json.
+
+    Sections: overview, top categories, largest transactions, anomalies,
+    action items, topics and enrichment (if present). The summary is read
+    once and every requested format is written in the same pass (see
+    render_sections); formats adds outputs next to report_path. Long
+    sections are capped at max_rows (None: no cap) or paginated.
+
+    A stamp next to the report records a hash of the summary, enrichment
+    and options; when it matches and the outputs exist, nothing is
+    rewritten (force=True always regenerates). Returns report_path.
+    """
+    outputs = report_outputs(report_path, formats)
+    primary = Path(report_path)
+    options = {"formats": sorted(outputs), "max_rows": max_rows, "paginate": paginate}
+    key = _input_key(Path(summary_json_path), options)
+    stamp = _stamp_path(primary)
+    if not force and all(p.exists() for p in outputs.values()):
+        try:
+            if json.loads(stamp.read_text(encoding="utf-8")).get("key") == key:
+                logging.info("Report unchanged (summary hash matches); skipping %s", primary)
+                incr("pda_report_skipped_total")
+                return primary
+        except (OSError, ValueError):
+            pass
+
+    summary = load_summary(summary_json_path)
+    primary.parent.mkdir(parents=True, exist_ok=True)
+    for path in outputs.values():
+        for old in path.parent.glob(f"{path.stem}.*.p*{path.suffix}"):
+            old.unlink()  # pages of an earlier, longer report
+    uncapped = "csv" in outputs or paginate or max_rows is None
+    sections = build_sections(summary, limit=None if uncapped else max_rows)
+    written = render_sections(sections, outputs, max_rows=max_rows, paginate=paginate)
+    stamp.write_text(json.dumps({"key": key}), encoding="utf-8")
+    incr("pda_bytes_written_total", sum(file_size(p) for p in written), stage="report")
+    return primary
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .manifest import write_json_atomic
+
+ROLLUPS_NAME = "rollups.json"
+ROLLUPS_VERSION = 1
+GRANULARITIES = ("day", "week", "month")
+
+# bucket -> category -> [count, total in cents]
+Buckets = Dict[str, Dict[str, List[int]]]
+
+
+def _cents(amount: Any) -> int:
+    # cleaned amounts are rounded to 2 decimals, so cents are exact and
+    # totals do not depend on the order rows were added in
+    return round(float(amount) * 100)
+
+
+def week_key(d: date) -> str:
+    year, week, _ = d.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def month_key(d: date) -> str:
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+def period_bounds(by: str, key: str) -> Tuple[date, date]:
+    """First and last day of a day/week/month bucket."""
+    if by == "day":
+        d = date.fromisoformat(key)
+        return d, d
+    if by == "week":
+        year, week = key.split("-W")
+        start = date.fromisocalendar(int(year), int(week), 1)
+        return start, start + timedelta(days=6)
+    year, month = (int(x) for x in key.split("-"))
+    nxt = date(year + (month == 12), month % 12 + 1, 1)
+    return date(year, month, 1), nxt - timedelta(days=1)
+
+
+def _bucket_key(by: str, d: date) -> str:
+    return d.isoformat() if by == "day" else week_key(d) if by == "week" else month_key(d)
+
+
+def _fold(into: Dict[str, List[int]], part: Dict[str, List[int]]) -> None:
+    for cat, (n, cents) in part.items():
+        cell = into.get(cat)
+        if cell is None:
+            into[cat] = [n, cents]
+        else:
+            cell[0] += n
+            cell[1] += cents
+
+
+class Rollups:
+    """Per-day, per-ISO-week and per-month count/total for each category.
+
+    Rows only touch the day buckets; week and month buckets are derived from
+    them when saving, so appending rows costs one dict update per row.
+    rollups.json records the cleaned CSV's size and mtime like the columnar
+    store, and is rebuilt from the CSV when it no longer matches.
+    """
+
+    def __init__(self) -> None:
+        self.day: Buckets = {}
+        self.week: Buckets = {}
+        self.month: Buckets = {}
+
+    def add(self, row: Dict[str, Any]) -> None:
+        cats = self.day.get(row["date"])
+        if cats is None:
+            cats = self.day[row["date"]] = {}
+        cell = cats.get(row["category"])
+        if cell is None:
+            cats[row["category"]] = [1, _cents(row["amount"])]
+        else:
+            cell[0] += 1
+            cell[1] += _cents(row["amount"])
+
+    def derive(self) -> None:
+        """Recompute week and month buckets from the day buckets."""
+        self.week, self.month = {}, {}
+        for day, cats in self.day.items():
+            d = date.fromisoformat(day)
+            _fold(self.week.setdefault(week_key(d), {}), cats)
+            _fold(self.month.setdefault(month_key(d), {}), cats)
+
+    def save(self, path: Path, cleaned_csv_path: Path) -> Path:
+        self.derive()
+        st = os.stat(cleaned_csv_path)
+        payload = {
+            "version": ROLLUPS_VERSION,
+            "csv_size": st.st_size,
+            "csv_mtime_ns": st.st_mtime_ns,
+            "day": self.day,
+            "week": self.week,
+            "month": self.month,
+        }
+        return write_json_atomic(path, payload)
+
+    @classmethod
+    def load(cls, path: Path, cleaned_csv_path: Path) -> Optional["Rollups"]:
+        """Rollups at path, or None if absent or stale for cleaned_csv_path."""
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+            st = os.stat(cleaned_csv_path)
+        except (OSError, ValueError):
+            return None
+        if (
+            data.get("version") != ROLLUPS_VERSION
+            or data.get("csv_size") != st.st_size
+            or data.get("csv_mtime_ns") != st.st_mtime_ns
+        ):
+            return None
+        r = cls()
+        r.day, r.week, r.month = data["day"], data["week"], data["month"]
+        return r
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "Rollups":
+        r = cls()
+        for row in rows:
+            r.add(row)
+        return r
+
+    def _buckets(self, by: str) -> Buckets:
+        return {"day": self.day, "week": self.week, "month": self.month}[by]
+
+    def query(
+        self,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        by: str = "month",
+        category: Optional[str] = None,
+    ) -> List[dict]:
+        """Rows of {period, category, count, total} for start..end (inclusive ISO dates).
+
+        Periods that lie entirely inside the range are read from their own
+        bucket; periods cut by the range edges are summed from day buckets.
+        """
+        if by not in GRANULARITIES:
+            raise ValueError(f"Unsupported granularity: {by}")
+        if not self.day:
+            return []
+        lo = date.fromisoformat(start) if start else date.fromisoformat(min(self.day))
+        hi = date.fromisoformat(end) if end else date.fromisoformat(max(self.day))
+        buckets = self._buckets(by)
+
+        out: List[dict] = []
+        d = lo
+        while d <= hi:
+            key = _bucket_key(by, d)
+            p_start, p_end = period_bounds(by, key)
+            if lo <= p_start and p_end <= hi:
+                cells = buckets.get(key, {})
+            else:
+                cells = {}
+                day = max(p_start, lo)
+                while day <= min(p_end, hi):
+                    _fold(cells, self.day.get(day.isoformat(), {}))
+                    day += timedelta(days=1)
+            for cat in sorted(cells):
+                if category is None or cat == category:
+                    n, cents = cells[cat]
+                    out.append({"period": key, "category": cat, "count": n, "total": cents / 100})
+            d = p_end + timedelta(days=1)
+        return out
+
+
+def load_rollups(output_dir: str) -> Rollups:
+    """Up-to-date rollups for output_dir, rebuilt from cleaned_expenses.csv if needed."""
+    from .analyze import iter_cleaned_expenses
+
+    out_dir = Path(output_dir)
+    cleaned = out_dir / "cleaned_expenses.csv"
+    rollups = Rollups.load(out_dir / ROLLUPS_NAME, cleaned)
+    if rollups is None:
+        logging.info("Rollups missing or stale; rebuilding from %s", cleaned)
+        rollups = Rollups.from_rows(iter_cleaned_expenses(str(cleaned)))
+        rollups.save(out_dir / ROLLUPS_NAME, cleaned)
+    return rollups
@@ -0,0 +1,459 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+from contextlib import closing, contextmanager
+from fractions import Fraction
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .utils import ensure_dir, file_size, incr, open_byte_range, timed
+
+DB_NAME = "pda.sqlite"
+SCHEMA_VERSION = 1
+BATCH_ROWS = 50_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    digest BLOB NOT NULL,
+    occurrence INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    generation INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (digest, occurrence)
+);
+CREATE TABLE IF NOT EXISTS rejected (
+    digest BLOB NOT NULL,
+    occurrence INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    generation INTEGER NOT NULL,
+    date TEXT,
+    amount TEXT,
+    category TEXT,
+    description TEXT,
+    error TEXT NOT NULL,
+    PRIMARY KEY (digest, occurrence)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    name TEXT PRIMARY KEY,
+    body TEXT NOT NULL
+);
+"""
+
+# Secondary indexes on expenses; a full ingest drops and rebuilds them,
+# since one sort per index is far cheaper than maintaining them row by row.
+_INDEXES = {
+    "expenses_seq": "expenses (seq)",
+    "expenses_amount": "expenses (amount_cents DESC, seq)",
+    "expenses_date": "expenses (date, category, amount_cents)",
+    "expenses_category": "expenses (category, amount_cents, seq)",
+}
+
+# The occurrence is the number of identical rows already stored in this
+# generation, so the nth copy of a row always gets the same key: re-ingesting
+# a file updates rows in place instead of duplicating them.
+_UPSERT_EXPENSE = """
+INSERT INTO expenses (digest, occurrence, seq, generation, date, amount_cents, category, description)
+SELECT ?1, (SELECT COUNT(*) FROM expenses WHERE digest = ?1 AND generation = ?2), ?3, ?2, ?4, ?5, ?6, ?7 WHERE true
+ON CONFLICT (digest, occurrence) DO UPDATE SET seq = excluded.seq, generation = excluded.generation
+"""
+_UPSERT_REJECTED = """
+INSERT INTO rejected (digest, occurrence, seq, generation, date, amount, category, description, error)
+SELECT ?1, (SELECT COUNT(*) FROM rejected WHERE digest = ?1 AND generation = ?2), ?3, ?2, ?4, ?5, ?6, ?7, ?8 WHERE true
+ON CONFLICT (digest, occurrence) DO UPDATE SET seq = excluded.seq, generation = excluded.generation
+"""
+_ROW_COLUMNS = "date, amount_cents, category, description"
+
+
+def db_path_in(output_dir: str) -> Path:
+    return Path(output_dir) / DB_NAME
+
+
+def connect(path: Union[str, Path]) -> sqlite3.Connection:
+    """Open (creating if needed) the store at path in WAL mode, autocommit.
+
+    WAL lets readers (query, report, a second analyze) keep working on the
+    last committed state while an ingest transaction is open.
+    """
+    ensure_dir(str(Path(path).parent))
+    conn = sqlite3.connect(str(path), timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version not in (0, SCHEMA_VERSION):
+        conn.close()
+        raise RuntimeError(f"{path} has schema version {version}; expected {SCHEMA_VERSION}")
+    if version == 0:
+        conn.executescript(_SCHEMA)
+        _create_indexes(conn)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return conn
+
+
+def connect_readonly(path: Union[str, Path]) -> sqlite3.Connection:
+    """Open an existing store read-only; unlike connect(), never creates one."""
+    p = Path(path)
+    if not p.is_file():
+        raise FileNotFoundError(f"{p} not found; run ingest --store sqlite first")
+    conn = sqlite3.connect(f"{p.resolve().as_uri()}?mode=ro", uri=True, timeout=30, isolation_level=None)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version != SCHEMA_VERSION:
+        conn.close()
+        raise RuntimeError(f"{p} has schema version {version}; expected {SCHEMA_VERSION}")
+    return conn
+
+
+def _create_indexes(conn: sqlite3.Connection) -> None:
+    for name, target in _INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+
+def _drop_indexes(conn: sqlite3.Connection) -> None:
+    for name in _INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _get(conn: sqlite3.Connection, name: str) -> Any:
+    row = conn.execute("SELECT body FROM documents WHERE name = ?", (name,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _put(conn: sqlite3.Connection, name: str, value: Any) -> None:
+    body = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    conn.execute("INSERT INTO documents (name, body) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET body = excluded.body", (name, body))
+
+
+def get_document(path: Union[str, Path], name: str) -> Any:
+    """A JSON document (summary, enrichment, notes, manifest) stored in the db, or None."""
+    with closing(connect_readonly(path)) as conn:
+        return _get(conn, name)
+
+
+def document_text(path: Union[str, Path], name: str) -> Optional[str]:
+    """A document's stored JSON text, for hashing without decoding it."""
+    with closing(connect_readonly(path)) as conn:
+        row = conn.execute("SELECT body FROM documents WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def put_documents(path: Union[str, Path], docs: Dict[str, Any], drop: Iterable[str] = ()) -> Path:
+    """Store docs and delete the drop documents in one transaction."""
+    with closing(connect(path)) as conn, transaction(conn):
+        for name in drop:
+            conn.execute("DELETE FROM documents WHERE name = ?", (name,))
+        for name, value in docs.items():
+            _put(conn, name, value)
+    return Path(path)
+
+
+def _digest(values: Iterable[Any]) -> bytes:
+    text = "\x1f".join("" if v is None else str(v) for v in values)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class SqliteWriter:
+    """Buffers validated rows and upserts them with executemany, BATCH_ROWS at a time.
+
+    The caller owns the transaction, so a whole ingest commits (or rolls
+    back) at once.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, generation: int, append: bool) -> None:
+        self.conn = conn
+        self.generation = generation
+        self._expenses: List[tuple] = []
+        self._rejected: List[tuple] = []
+        self.seq = self.rejected_seq = 0
+        if append:
+            self.seq = conn.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM expenses").fetchone()[0]
+            self.rejected_seq = conn.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM rejected").fetchone()[0]
+
+    def add(self, row: Dict[str, Any]) -> None:
+        cents = round(float(row["amount"]) * 100)
+        values = (row["date"], cents, row["category"], row.get("description") or "")
+        self._expenses.append((_digest(values), self.generation, self.seq) + values)
+        self.seq += 1
+        if len(self._expenses) >= BATCH_ROWS:
+            self.flush()
+
+    def reject(self, row: Dict[str, Any]) -> None:
+        values = tuple(row.get(k) for k in ("date", "amount", "category", "description", "error"))
+        self._rejected.append((_digest(values), self.generation, self.rejected_seq) + values)
+        self.rejected_seq += 1
+        if len(self._rejected) >= BATCH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._expenses:
+            self.conn.executemany(_UPSERT_EXPENSE, self._expenses)
+            self._expenses.clear()
+        if self._rejected:
+            self.conn.executemany(_UPSERT_REJECTED, self._rejected)
+            self._rejected.clear()
+
+
+@timed("ingest_csv")
+def ingest_csv_sqlite(csv_path: str, conn: sqlite3.Connection, start: int = 0, end: Optional[int] = None) -> Tuple[int, int]:
+    """Validate csv_path (bytes start..end) into the expenses/rejected tables.
+
+    A full ingest (start == 0) starts a new generation: every row is
+    upserted by its content key and rows of older generations, i.e. no
+    longer in the file, are deleted afterwards. Secondary indexes are
+    rebuilt at the end of a full ingest rather than maintained per row; the
+    caller's transaction keeps that invisible to readers. Returns
+    (cleaned, rejected).
+    """
+    from .ingest import iter_validated_rows, reason_label
+
+    generation = (_get(conn, "generation") or 0) + (0 if start else 1)
+    writer = SqliteWriter(conn, generation, append=bool(start))
+    if not start:
+        _drop_indexes(conn)
+    n_cleaned = n_rejected = 0
+    reasons: Dict[str, int] = {}
+    for ok, row in iter_validated_rows(csv_path, start, end):
+        if ok:
+            writer.add(row)
+            n_cleaned += 1
+        else:
+            writer.reject(row)
+            n_rejected += 1
+            reason = reason_label(row["error"])
+            reasons[reason] = reasons.get(reason, 0) + 1
+    writer.flush()
+    if not start:
+        conn.execute("DELETE FROM expenses WHERE generation < ?", (generation,))
+        conn.execute("DELETE FROM rejected WHERE generation < ?", (generation,))
+        _create_indexes(conn)
+        _put(conn, "generation", generation)
+
+    incr("pda_rows_total", n_cleaned, stage="ingest_csv", result="cleaned")
+    incr("pda_rows_total", n_rejected, stage="ingest_csv", result="rejected")
+    for reason, n in reasons.items():
+        incr("pda_rows_rejected_total", n, reason=reason)
+    incr("pda_bytes_read_total", (file_size(csv_path) if end is None else end) - start, stage="ingest_csv")
+    logging.info("Ingest CSV (sqlite): cleaned=%s rejected=%s", n_cleaned, n_rejected)
+    return n_cleaned, n_rejected
+
+
+def run_ingest_sqlite(
+    csv_path: str,
+    notes_path: str,
+    profile_path: str | None,
+    output_dir: str,
+    incremental: bool = False,
+) -> dict:
+    """Ingest into output_dir/pda.sqlite instead of the flat artifacts.
+
+    CSV rows, rejected rows, the extracted notes and the ingest manifest are
+    written in one transaction. With incremental=True only bytes appended
+    since the last run are read (see manifest.plan_input); otherwise the
+    whole CSV is upserted, which leaves unchanged rows in place. Either way
+    reading stops at the last complete record/line; an unfinished trailing
+    one is left for the next run.
+    """
+    from .ingest import extract_notes, load_profile, merge_notes
+    from .keywords import NoteMatcher, keywords_from_profile
+    from .manifest import complete_lines_end, fingerprint, plan_input
+    from .notes_parallel import ingest_notes_many, is_multi_notes
+    from .parallel_ingest import complete_records_end
+
+    keywords = keywords_from_profile(load_profile(profile_path))
+    db = db_path_in(output_dir)
+    with closing(connect(db)) as conn, transaction(conn):
+        prev = (_get(conn, "manifest") or {}) if incremental else {}
+        has_notes = _get(conn, "notes") is not None
+        csv_action, csv_offset = plan_input(csv_path, prev.get("csv")) if prev.get("csv") else ("full", 0)
+        multi_notes = is_multi_notes(notes_path)
+        if multi_notes or not has_notes or prev.get("action_keywords") != keywords:
+            notes_action, notes_offset = "full", 0
+        else:
+            notes_action, notes_offset = plan_input(notes_path, prev.get("notes"))
+
+        manifest = dict(prev)
+        if csv_action != "unchanged":
+            start = csv_offset if csv_action == "append" else 0
+            end = complete_records_end(csv_path, start)
+            if csv_action == "append" and end <= start:
+                csv_action = "unchanged"
+            else:
+                ingest_csv_sqlite(csv_path, conn, start=start, end=end)
+            manifest["csv"] = fingerprint(csv_path, end)
+
+        if notes_action != "unchanged":
+            with timed("ingest_notes"):
+                if multi_notes:
+                    notes = json.loads(ingest_notes_many(notes_path, output_dir, keywords=keywords)[0].read_text(encoding="utf-8"))
+                else:
+                    start = notes_offset if notes_action == "append" else 0
+                    end = complete_lines_end(notes_path, start)
+                    with open_byte_range(notes_path, start, end) as f:
+                        notes = extract_notes(f, NoteMatcher(keywords))
+                    incr("pda_rows_total", notes["total_lines"], stage="ingest_notes", result="lines")
+                    if start:
+                        notes = merge_notes(_get(conn, "notes") or {}, notes)
+                    manifest["notes"] = fingerprint(notes_path, end)
+            _put(conn, "notes", notes)
+            manifest["action_keywords"] = keywords
+
+        changed = csv_action != "unchanged" or notes_action != "unchanged"
+        if changed or manifest != prev:
+            _put(conn, "manifest", manifest)
+    logging.info("Ingest (sqlite): csv=%s notes=%s into %s", csv_action, notes_action, db)
+    return {"db": str(db), "csv_action": csv_action, "notes_action": notes_action, "changed": changed}
+
+
+def _row(date: str, cents: int, category: str, description: str) -> dict:
+    return {"date": date, "amount": cents / 100, "category": category, "description": description}
+
+
+def iter_rows(conn: sqlite3.Connection) -> Iterator[dict]:
+    """Cleaned rows in input order."""
+    for r in conn.execute(f"SELECT {_ROW_COLUMNS} FROM expenses ORDER BY seq"):
+        yield _row(*r)
+
+
+def analyze_expenses_sqlite(conn: sqlite3.Connection, anomaly: Union[None, str, dict] = None) -> dict:
+    """analyze_expenses() as SQL aggregates over the expenses table.
+
+    Totals are exact integer cents; the standard deviation is a second pass
+    around the mean. The largest rows and anomalies come from the amount
+    index, so only those rows are materialized.
+    """
+    from .anomaly import anomaly_rule_from, apply_anomaly_rule
+    from .stats import ExpenseAccumulator
+
+    rule = anomaly_rule_from(anomaly)
+    n, total_cents = conn.execute("SELECT COUNT(*), COALESCE(SUM(amount_cents), 0) FROM expenses").fetchone()
+    by_cat = conn.execute(
+        "SELECT category, COUNT(*), SUM(amount_cents) FROM expenses GROUP BY category ORDER BY MIN(seq)"
+    ).fetchall()
+    count_by_cat = {c: k for c, k, _ in by_cat}
+    total_by_cat = {c: s / 100 for c, _, s in by_cat}
+    incr("pda_rows_total", n, stage="analyze", result="sqlite")
+    if not n:
+        return {
+            "total_spend": 0.0,
+            "average_amount": 0.0,
+            "count_by_category": count_by_cat,
+            "total_by_category": total_by_cat,
+            "top_3_categories_by_total": [],
+            "largest_5_transactions": [],
+            "anomalies": [],
+        }
+
+    mean_cents = Fraction(total_cents, n)
+    stdev = 0.0
+    if n > 1:
+        ssd = conn.execute(
+            "SELECT SUM((amount_cents - ?1) * (amount_cents - ?1)) FROM expenses", (float(mean_cents),)
+        ).fetchone()[0]
+        stdev = math.sqrt(ssd / (n - 1)) / 100
+    avg = float(mean_cents / 100)
+    threshold = avg + ExpenseAccumulator.Z * stdev
+
+    largest = conn.execute(f"SELECT {_ROW_COLUMNS} FROM expenses ORDER BY amount_cents DESC, seq LIMIT 5").fetchall()
+    above = conn.execute(
+        f"SELECT {_ROW_COLUMNS} FROM expenses WHERE amount_cents >= ? ORDER BY seq", (math.floor(threshold * 100),)
+    ).fetchall()
+    top3 = sorted(total_by_cat.items(), key=lambda x: x[1], reverse=True)[:3]
+    result = {
+        "total_spend": round(total_cents / 100, 2),
+        "average_amount": round(avg, 2),
+        "count_by_category": count_by_cat,
+        "total_by_category": {k: round(v, 2) for k, v in total_by_cat.items()},
+        "top_3_categories_by_total": [(k, round(v, 2)) for k, v in top3],
+        "largest_5_transactions": [_row(*r) for r in largest],
+        "anomaly_rule": {"type": "mean_plus_2std", "threshold": round(threshold, 2)},
+        "anomalies": [_row(*r) for r in above if r[1] / 100 > threshold],
+    }
+    return apply_anomaly_rule(result, rule, lambda: iter_rows(conn))
+
+
+@timed("analyze")
+def run_analyze_sqlite(output_dir: str, anomaly: Union[None, str, dict] = None) -> Path:
+    """analyze for the sqlite store: the summary is stored in the db next to the rows."""
+    from .summary_io import write_summary_file
+
+    db = db_path_in(output_dir)
+    with closing(connect_readonly(db)) as conn:
+        notes = _get(conn, "notes")
+        if notes is None:
+            raise FileNotFoundError(f"No notes in {db}; run ingest with --store sqlite first")
+        combined = {"expenses": analyze_expenses_sqlite(conn, anomaly), "notes": notes}
+    return write_summary_file(output_dir, combined, fmt="sqlite")
+
+
+def query_periods(
+    output_dir: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    by: str = "month",
+    category: Optional[str] = None,
+) -> List[dict]:
+    """Rollups.query() answered from a GROUP BY over the (date, category, amount) index."""
+    from .rollups import Rollups
+
+    where, params = _where(start=start, end=end, category=category)
+    rollups = Rollups()
+    with closing(connect_readonly(db_path_in(output_dir))) as conn:
+        sql = f"SELECT date, category, COUNT(*), SUM(amount_cents) FROM expenses{where} GROUP BY date, category"
+        for day, cat, k, cents in conn.execute(sql, params):
+            rollups.day.setdefault(day, {})[cat] = [k, cents]
+    rollups.derive()
+    return rollups.query(start, end, by=by, category=category)
+
+
+def _where(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+) -> Tuple[str, list]:
+    clauses, params = [], []
+    for sql, value in (
+        ("date >= ?", start),
+        ("date <= ?", end),
+        ("category = ?", category),
+        ("amount_cents >= ?", None if min_amount is None else math.ceil(min_amount * 100 - 1e-6)),
+        ("amount_cents <= ?", None if max_amount is None else math.floor(max_amount * 100 + 1e-6)),
+    ):
+        if value is not None:
+            clauses.append(sql)
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+def find_rows_sql(
+    output_dir: str,
+    top: Optional[int] = None,
+    limit: Optional[int] = None,
+    **filters: Any,
+) -> List[dict]:
+    """index.query_rows() semantics as one indexed SELECT on the sqlite store."""
+    where, params = _where(**filters)
+    if top is not None:
+        tail, params = " ORDER BY amount_cents DESC, seq LIMIT ?", params + [top]
+    else:
+        tail = " ORDER BY date, seq" + (" LIMIT ?" if limit is not None else "")
+        params = params + ([limit] if limit is not None else [])
+    with closing(connect_readonly(db_path_in(output_dir))) as conn:
+        return [_row(*r) for r in conn.execute(f"SELECT {_ROW_COLUMNS} FROM expenses{where}{tail}", params)]
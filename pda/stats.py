@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import sys
+import tempfile
+from fractions import Fraction
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Bit width used by statistics.stdev for a correctly rounded float sqrt.
+_SQRT_BIT_WIDTH = 2 * sys.float_info.mant_dig + 3
+
+
+def _integer_sqrt_of_frac_rto(n: int, m: int) -> int:
+    """Square root of n/m, rounded to the nearest integer using round-to-odd."""
+    a = math.isqrt(n // m)
+    return a | (a * a * m != n)
+
+
+def _float_sqrt_of_frac(n: int, m: int) -> float:
+    """Square root of n/m as a correctly rounded float (as statistics.stdev)."""
+    q = (n.bit_length() - m.bit_length() - _SQRT_BIT_WIDTH) // 2
+    if q >= 0:
+        numerator = _integer_sqrt_of_frac_rto(n, m << 2 * q) << q
+        denominator = 1
+    else:
+        numerator = _integer_sqrt_of_frac_rto(n << -2 * q, m)
+        denominator = 1 << -q
+    return numerator / denominator
+
+
+class RunningStats:
+    """Mergeable running count/sum/mean/variance.
+
+    A Welford mean/M2 pair gives cheap float estimates while streaming. Exact
+    sums of x and x*x are kept alongside as integer partials keyed by the
+    (power-of-two) denominator, the same way statistics.mean/stdev do, so the
+    final mean() and stdev() are bit-for-bit what those functions return.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.welford_mean = 0.0
+        self.welford_m2 = 0.0
+        self._sx: Dict[int, int] = {}
+        self._sxx: Dict[int, int] = {}
+
+    def add(self, x: float) -> None:
+        self.count += 1
+        self.total += x
+        delta = x - self.welford_mean
+        self.welford_mean += delta / self.count
+        self.welford_m2 += delta * (x - self.welford_mean)
+
+        n, d = x.as_integer_ratio()
+        self._sx[d] = self._sx.get(d, 0) + n
+        self._sxx[d] = self._sxx.get(d, 0) + n * n
+
+    def merge(self, other: "RunningStats") -> None:
+        """Fold other into self (Chan et al. parallel update for Welford)."""
+        if not other.count:
+            return
+        n_a, n_b = self.count, other.count
+        n = n_a + n_b
+        delta = other.welford_mean - self.welford_mean
+        self.welford_mean += delta * n_b / n
+        self.welford_m2 += other.welford_m2 + delta * delta * n_a * n_b / n
+        self.count = n
+        self.total += other.total
+        for d, v in other._sx.items():
+            self._sx[d] = self._sx.get(d, 0) + v
+        for d, v in other._sxx.items():
+            self._sxx[d] = self._sxx.get(d, 0) + v
+
+    def provisional_threshold(self, z: float) -> float:
+        """Cheap float estimate of mean + z*stdev from the Welford state."""
+        if self.count < 2:
+            return self.welford_mean
+        return self.welford_mean + z * math.sqrt(self.welford_m2 / (self.count - 1))
+
+    def _exact_sums(self) -> Tuple[Fraction, Fraction]:
+        sx = sum((Fraction(n, d) for d, n in self._sx.items()), Fraction(0))
+        sxx = sum((Fraction(n, d * d) for d, n in self._sxx.items()), Fraction(0))
+        return sx, sxx
+
+    def mean(self) -> float:
+        if not self.count:
+            return 0.0
+        sx, _ = self._exact_sums()
+        return float(sx / self.count)
+
+    def stdev(self) -> float:
+        if self.count < 2:
+            return 0.0
+        sx, sxx = self._exact_sums()
+        ssd = (self.count * sxx - sx * sx) / self.count
+        mss = ssd / (self.count - 1)
+        return _float_sqrt_of_frac(mss.numerator, mss.denominator)
+
+    def to_state(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "welford_mean": self.welford_mean,
+            "welford_m2": self.welford_m2,
+            "sx": [[d, n] for d, n in self._sx.items()],
+            "sxx": [[d, n] for d, n in self._sxx.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "RunningStats":
+        s = cls()
+        s.count = state["count"]
+        s.total = state["total"]
+        s.welford_mean = state["welford_mean"]
+        s.welford_m2 = state["welford_m2"]
+        s._sx = {d: n for d, n in state["sx"]}
+        s._sxx = {d: n for d, n in state["sxx"]}
+        return s
+
+
+class TopN:
+    """Fixed-size min-heap of the n largest (amount, seq, record) entries.
+
+    Ties on amount keep the earlier seq, so largest() equals
+    sorted(rows, key=amount, reverse=True)[:n].
+    """
+
+    def __init__(self, n: int = 5) -> None:
+        self.n = n
+        self._heap: List[Tuple[float, int, Any]] = []
+
+    def push(self, amount: float, seq: int, record: Any) -> None:
+        entry = (amount, -seq, record)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, entry)
+        elif (amount, -seq) > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def merge(self, other: "TopN", seq_offset: int = 0) -> None:
+        for amount, neg_seq, record in other._heap:
+            self.push(amount, -neg_seq + seq_offset, record)
+
+    def to_state(self) -> dict:
+        return {"n": self.n, "entries": [[a, -ns, r] for a, ns, r in self._heap]}
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TopN":
+        t = cls(state["n"])
+        for amount, seq, record in state["entries"]:
+            t.push(amount, seq, record)
+        return t
+
+    def largest(self) -> List[Tuple[float, Any]]:
+        ordered = sorted(self._heap, key=lambda e: e[:2], reverse=True)
+        return [(amount, record) for amount, _, record in ordered]
+
+
+class AnomalyCandidates:
+    """Two-pass-free collection of rows that may exceed the final threshold.
+
+    A row is kept only while it is above a provisional (looser) threshold
+    taken from the running stats. Everything dropped is summarized by
+    max_discarded: if that is <= the final threshold, the kept candidates
+    are exactly the anomalies; otherwise the caller has to rescan. Once more
+    than max_in_memory candidates are held they are spilled to a temp file.
+    """
+
+    def __init__(self, warmup: int = 1000, max_in_memory: int = 10000) -> None:
+        self.warmup = warmup
+        self.max_in_memory = max_in_memory
+        self.max_discarded = -math.inf
+        self._mem: List[Tuple[int, float, Any]] = []
+        self._spill: Optional[Any] = None
+        self._spilled = 0
+
+    def offer(self, seq: int, amount: float, record: Any, provisional: float) -> None:
+        if seq <= self.warmup or amount > provisional:
+            self._mem.append((seq, amount, record))
+            if len(self._mem) >= self.max_in_memory:
+                self.prune(provisional)
+        elif amount > self.max_discarded:
+            self.max_discarded = amount
+
+    def prune(self, provisional: float) -> None:
+        kept: List[Tuple[int, float, Any]] = []
+        for entry in self._mem:
+            if entry[1] > provisional:
+                kept.append(entry)
+            elif entry[1] > self.max_discarded:
+                self.max_discarded = entry[1]
+        self._mem = kept
+        if len(self._mem) >= self.max_in_memory // 2:
+            self._spill_mem()
+
+    def _spill_mem(self) -> None:
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self._spill.seek(0, 2)
+        for entry in self._mem:
+            self._spill.write(json.dumps(entry, ensure_ascii=False))
+            self._spill.write("\n")
+        self._spilled += len(self._mem)
+        self._mem = []
+
+    def __iter__(self) -> Iterator[Tuple[int, float, Any]]:
+        if self._spill is not None:
+            self._spill.seek(0)
+            for line in self._spill:
+                seq, amount, record = json.loads(line)
+                yield seq, amount, record
+        yield from self._mem
+
+    def __len__(self) -> int:
+        return self._spilled + len(self._mem)
+
+    def merge(self, other: "AnomalyCandidates", seq_offset: int = 0) -> None:
+        if other._spill is not None or self._spill is not None:
+            self._spill_mem()
+            for seq, amount, record in other:
+                self._mem.append((seq + seq_offset, amount, record))
+            self._spill_mem()
+        else:
+            self._mem.extend((seq + seq_offset, amount, record) for seq, amount, record in other._mem)
+        self.max_discarded = max(self.max_discarded, other.max_discarded)
+
+    def to_state(self) -> dict:
+        return {
+            "warmup": self.warmup,
+            "max_in_memory": self.max_in_memory,
+            "max_discarded": None if self.max_discarded == -math.inf else self.max_discarded,
+            "entries": [list(e) for e in self],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "AnomalyCandidates":
+        c = cls(warmup=state["warmup"], max_in_memory=state["max_in_memory"])
+        if state["max_discarded"] is not None:
+            c.max_discarded = state["max_discarded"]
+        c._mem = [(seq, amount, record) for seq, amount, record in state["entries"]]
+        if len(c._mem) >= c.max_in_memory:
+            c._spill_mem()
+        return c
+
+    def select(self, threshold: float) -> Optional[List[Tuple[float, Any]]]:
+        """Return candidates above threshold in seq order, or None if a rescan is needed."""
+        if self.max_discarded > threshold:
+            return None
+        return [(amount, record) for _, amount, record in self if amount > threshold]
+
+
+class ExpenseAccumulator:
+    """Mergeable, bounded-memory aggregation of cleaned expense rows.
+
+    Combines RunningStats, per-category running totals, a TopN heap and
+    AnomalyCandidates. Partial accumulators built over consecutive chunks or
+    files can be merge()d in order and give the same result as one pass.
+    """
+
+    Z = 2.0
+    CANDIDATE_Z = 1.5
+
+    def __init__(self, top_n: int = 5, warmup: int = 1000, max_in_memory: int = 10000) -> None:
+        self.stats = RunningStats()
+        self.total_by_cat: Dict[str, float] = {}
+        self.count_by_cat: Dict[str, int] = {}
+        self.top = TopN(top_n)
+        self.candidates = AnomalyCandidates(warmup=warmup, max_in_memory=max_in_memory)
+
+    @property
+    def count(self) -> int:
+        return self.stats.count
+
+    def add(self, row: dict) -> None:
+        """Fold one cleaned row into the aggregates; row is kept as the record."""
+        self.add_value(float(row["amount"]), row["category"], row)
+
+    def add_value(self, amount: float, category: str, record: Any) -> None:
+        self.stats.add(amount)
+        self.total_by_cat[category] = self.total_by_cat.get(category, 0.0) + amount
+        self.count_by_cat[category] = self.count_by_cat.get(category, 0) + 1
+
+        seq = self.stats.count
+        self.top.push(amount, seq, record)
+        self.candidates.offer(seq, amount, record, self.stats.provisional_threshold(self.CANDIDATE_Z))
+
+    def merge(self, other: "ExpenseAccumulator") -> "ExpenseAccumulator":
+        """Append other's rows after self's; returns self."""
+        offset = self.stats.count
+        self.stats.merge(other.stats)
+        for cat, v in other.total_by_cat.items():
+            self.total_by_cat[cat] = self.total_by_cat.get(cat, 0.0) + v
+        for cat, c in other.count_by_cat.items():
+            self.count_by_cat[cat] = self.count_by_cat.get(cat, 0) + c
+        self.top.merge(other.top, seq_offset=offset)
+        self.candidates.merge(other.candidates, seq_offset=offset)
+        return self
+
+    def to_state(self) -> dict:
+        """JSON-serializable snapshot; from_state() resumes accumulation from it."""
+        return {
+            "stats": self.stats.to_state(),
+            "total_by_cat": self.total_by_cat,
+            "count_by_cat": self.count_by_cat,
+            "top": self.top.to_state(),
+            "candidates": self.candidates.to_state(),
+        }
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict]) -> "ExpenseAccumulator":
+        """Accumulator over rows already on disk (e.g. iter_cleaned_expenses)."""
+        acc = cls()
+        for row in rows:
+            acc.add(row)
+        return acc
+
+    @classmethod
+    def from_state(cls, state: dict) -> "ExpenseAccumulator":
+        acc = cls()
+        acc.stats = RunningStats.from_state(state["stats"])
+        acc.total_by_cat = dict(state["total_by_cat"])
+        acc.count_by_cat = dict(state["count_by_cat"])
+        acc.top = TopN.from_state(state["top"])
+        acc.candidates = AnomalyCandidates.from_state(state["candidates"])
+        return acc
+
+    def result(
+        self,
+        rescan: Optional[Callable[[], Iterable[dict]]] = None,
+        materialize: Optional[Callable[[Any], dict]] = None,
+    ) -> dict:
+        """Return the analyze_expenses() summary dict.
+
+        rescan re-yields the cleaned rows and is only called when a row that
+        was dropped from the candidate set turns out to exceed the final
+        threshold. materialize turns a stored record into a row dict (the
+        default assumes records already are row dicts).
+        """
+        if not self.stats.count:
+            return {
+                "total_spend": 0.0,
+                "average_amount": 0.0,
+                "count_by_category": dict(self.count_by_cat),
+                "total_by_category": dict(self.total_by_cat),
+                "top_3_categories_by_total": [],
+                "largest_5_transactions": [],
+                "anomalies": [],
+            }
+
+        def as_row(amount: float, record: Any) -> dict:
+            row = materialize(record) if materialize is not None else record
+            return {**row, "amount": amount}
+
+        avg = self.stats.mean()
+        threshold = avg + self.Z * self.stats.stdev()
+
+        selected = self.candidates.select(threshold)
+        if selected is not None:
+            anomalies = [as_row(amount, record) for amount, record in selected]
+        elif rescan is not None:
+            logging.debug("Anomaly candidates incomplete; rescanning rows")
+            anomalies = []
+            for r in rescan():
+                amt = float(r["amount"])
+                if amt > threshold:
+                    anomalies.append({**r, "amount": amt})
+        else:
+            logging.warning("Anomaly candidates incomplete and no rescan available; list may be partial")
+            anomalies = [as_row(amount, record) for _, amount, record in self.candidates if amount > threshold]
+
+        top3 = sorted(self.total_by_cat.items(), key=lambda x: x[1], reverse=True)[:3]
+        return {
+            "total_spend": round(self.stats.total, 2),
+            "average_amount": round(avg, 2),
+            "count_by_category": dict(self.count_by_cat),
+            "total_by_category": {k: round(v, 2) for k, v in self.total_by_cat.items()},
+            "top_3_categories_by_total": [(k, round(v, 2)) for k, v in top3],
+            "largest_5_transactions": [as_row(amount, record) for amount, record in self.top.largest()],
+            "anomaly_rule": {"type": "mean_plus_2std", "threshold": round(threshold, 2)},
+            "anomalies": anomalies,
+        }
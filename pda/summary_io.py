@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+from .utils import atomic_open
+
+SUMMARY_NAME = "summary.json"
+SUMMARY_MSGPACK_NAME = "summary.msgpack"
+ENRICHMENT_NAME = "summary.enrichment.json"
+FORMATS = ("json", "msgpack")
+DB_SUFFIX = ".sqlite"  # summary kept in the sqlite store (see pda.sqlstore)
+
+
+@lru_cache(maxsize=None)
+def _orjson() -> Any:
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+@lru_cache(maxsize=None)
+def _msgpack() -> Any:
+    try:
+        import msgpack
+    except ImportError:
+        return None
+    return msgpack
+
+
+def resolve_format(fmt: str) -> str:
+    """The format write_summary_file will actually use for fmt."""
+    return "json" if fmt == "msgpack" and _msgpack() is None else fmt
+
+
+def summary_path_in(output_dir: str, fmt: str = "json") -> Path:
+    if fmt == "sqlite":
+        from .sqlstore import db_path_in
+
+        return db_path_in(output_dir)
+    return Path(output_dir) / (SUMMARY_MSGPACK_NAME if fmt == "msgpack" else SUMMARY_NAME)
+
+
+def find_summary(output_dir: str) -> Path:
+    """The summary file in output_dir (the most recently written format), summary.json if none.
+
+    Without a summary file, the sqlite store is returned if it holds a summary.
+    """
+    found = [p for p in (summary_path_in(output_dir, f) for f in FORMATS) if p.exists()]
+    if found:
+        return max(found, key=lambda p: p.stat().st_mtime_ns)
+    db = summary_path_in(output_dir, "sqlite")
+    if db.exists():
+        from .sqlstore import document_text
+
+        if document_text(db, "summary") is not None:
+            return db
+    return summary_path_in(output_dir)
+
+
+def write_json(path: Path, payload: Any, pretty: bool = False) -> Path:
+    """Write payload as JSON atomically: compact unless pretty, via orjson when installed.
+
+    Without orjson the stdlib encoder streams chunks to the file instead of
+    building the whole document in memory first.
+    """
+    orjson = _orjson()
+    with atomic_open(path, "wb" if orjson else "w") as f:
+        if orjson is not None:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2 if pretty else 0))
+        elif pretty:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        else:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    return Path(path)
+
+
+def read_json(path: Path) -> Any:
+    data = Path(path).read_bytes()
+    orjson = _orjson()
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def write_summary_file(output_dir: str, summary: dict, pretty: bool = False, fmt: str = "json") -> Path:
+    """Write summary to output_dir as summary.json (or summary.msgpack) and drop stale enrichment.
+
+    msgpack falls back to JSON when the msgpack package is not installed.
+    fmt="sqlite" stores it as a document in the sqlite store instead. The
+    other formats' summaries are removed so readers never pick up an old one.
+    """
+    if resolve_format(fmt) != fmt:
+        logging.warning("msgpack is not installed; writing %s instead", SUMMARY_NAME)
+        fmt = "json"
+    out_path = summary_path_in(output_dir, fmt)
+    db = summary_path_in(output_dir, "sqlite")
+    if fmt == "sqlite":
+        from .sqlstore import put_documents
+
+        put_documents(out_path, {"summary": summary}, drop=["enrichment"])
+    elif db.exists():
+        from .sqlstore import put_documents
+
+        put_documents(db, {}, drop=["summary", "enrichment"])
+    if fmt == "msgpack":
+        with atomic_open(out_path, "wb") as f:
+            f.write(_msgpack().packb(summary, use_bin_type=True))
+    elif fmt == "json":
+        write_json(out_path, summary, pretty=pretty)
+    for other in FORMATS:
+        if other != fmt:
+            summary_path_in(output_dir, other).unlink(missing_ok=True)
+    (Path(output_dir) / ENRICHMENT_NAME).unlink(missing_ok=True)
+    return out_path
+
+
+def load_summary(summary_path: str, with_enrichment: bool = True) -> dict:
+    """Read a summary file (JSON, msgpack or the sqlite store, by suffix) with its enrichment merged in."""
+    p = Path(summary_path)
+    if p.suffix == DB_SUFFIX:
+        from .sqlstore import get_document
+
+        summary = get_document(p, "summary")
+        if summary is None:
+            raise FileNotFoundError(f"No summary in {p}")
+        if with_enrichment:
+            enrichment = get_document(p, "enrichment")
+            if enrichment is not None:
+                summary["enrichment"] = enrichment
+        return summary
+    if p.suffix == ".msgpack":
+        msgpack = _msgpack()
+        if msgpack is None:
+            raise RuntimeError(f"msgpack is required to read {p}")
+        summary = msgpack.unpackb(p.read_bytes(), raw=False)
+    else:
+        summary = read_json(p)
+    if with_enrichment:
+        enrichment = load_enrichment(str(p.parent))
+        if enrichment is not None:
+            summary["enrichment"] = enrichment
+    return summary
+
+
+def load_enrichment(output_dir: str) -> Optional[dict]:
+    summary = find_summary(output_dir)
+    if summary.suffix == DB_SUFFIX:
+        from .sqlstore import get_document
+
+        return get_document(summary, "enrichment")
+    p = Path(output_dir) / ENRICHMENT_NAME
+    try:
+        return read_json(p)
+    except (OSError, ValueError):
+        return None
+
+
+def write_enrichment(output_dir: str, enrichment: dict, pretty: bool = False) -> Path:
+    """Store enrichment in the sidecar next to the summary instead of rewriting the summary.
+
+    A summary kept in the sqlite store gets its enrichment as a document there.
+    """
+    summary = find_summary(output_dir)
+    if summary.suffix == DB_SUFFIX:
+        from .sqlstore import put_documents
+
+        return put_documents(summary, {"enrichment": enrichment})
+    return write_json(Path(output_dir) / ENRICHMENT_NAME, enrichment, pretty=pretty)
@@ -1,7 +1,17 @@
 from __future__ import annotations
 
+import bisect
+import io
+import json
 import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import ContextDecorator, contextmanager
 from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
 
 def setup_logger(log_file: str = "logs/app.log", level: int = logging.INFO) -> None:
     """Configure logging to both console and a file.
@@ -25,3 +35,262 @@ def ensure_dir(path: str) -> Path:
     p = Path(path)
     p.mkdir(parents=True, exist_ok=True)
     return p
+
+
+@contextmanager
+def atomic_open(path: Path, mode: str = "w") -> Iterator[IO]:
+    """Open a unique temp file in path's directory that is renamed onto path on success.
+
+    Readers see either the old or the new file, never a partial one, even
+    with several writers racing on the same path. On error the temp file is
+    removed and path is left untouched.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_text(path: Path, text: str) -> Path:
+    """Write text to path atomically (see atomic_open)."""
+    with atomic_open(path) as f:
+        f.write(text)
+    return Path(path)
+
+
+class _ByteRange(io.RawIOBase):
+    """Raw reader over bytes [start, end) of a file."""
+
+    def __init__(self, path: str, start: int, end: Optional[int]) -> None:
+        self._f = open(path, "rb")
+        self._f.seek(start)
+        self._left = None if end is None else max(0, end - start)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._left is not None:
+            if self._left == 0:
+                return 0
+            b = memoryview(b)[: self._left]
+        n = self._f.readinto(b)
+        if self._left is not None:
+            self._left -= n
+        return n
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
+
+
+def open_byte_range(path: str, start: int = 0, end: Optional[int] = None) -> TextIO:
+    """Open bytes [start, end) of a UTF-8 file as text (newline='' for csv)."""
+    return io.TextIOWrapper(io.BufferedReader(_ByteRange(path, start, end)), encoding="utf-8", newline="")
+
+
+# --- metrics -----------------------------------------------------------------
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """Fixed-bucket histogram (Prometheus style: cumulative on export)."""
+
+    def __init__(self, buckets: Sequence[float] = DURATION_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot: +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """Thread-safe counters and histograms for one process.
+
+    Metrics are meant for per-call or per-batch events (a stage, a file, a
+    chunk), not per row: callers count rows locally and add the total.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    def incr(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DURATION_BUCKETS, **labels: Any) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram(buckets)
+            h.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        """JSON-ready copy: {"counters": [...], "histograms": [...]}."""
+        with self._lock:
+            counters = [
+                {"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": n,
+                    "labels": dict(l),
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts)),
+                }
+                for (n, l), h in sorted(self.histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (for the node-exporter textfile collector)."""
+
+        def fmt(labels: Labels, extra: Labels = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        lines: List[str] = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{fmt(labels)} {_number(value)}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, n in zip([_number(b) for b in h.buckets] + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{fmt(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_sum{fmt(labels)} {_number(h.sum)}")
+                lines.append(f"{name}_count{fmt(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _number(value: float) -> str:
+    """Sample value without rounding: integral values as ints, others via repr."""
+    v = float(value)
+    if v.is_integer():
+        return str(int(v))
+    if math.isnan(v):
+        return "NaN"
+    if math.isinf(v):
+        return "+Inf" if v > 0 else "-Inf"
+    return repr(v)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
+
+
+def incr(name: str, value: float = 1, **labels: Any) -> None:
+    """Add value to counter name{labels} in the process-wide METRICS."""
+    METRICS.incr(name, value, **labels)
+
+
+def observe(name: str, value: float, **labels: Any) -> None:
+    """Record value in histogram name{labels} in the process-wide METRICS."""
+    METRICS.observe(name, value, **labels)
+
+
+# Set by pda.profiling while --profile-cpu/--profile-mem is active; timed()
+# only checks it for None otherwise.
+_stage_profiler: Any = None
+
+
+def set_stage_profiler(profiler: Any) -> None:
+    """Install an object with enter(stage) -> token / exit(token) around every timed() stage."""
+    global _stage_profiler
+    _stage_profiler = profiler
+
+
+class timed(ContextDecorator):
+    """Time a stage as a context manager or decorator.
+
+    Records wall time in pda_stage_duration_seconds{stage}, process CPU time
+    in pda_stage_cpu_seconds_total{stage} and pda_stage_runs_total{stage,
+    status}. CPU time is for the whole process, so it includes other
+    threads running at the same time (worker processes are not included).
+    """
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def _recreate_cm(self) -> "timed":
+        return timed(self.stage)
+
+    def __enter__(self) -> "timed":
+        profiler = _stage_profiler
+        self._profile = profiler.enter(self.stage) if profiler is not None else None
+        self._profiler = profiler
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        self.seconds = time.perf_counter() - self._wall
+        if self._profiler is not None:
+            self._profiler.exit(self._profile)
+        observe("pda_stage_duration_seconds", self.seconds, stage=self.stage)
+        incr("pda_stage_cpu_seconds_total", time.process_time() - self._cpu, stage=self.stage)
+        incr("pda_stage_runs_total", stage=self.stage, status="error" if exc_type else "ok")
+
+
+def file_size(path: Any) -> int:
+    """Size of path in bytes (0 if missing), for bytes read/written counters."""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def write_run_record(path: str, record: Dict[str, Any]) -> Path:
+    """Append record plus a METRICS snapshot as one JSON line to path."""
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    with open(p, "a", encoding="utf-8") as f:
+        f.write(json.dumps({**record, **METRICS.snapshot()}, ensure_ascii=False) + "\n")
+    return p
+
+
+def write_prometheus(path: str) -> Path:
+    """Write METRICS in Prometheus text format atomically (textfile collectors read *.prom)."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    return atomic_write_text(Path(path), METRICS.to_prometheus())
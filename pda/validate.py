@@ -1,18 +1,33 @@
 from __future__ import annotations
 
 import re
-from typing import Any, Dict, Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+from .utils import incr
 
-def validate_date(date_str: str) -> bool:
-    """Return True if date_str matches YYYY-MM-DD.
+DATE_PATTERN = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+
+DATE_ERROR = "Invalid date format (expected YYYY-MM-DD)"
+RANGE_ERROR = "Amount out of range"
+CATEGORY_ERROR = "Empty category"
+AMOUNT_MIN = -100000
+AMOUNT_MAX = 100000
+
+_DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
 
-    TODO:
-    - Keep regex-based validation (required)
-    - Optionally add semantic validation (month/day ranges) as stretch
-    """
-    return bool(DATE_PATTERN.match((date_str or "").strip()))
+
+def _is_calendar_date(m: "re.Match[str]") -> bool:
+    year, month, day = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    if year < 1 or not 1 <= month <= 12 or not 1 <= day <= _DAYS_IN_MONTH[month]:
+        return False
+    return month != 2 or day < 29 or (year % 4 == 0 and (year % 100 != 0 or year % 400 == 0))
+
+
+def validate_date(date_str: str) -> bool:
+    """Return True if date_str matches YYYY-MM-DD and is a real calendar day."""
+    m = DATE_PATTERN.match((date_str or "").strip())
+    return bool(m) and _is_calendar_date(m)
 
 
 def parse_amount(value: Any) -> float:
@@ -23,8 +38,8 @@ def parse_amount(value: Any) -> float:
     - Must be within [-100000, 100000]
     """
     amount = float(value)
-    if not (-100000 <= amount <= 100000):
-        raise ValueError("Amount out of range")
+    if not (AMOUNT_MIN <= amount <= AMOUNT_MAX):
+        raise ValueError(RANGE_ERROR)
     return round(amount, 2)
 
 
@@ -47,12 +62,12 @@ def validate_row(row: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]], O
         description = (row.get("description") or "").strip()
 
         if not validate_date(date):
-            return False, None, "Invalid date format (expected YYYY-MM-DD)"
+            return False, None, DATE_ERROR
 
         amount = parse_amount(amt_raw)
 
         if not category:
-            return False, None, "Empty category"
+            return False, None, CATEGORY_ERROR
 
         cleaned = {
             "date": date,
@@ -64,3 +79,111 @@ def validate_row(row: Dict[str, Any]) -> Tuple[bool, Optional[Dict[str, Any]], O
 
     except Exception as e:
         return False, None, str(e)
+
+
+@lru_cache(maxsize=None)
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+NUMPY_MIN_BATCH = 1024
+_SLOW = "slow path"
+
+
+def validate_rows(
+    batch: Dict[str, Sequence[Any]], use_numpy: Optional[bool] = None
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Tuple[int, str]]]:
+    """Validate a batch of rows given as column lists.
+
+    batch maps column name -> list of raw values (missing columns count as
+    None). Returns (cleaned, rejected): cleaned is [(index, cleaned_row)],
+    rejected is [(index, error_reason)], both in index order.
+
+    Accept/reject decisions and error messages are identical to
+    validate_row. Date validity (regex + month/day check) is memoized per
+    distinct string and invalid dates/amounts become error messages without
+    going through validate_row's catch-all, so valid rows never raise; rows
+    with non-string values fall back to validate_row.
+    The amount range check is done with NumPy when it is installed and the
+    batch is large enough.
+    """
+    n = max((len(col) for col in batch.values()), default=0)
+    none = [None] * n
+    dates = batch.get("date", none)
+    amounts = batch.get("amount", none)
+    categories = batch.get("category", none)
+    descriptions = batch.get("description", none)
+
+    date_match = DATE_PATTERN.match
+    date_ok: Dict[str, bool] = {}
+
+    # Pass 1: date check and amount parsing. status[i] is None (pending
+    # range/category checks), an error message, or _SLOW.
+    status: List[Optional[str]] = [None] * n
+    values: List[float] = [0.0] * n
+    for i, (d, a, c, desc) in enumerate(zip(dates, amounts, categories, descriptions)):
+        if not (
+            (d is None or d.__class__ is str)
+            and (c is None or c.__class__ is str)
+            and (desc is None or desc.__class__ is str)
+        ):
+            status[i] = _SLOW
+            continue
+        ok = date_ok.get(d)
+        if ok is None:
+            m = date_match((d or "").strip())
+            ok = date_ok[d] = bool(m) and _is_calendar_date(m)
+        if not ok:
+            status[i] = DATE_ERROR
+        elif a.__class__ is str:
+            try:
+                values[i] = float(a)
+            except ValueError as e:
+                status[i] = str(e)
+        else:
+            status[i] = _SLOW
+
+    if use_numpy is None:
+        use_numpy = n >= NUMPY_MIN_BATCH
+    np = _numpy() if use_numpy else None
+    if np is not None:
+        arr = np.asarray(values, dtype=np.float64)
+        in_range = ((arr >= AMOUNT_MIN) & (arr <= AMOUNT_MAX)).tolist()
+    else:
+        in_range = [AMOUNT_MIN <= v <= AMOUNT_MAX for v in values]
+
+    incr("pda_validate_rows_total", n, backend="python" if np is None else "numpy")
+
+    # Pass 2: range/category checks and output assembly.
+    cleaned: List[Tuple[int, Dict[str, Any]]] = []
+    rejected: List[Tuple[int, str]] = []
+    for i, st in enumerate(status):
+        if st is None:
+            if not in_range[i]:
+                rejected.append((i, RANGE_ERROR))
+                continue
+            category = (categories[i] or "").strip()
+            if not category:
+                rejected.append((i, CATEGORY_ERROR))
+                continue
+            cleaned.append((i, {
+                "date": dates[i].strip(),
+                "amount": round(values[i], 2),
+                "category": category,
+                "description": (descriptions[i] or "").strip(),
+            }))
+        elif st is _SLOW:
+            row = {"date": dates[i], "amount": amounts[i], "category": categories[i], "description": descriptions[i]}
+            ok, row_cleaned, err = validate_row(row)
+            if ok and row_cleaned:
+                cleaned.append((i, row_cleaned))
+            else:
+                rejected.append((i, err or "Unknown error"))
+        else:
+            rejected.append((i, st))
+
+    return cleaned, rejected
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+from .analyze import analyze_notes, iter_cleaned_expenses, write_summary
+from .anomaly import anomaly_rule_from, apply_anomaly_rule
+from .ingest import ingest_incremental
+from .manifest import STATE_NAME
+from .notes_parallel import is_multi_notes, resolve_notes_paths
+from .query import find_rows
+from .rollups import Rollups, load_rollups
+from .stats import ExpenseAccumulator
+from .summary_io import load_summary
+from .utils import METRICS, incr, timed
+
+DEFAULT_PORT = 8765
+
+_ROW_FILTERS = {
+    "from": ("start", str),
+    "to": ("end", str),
+    "category": ("category", str),
+    "min_amount": ("min_amount", float),
+    "max_amount": ("max_amount", float),
+    "top": ("top", int),
+    "limit": ("limit", int),
+}
+
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class Watcher:
+    """One output directory kept up to date, with its state held in memory.
+
+    The expense accumulator, rollups and current summary live in the
+    process between refreshes, and enrichers share the process-wide cache
+    (pda.cache.get_cache), so a refresh only validates the appended bytes,
+    rewrites the summary and re-renders the report. The on-disk artifacts
+    (manifest, expense_state.json, store, indexes) stay those of
+    `run --incremental`, so either can take over from the other.
+    """
+
+    def __init__(
+        self,
+        csv_path: str,
+        notes_path: str,
+        profile_path: str | None,
+        output_dir: str,
+        report_path: str,
+        api: Optional[str] = None,
+        cache_dir: str = "cache",
+        workers: int = 1,
+        anomaly: Union[None, str, dict] = None,
+        pretty: bool = False,
+        fmt: str = "json",
+        report_options: Optional[dict] = None,
+        dedup: bool = False,
+    ) -> None:
+        self.csv_path = csv_path
+        self.notes_path = notes_path
+        self.profile_path = profile_path
+        self.output_dir = output_dir
+        self.report_path = report_path
+        self.api = api
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.rule = anomaly_rule_from(anomaly)
+        self.encoding = {"pretty": pretty, "fmt": fmt}
+        self.report_options = report_options or {}
+        self.dedup = dedup
+
+        self.acc: Optional[ExpenseAccumulator] = None
+        self.rollups = Rollups()
+        self.summary: dict = {}
+        self.refreshes = 0
+        self.last_refresh: Optional[str] = None
+        self.last_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.lock = threading.RLock()
+        self._seen: Optional[tuple] = None
+        self._pending: Optional[tuple] = None
+
+    def watched_paths(self) -> List[str]:
+        notes = [str(p) for p in resolve_notes_paths(self.notes_path)] if is_multi_notes(self.notes_path) else [self.notes_path]
+        return [self.csv_path] + notes + ([self.profile_path] if self.profile_path else [])
+
+    def signature(self) -> tuple:
+        """(path, size, mtime_ns) of every watched input: one stat() each."""
+        return tuple((p, _stat(p)) for p in self.watched_paths())
+
+    def poll(self) -> bool:
+        """Refresh if the inputs changed; returns True if a refresh ran.
+
+        A change is only acted on once the inputs look the same on two
+        consecutive polls, so a writer caught mid-append is not ingested
+        up to a half-written row.
+        """
+        sig = self.signature()
+        if sig == self._seen:
+            self._pending = None
+            return False
+        if self._seen is not None and sig != self._pending:
+            self._pending = sig
+            return False
+        self._pending = None
+        try:
+            self.refresh()
+        except Exception as e:  # keep serving the last good summary
+            logging.exception("Watch refresh failed")
+            self.last_error = str(e)
+            incr("pda_watch_refreshes_total", status="error")
+        self._seen = sig
+        return True
+
+    def refresh(self) -> dict:
+        """Apply new input data and rewrite summary/report; returns the current summary."""
+        t0 = time.perf_counter()
+        with self.lock, timed("refresh"):
+            result, acc = ingest_incremental(
+                self.csv_path, self.notes_path, self.profile_path, self.output_dir, workers=self.workers, acc=self.acc,
+                dedup=self.dedup,
+            )
+            if acc is None:
+                # CSV unchanged since an earlier incremental run: resume its state once
+                state = json.loads((Path(self.output_dir) / STATE_NAME).read_text(encoding="utf-8"))
+                acc = ExpenseAccumulator.from_state(state)
+            self.acc = acc
+            if result["changed"] or not self.summary:
+                self._publish()
+                self.rollups = load_rollups(self.output_dir)
+            self.refreshes += 1
+            self.last_refresh = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            self.last_seconds = round(time.perf_counter() - t0, 6)
+            self.last_error = None
+        incr("pda_watch_refreshes_total", status="ok")
+        logging.info(
+            "Watch refresh: csv=%s notes=%s rows=%s in %.1fms",
+            result["csv_action"], result["notes_action"], acc.count, self.last_seconds * 1000,
+        )
+        return self.summary
+
+    def _publish(self) -> None:
+        from .report import generate_report
+
+        cleaned = str(Path(self.output_dir) / "cleaned_expenses.csv")
+        rescan = lambda: iter_cleaned_expenses(cleaned)  # noqa: E731
+        combined = {
+            "expenses": apply_anomaly_rule(self.acc.result(rescan=rescan), self.rule, rescan),
+            "notes": analyze_notes(str(Path(self.output_dir) / "notes_extracted.json")),
+        }
+        summary_path = write_summary(self.output_dir, combined, **self.encoding)
+        if self.api:
+            from .enrich import run_enrich
+
+            run_enrich(self.output_dir, self.api, self.cache_dir, profile_path=self.profile_path)
+        generate_report(str(summary_path), self.report_path, **self.report_options)
+        self.summary = load_summary(str(summary_path))
+
+    def status(self) -> dict:
+        return {
+            "output_dir": str(Path(self.output_dir).resolve()),
+            "rows": self.acc.count if self.acc is not None else 0,
+            "refreshes": self.refreshes,
+            "last_refresh": self.last_refresh,
+            "last_seconds": self.last_seconds,
+            "last_error": self.last_error,
+        }
+
+    def handle(self, path: str, params: Dict[str, str]) -> Tuple[int, Any]:
+        """Answer one GET: (HTTP status, JSON-ready payload or plain text)."""
+        if path == "/summary":
+            return 200, self.summary
+        if path == "/status":
+            return 200, self.status()
+        if path == "/metrics":
+            return 200, METRICS.to_prometheus()
+        if path != "/query":
+            return 404, {"error": f"unknown path {path}; try /summary, /status, /query or /metrics"}
+        try:
+            with self.lock:
+                if "by" in params:
+                    return 200, self.rollups.query(
+                        params.get("from"), params.get("to"), by=params["by"], category=params.get("category")
+                    )
+                filters = {}
+                for name, value in params.items():
+                    if name not in _ROW_FILTERS:
+                        return 400, {"error": f"unknown filter {name!r}"}
+                    key, cast = _ROW_FILTERS[name]
+                    filters[key] = cast(value)
+                return 200, find_rows(self.output_dir, **filters)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server naming
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        status, payload = self.server.watcher.handle(url.path, params)
+        if isinstance(payload, str):
+            body, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, ctype = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - base class signature
+        logging.debug("HTTP %s " + format, self.client_address[0], *args)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], watcher: Watcher) -> None:
+        super().__init__(address, _Handler)
+        self.watcher = watcher
+
+
+def make_server(watcher: Watcher, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """HTTP server answering /summary, /status, /query and /metrics from watcher (port 0: any free port)."""
+    return _Server((host, port), watcher)
+
+
+def run_watch(
+    csv_path: str,
+    notes_path: str,
+    profile_path: str | None,
+    output_dir: str,
+    report_path: str,
+    interval: float = 1.0,
+    host: str = "127.0.0.1",
+    port: Optional[int] = None,
+    stop: Optional[threading.Event] = None,
+    **options: Any,
+) -> Watcher:
+    """Entry point for watch/serve: poll the inputs every interval seconds until stopped.
+
+    With port, the current state is also served over HTTP on host:port.
+    Runs until stop is set or the process is interrupted (Ctrl-C); options
+    are passed on to Watcher.
+    """
+    watcher = Watcher(csv_path, notes_path, profile_path, output_dir, report_path, **options)
+    stop = stop or threading.Event()
+    server = None
+    try:
+        watcher.poll()
+        if port is not None:
+            server = make_server(watcher, host, port)
+            threading.Thread(target=server.serve_forever, name="pda-serve", daemon=True).start()
+            logging.info("Serving %s on http://%s:%s", output_dir, *server.server_address[:2])
+        logging.info("Watching %s every %ss", ", ".join(watcher.watched_paths()), interval)
+        while not stop.wait(interval):
+            watcher.poll()
+    except KeyboardInterrupt:
+        logging.info("Watch interrupted; stopping")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return watcher
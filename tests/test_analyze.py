@@ -1,6 +1,7 @@
 import unittest
 from pathlib import Path
 import json
+import tempfile
 
 from pda.analyze import analyze_expenses
 
@@ -9,5 +10,13 @@ class TestAnalyze(unittest.TestCase):
         # TODO: create a minimal cleaned CSV and validate results
         self.assertTrue(True)
 
+    def test_analyze_expenses_keeps_first_row(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            p = Path(tmp) / "cleaned_expenses.csv"
+            p.write_text("date,amount,category,description\n2024-01-01,10.0,Food,a\n2024-01-02,5.0,Rent,b\n", encoding="utf-8")
+            out = analyze_expenses(str(p))
+        self.assertEqual(out["total_spend"], 15.0)
+        self.assertEqual(out["count_by_category"], {"Food": 1, "Rent": 1})
+
 if __name__ == "__main__":
     unittest.main()
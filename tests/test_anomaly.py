@@ -0,0 +1,82 @@
+import json
+import random
+import statistics
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+
+from pda.analyze import run_analyze
+from pda.anomaly import AnomalyRule, P2Quantile, anomaly_rule_from
+from pda.ingest import run_ingest
+
+
+def _rows():
+    rows = []
+    day = date(2024, 1, 1)
+    for i in range(120):
+        rows.append({"date": (day + timedelta(days=i)).isoformat(), "amount": str(4.0 + (i % 5) * 0.25), "category": "Coffee", "description": "c"})
+        rows.append({"date": (day + timedelta(days=i)).isoformat(), "amount": str(1500.0 + (i % 3) * 10), "category": "Rent", "description": "r"})
+    rows.append({"date": "2024-05-01", "amount": "40.00", "category": "Coffee", "description": "fancy"})
+    return rows
+
+
+class TestAnomaly(unittest.TestCase):
+    def test_p2_quantile_tracks_exact_quantiles(self):
+        rng = random.Random(11)
+        xs = [rng.lognormvariate(3, 1) for _ in range(20000)]
+        for p in (0.5, 0.9, 0.99):
+            q = P2Quantile(p)
+            for x in xs:
+                q.add(x)
+            exact = statistics.quantiles(xs, n=1000)[int(p * 1000) - 1]
+            self.assertLess(abs(q.value() - exact) / exact, 0.05, p)
+        small = P2Quantile(0.5)
+        for x in (3.0, 1.0, 2.0):
+            small.add(x)
+        self.assertEqual(small.value(), 2.0)
+
+    def test_per_category_flags_small_unusual_spend(self):
+        rows = _rows()
+        global_rule = anomaly_rule_from({"type": "zscore", "by_category": False})
+        anomalies, _ = global_rule.detect(lambda: rows)
+        self.assertNotIn("fancy", [a["description"] for a in anomalies])
+
+        anomalies, rule = anomaly_rule_from("per_category").detect(lambda: rows)
+        self.assertEqual([a["description"] for a in anomalies], ["fancy"])
+        self.assertEqual(rule["type"], "zscore")
+        self.assertIn("Rent", rule["thresholds"])
+
+    def test_rolling_and_robust_rules(self):
+        rows = _rows()
+        for config in ("rolling", {"type": "median_mad", "by_category": True}):
+            anomalies, rule = anomaly_rule_from(config).detect(lambda: iter(rows))
+            self.assertEqual([a["description"] for a in anomalies], ["fancy"], config)
+
+        shuffled = rows[:]
+        random.Random(2).shuffle(shuffled)
+        anomalies, _ = anomaly_rule_from("rolling").detect(lambda: iter(shuffled))
+        self.assertEqual([a["description"] for a in anomalies], ["fancy"])
+        with self.assertRaises(TypeError):
+            AnomalyRule()
+
+        rng = random.Random(5)
+        noisy = [{"date": "2024-01-01", "amount": rng.gauss(50, 10), "category": "A"} for _ in range(5000)]
+        anomalies, rule = anomaly_rule_from({"type": "quantile", "q": 0.99}).detect(lambda: noisy)
+        self.assertAlmostEqual(len(anomalies) / len(noisy), 0.01, delta=0.004)
+        self.assertAlmostEqual(rule["threshold"], 50 + 2.326 * 10, delta=1.5)
+
+    def test_default_rule_and_summary(self):
+        self.assertIsNone(anomaly_rule_from(None))
+        self.assertIsNone(anomaly_rule_from({"type": "global"}))
+        with self.assertRaises(ValueError):
+            anomaly_rule_from("nope")
+        with tempfile.TemporaryDirectory() as tmp:
+            run_ingest("data/raw/expenses.csv", "data/raw/notes.txt", None, tmp)
+            summary = json.loads(run_analyze(tmp, anomaly={"type": "zscore", "z": 1.0}).read_text(encoding="utf-8"))
+            rule = summary["expenses"]["anomaly_rule"]
+            self.assertEqual((rule["type"], rule["z"], rule["by_category"]), ("zscore", 1.0, True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pda.batch import run_batch
+from pda.fetch import FetchEngine
+
+
+class TestBatch(unittest.TestCase):
+    def test_tenants_isolated_failures_recorded_and_fx_shared(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            for name in ("expenses.csv", "notes.txt", "profile.json"):
+                shutil.copy(Path("data/raw") / name, tmp / name)
+            lines = [{"id": f"u{i}", "csv": "expenses.csv", "notes": "notes.txt", "profile": "profile.json"} for i in range(3)]
+            lines += [{"id": "bad", "csv": "missing.csv", "notes": "notes.txt"}, {"id": "u0", "csv": "x", "notes": "y"}]
+            manifest = tmp / "users.jsonl"
+            manifest.write_text("\n".join(json.dumps(x) for x in lines) + "\n{oops\n", encoding="utf-8")
+
+            calls = []
+            lock = threading.Lock()
+
+            def fake_get_json(self, url, params=None):
+                with lock:
+                    calls.append(url)
+                time.sleep(0.2)
+                return {"rates": {"EUR": 0.9}}
+
+            with mock.patch.object(FetchEngine, "get_json", fake_get_json):
+                agg = run_batch(str(manifest), out_root=str(tmp / "out"), cache_dir=str(tmp / "cache"), jobs=3,
+                                api="exchangerate")
+
+            self.assertEqual((agg["tenants"], agg["ok"], agg["failed"]), (6, 3, 3))
+            self.assertEqual(sorted(f["id"] for f in agg["failures"]), ["bad", "line6", "u0"])
+            self.assertEqual(len(calls), 1)
+            for i in range(3):
+                report = (tmp / "out" / f"u{i}" / "report.md").read_text(encoding="utf-8")
+                self.assertIn("0.9", report)
+            records = [json.loads(x) for x in (tmp / "out" / "batch_results.jsonl").read_text(encoding="utf-8").splitlines()]
+            self.assertEqual(len(records), 6)
+            self.assertFalse((tmp / "out" / "bad" / "report.md").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import csv
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.bench import STAGES, compare_results, generate_expenses, run_bench
+from pda.validate import validate_row
+
+
+class TestBench(unittest.TestCase):
+    def test_generated_expenses_match_parameters(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = generate_expenses(Path(tmp) / "e.csv", 5000, categories=7, invalid_rate=0.1, seed=1)
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(len(rows), 5000)
+            valid = [r for r in rows if validate_row(r)[0]]
+            self.assertAlmostEqual(1 - len(valid) / len(rows), 0.1, delta=0.02)
+            self.assertLessEqual(len({r["category"] for r in valid}), 7)
+            self.assertEqual(path.read_bytes(), generate_expenses(Path(tmp) / "f.csv", 5000, 7, 0.1, seed=1).read_bytes())
+
+    def test_run_and_compare(self):
+        result = run_bench(rows=500, repeat=1, memory=False)
+        self.assertEqual(list(result["stages"]), list(STAGES))
+        self.assertTrue(all(s["rows_per_sec"] for s in result["stages"].values()))
+        self.assertEqual(result["params"]["notes_lines"], 50)
+
+        slower = {"stages": {k: {**v, "rows_per_sec": v["rows_per_sec"] // 2} for k, v in result["stages"].items()}}
+        self.assertTrue(all(c["regression"] for c in compare_results(result, slower)))
+        self.assertFalse(any(c["regression"] for c in compare_results(result, result)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from pda.cache import Cache, get_cache, ttl_from_profile
+
+
+class TestCache(unittest.TestCase):
+    def test_memory_then_disk_hits(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            c = Cache(tmp)
+            self.assertIsNone(c.get("fx"))
+            c.set("fx", {"rate": 0.9})
+            self.assertEqual(c.get("fx"), {"rate": 0.9})
+
+            fresh = Cache(tmp)
+            self.assertEqual(fresh.get("fx"), {"rate": 0.9})
+            self.assertEqual(fresh.get("fx"), {"rate": 0.9})
+            self.assertEqual(c.stats()["memory_hits"], 1)
+            self.assertEqual((fresh.stats()["disk_hits"], fresh.stats()["memory_hits"]), (1, 1))
+            self.assertEqual([p.name for p in Path(tmp).iterdir()], ["fx.json"])
+
+    def test_ttl_expires_disk_and_legacy_entries(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            Cache(tmp).set("new", {"rate": 1.0})
+            legacy = Path(tmp) / "old.json"
+            legacy.write_text(json.dumps({"rate": 2.0}), encoding="utf-8")
+            self.assertEqual(Cache(tmp, ttl_seconds=60).get("old"), {"rate": 2.0})
+
+            past = time.time() - 3600
+            os.utime(legacy, (past, past))
+            entry = Path(tmp) / "new.json"
+            data = json.loads(entry.read_text(encoding="utf-8"))
+            data["stored_at"] = past
+            entry.write_text(json.dumps(data), encoding="utf-8")
+
+            c = Cache(tmp, ttl_seconds=60)
+            self.assertIsNone(c.get("old"))
+            self.assertIsNone(c.get("new"))
+            self.assertEqual(c.stats()["expired"], 2)
+            self.assertEqual(Cache(tmp).get("new"), {"rate": 1.0})
+
+    def test_ttl_per_lookup_on_shared_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            shared = get_cache(tmp)
+            self.assertIs(get_cache(tmp), shared)
+            shared.set("fx", {"rate": 0.9})
+            shared._mem["fx"] = (time.time() - 3600, {"rate": 0.9})
+            self.assertEqual(shared.get("fx", ttl_seconds=7200), {"rate": 0.9})
+            self.assertIsNone(shared.get("fx", ttl_seconds=60))
+            self.assertEqual(shared.get("fx"), {"rate": 0.9})
+            self.assertIsNone(shared.ttl_seconds)
+
+    def test_disk_size_bound_evicts_least_recent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            c = Cache(tmp, max_disk_bytes=200)
+            for i in range(5):
+                c.set(f"k{i}", {"pad": "x" * 40})
+                past = time.time() - 100 + i
+                os.utime(Path(tmp) / f"k{i}.json", (past, past))
+                c._disk[f"k{i}.json"] = (c._disk[f"k{i}.json"][0], past)
+            self.assertGreater(c.stats()["evictions"], 0)
+            names = sorted(p.name for p in Path(tmp).glob("*.json"))
+            self.assertIn("k4.json", names)
+            self.assertNotIn("k0.json", names)
+            self.assertLessEqual(sum((Path(tmp) / n).stat().st_size for n in names), 200)
+
+    def test_ttl_from_profile(self):
+        self.assertEqual(ttl_from_profile({"api_preferences": {"cache_ttl_hours": 24}}), 86400.0)
+        self.assertIsNone(ttl_from_profile({}))
+        self.assertIsNone(ttl_from_profile({"api_preferences": {"cache_ttl_hours": "x"}}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.analyze import analyze_expenses
+from pda.columnar import STORE_NAME, ColumnarStore
+from pda.ingest import ingest_csv
+
+
+class TestColumnar(unittest.TestCase):
+    def _write_csv(self, path, n):
+        lines = ["date,amount,category,description"]
+        for i in range(n):
+            lines.append('2024-%02d-%02d,%s,%s,"d %d, é"' % (i % 12 + 1, i % 28 + 1, (i * 37) % 500 - 20.25, "ABC"[i % 3], i))
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def test_store_matches_csv_analysis(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "in.csv"
+            self._write_csv(src, 200)
+            cleaned, _ = ingest_csv(str(src), tmp)
+
+            store = ColumnarStore.open(Path(tmp) / STORE_NAME)
+            self.assertIsNotNone(store)
+            with store:
+                self.assertEqual(store.rows, 200)
+                self.assertEqual(store.row(1)["description"], "d 1, é")
+            from_store = analyze_expenses(str(cleaned))
+
+            shutil.rmtree(Path(tmp) / STORE_NAME)
+            from_csv = analyze_expenses(str(cleaned))
+            self.assertEqual(json.dumps(from_store), json.dumps(from_csv))
+
+    def test_stale_store_is_ignored(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "in.csv"
+            self._write_csv(src, 5)
+            cleaned, _ = ingest_csv(str(src), tmp)
+            with open(cleaned, "a", encoding="utf-8") as f:
+                f.write("2024-01-01,1.0,Z,edited\r\n")
+            self.assertIsNone(ColumnarStore.open(Path(tmp) / STORE_NAME))
+
+
+if __name__ == "__main__":
+    unittest.main()
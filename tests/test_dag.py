@@ -0,0 +1,79 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from pda.dag import Stage, run_stages
+from pda.pipeline import run_pipeline
+
+
+class TestDag(unittest.TestCase):
+    def test_skips_unchanged_stages_and_cuts_off_identical_outputs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            src, mid, out = tmp / "src.txt", tmp / "mid.txt", tmp / "out.txt"
+            src.write_text("a b", encoding="utf-8")
+            calls = []
+
+            def count(_):
+                calls.append("count")
+                mid.write_text(str(len(src.read_text(encoding="utf-8").split())), encoding="utf-8")
+
+            def render(_):
+                calls.append("render")
+                out.write_text("words=" + mid.read_text(encoding="utf-8"), encoding="utf-8")
+
+            def stages():
+                return [
+                    Stage("count", count, inputs=[src], outputs=[mid]),
+                    Stage("render", render, deps=["count"], inputs=[mid], outputs=[out]),
+                ]
+
+            cache = tmp / "stages.json"
+            self.assertEqual([r.status for r in run_stages(stages(), cache)], ["ran", "ran"])
+            self.assertEqual([r.status for r in run_stages(stages(), cache)], ["cached", "cached"])
+
+            src.write_text("c d", encoding="utf-8")  # same word count: render is cut off
+            self.assertEqual([r.status for r in run_stages(stages(), cache)], ["ran", "cached"])
+            out.write_text("edited", encoding="utf-8")
+            self.assertEqual([r.status for r in run_stages(stages(), cache)], ["cached", "ran"])
+            self.assertEqual(calls, ["count", "render", "count", "render"])
+
+    def test_independent_stages_overlap_and_failures_propagate(self):
+        barrier = threading.Barrier(2, timeout=5)
+        stages = [
+            Stage("a", lambda _: barrier.wait()),
+            Stage("b", lambda _: barrier.wait()),
+            Stage("c", lambda done: sorted(done), deps=["a", "b"]),
+        ]
+        self.assertEqual(run_stages(stages)[2].value, ["a", "b"])
+
+        with self.assertRaises(ValueError):
+            run_stages([Stage("x", lambda _: 1, deps=["y"]), Stage("y", lambda _: 1, deps=["x"])])
+
+        def boom(_):
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            run_stages([Stage("boom", boom), Stage("after", lambda _: 1, deps=["boom"])])
+
+    def test_pipeline_rerun_is_cached(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out, report = Path(tmp) / "out", Path(tmp) / "report.md"
+            args = ("data/raw/expenses.csv", "data/raw/notes.txt", "data/raw/profile.json", str(out), str(report))
+            first = run_pipeline(*args)
+            self.assertEqual({r.status for r in first}, {"ran"})
+            body = report.read_bytes()
+
+            second = {r.name: r.status for r in run_pipeline(*args)}
+            self.assertEqual(second["profile"], "ran")
+            for name in ("ingest_csv", "ingest_notes", "analyze", "report"):
+                self.assertEqual(second[name], "cached", name)
+            self.assertEqual(report.read_bytes(), body)
+
+            third = {r.name: r.status for r in run_pipeline(*args, anomaly="zscore")}
+            self.assertEqual((third["ingest_csv"], third["analyze"]), ("cached", "ran"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import csv
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pda import dedup
+from pda.analyze import analyze_expenses, run_analyze
+from pda.dedup import DUPLICATES_NAME, FP_NAME, FingerprintSet, row_fingerprint
+from pda.ingest import ingest_csv, run_ingest
+from pda.summary_io import find_summary, load_summary
+
+HEADER = "date,amount,category,description\n"
+JAN = "2024-01-30,5.00,Food,Tea\n2024-01-31,12.50,Travel,Taxi\n2024-01-31,12.50,Travel,Taxi\n"
+# the next export repeats the last day: two taxis again (one spelled differently), then a third one
+FEB = "2024-01-31,12.50,travel,TAXI \n2024-01-31,12.50,Travel,Taxi\n2024-01-31,12.50,Travel,Taxi\n" \
+      "2024-02-01,3.00,Food,Bun\n"
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+class TestDedup(unittest.TestCase):
+    def test_fingerprint_normalizes_text_and_amount(self):
+        a = {"date": "2024-01-01", "amount": 5.0, "category": "Food", "description": "Uber  ride"}
+        self.assertEqual(row_fingerprint(a), row_fingerprint({**a, "amount": "5.00", "description": " uber RIDE"}))
+        self.assertEqual(row_fingerprint(a), row_fingerprint({**a, "category": "food "}))
+        self.assertNotEqual(row_fingerprint(a), row_fingerprint({**a, "amount": 5.01}))
+        self.assertNotEqual(row_fingerprint(a), row_fingerprint({**a, "date": "2024-01-02"}))
+
+    def test_repeats_within_one_export_are_kept(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path, out = Path(tmp, "e.csv"), str(Path(tmp, "out"))
+            csv_path.write_text(HEADER + "2024-01-02,4.50,Food,Coffee\n" * 2, encoding="utf-8")
+            ingest_csv(str(csv_path), out, dedup=True)
+            self.assertEqual(len(read_rows(Path(out, "cleaned_expenses.csv"))), 2)
+            self.assertEqual(read_rows(Path(out, DUPLICATES_NAME)), [])
+            self.assertAlmostEqual(analyze_expenses(out + "/cleaned_expenses.csv")["total_spend"], 9.0)
+
+    def test_overlapping_exports(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path = tmp / "e.csv"
+            for workers in (1, 2):
+                out = str(tmp / f"out{workers}")
+                csv_path.write_text(HEADER + JAN, encoding="utf-8")
+                ingest_csv(str(csv_path), out, workers=workers, dedup=True)
+                size = os.path.getsize(csv_path)
+                with open(csv_path, "a", encoding="utf-8") as f:
+                    f.write(FEB)
+                ingest_csv(str(csv_path), out, workers=workers, start=size, dedup=True)
+                self.assertEqual([r["description"] for r in read_rows(Path(out, "cleaned_expenses.csv"))],
+                                 ["Tea", "Taxi", "Taxi", "Taxi", "Bun"])
+                dups = read_rows(Path(out, DUPLICATES_NAME))
+                self.assertEqual([(d["description"], d["occurrence"]) for d in dups], [("TAXI", "0"), ("Taxi", "1")])
+                self.assertEqual(len(dups[0]["fingerprint"]), 16)
+            self.assertAlmostEqual(analyze_expenses(out + "/cleaned_expenses.csv")["total_spend"], 45.5)
+
+            # a set that no longer matches the cleaned CSV is rebuilt from it, copies included
+            os.utime(Path(out, "cleaned_expenses.csv"), ns=(1, 1))
+            size = os.path.getsize(csv_path)
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("2024-01-31,12.50,Travel,Taxi\n" * 4)
+            ingest_csv(str(csv_path), out, start=size, dedup=True)
+            self.assertEqual(len(read_rows(Path(out, "cleaned_expenses.csv"))), 6)
+            self.assertEqual(len(read_rows(Path(out, DUPLICATES_NAME))), 5)
+
+            ingest_csv(str(csv_path), out)
+            self.assertEqual(len(read_rows(Path(out, "cleaned_expenses.csv"))), 11)
+            self.assertFalse(Path(out, DUPLICATES_NAME).exists())
+            self.assertFalse(Path(out, FP_NAME).exists())
+
+    def test_separate_and_concatenated_export_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            jan, feb, both = tmp / "jan.csv", tmp / "feb.csv", tmp / "both.csv"
+            jan.write_text(HEADER + JAN, encoding="utf-8")
+            feb.write_text(HEADER + FEB, encoding="utf-8")
+            both.write_text(HEADER + JAN + HEADER + FEB, encoding="utf-8")  # cat jan.csv feb.csv
+            expected = ["Tea", "Taxi", "Taxi", "Taxi", "Bun"]
+
+            out = str(tmp / "files")
+            ingest_csv(str(jan), out, dedup=True)
+            ingest_csv(str(feb), out, dedup=True)
+            ingest_csv(str(jan), out, dedup=True)  # an export seen before adds nothing
+            self.assertEqual([r["description"] for r in read_rows(Path(out, "cleaned_expenses.csv"))], expected)
+            self.assertEqual(len(read_rows(Path(out, DUPLICATES_NAME))), 2 + 3)
+            self.assertEqual(read_rows(Path(out, "rejected_rows.csv")), [])
+            self.assertAlmostEqual(analyze_expenses(out + "/cleaned_expenses.csv")["total_spend"], 45.5)
+
+            for workers in (1, 2):
+                out = str(tmp / f"cat{workers}")
+                ingest_csv(str(both), out, workers=workers, dedup=True)
+                self.assertEqual([r["description"] for r in read_rows(Path(out, "cleaned_expenses.csv"))], expected)
+                self.assertEqual(read_rows(Path(out, "rejected_rows.csv")), [])
+
+            out = str(tmp / "incremental")
+            for path in (jan, feb):
+                result = run_ingest(str(path), str(jan), None, out, incremental=True, dedup=True)
+                self.assertEqual(result["csv_action"], "full")
+            self.assertEqual([r["description"] for r in read_rows(Path(out, "cleaned_expenses.csv"))], expected)
+            run_analyze(out, incremental=True)
+            summary = load_summary(str(find_summary(out)))
+            self.assertAlmostEqual(summary["expenses"]["total_spend"], 45.5)
+
+    def test_fingerprint_set_segments_and_reopen(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cleaned = Path(tmp, "cleaned_expenses.csv")
+            cleaned.write_text(HEADER, encoding="utf-8")
+            with mock.patch.object(dedup, "SEGMENT_ROWS", 50), mock.patch.object(dedup, "MAX_SEGMENTS", 3):
+                fps = FingerprintSet(Path(tmp, FP_NAME))
+                self.assertEqual(sum(fps.add(i * 7919) for i in range(1000)), 1000)
+                self.assertFalse(fps.add(7919 * 500))
+                fps.close(cleaned)
+                fps = FingerprintSet(Path(tmp, FP_NAME), append=True, expected_rows=5000)
+            self.assertTrue(fps.valid)
+            self.assertEqual(len(fps.segments), 1)
+            self.assertEqual(fps.count, 1000)
+            self.assertIn(7919 * 999, fps)
+            self.assertNotIn(7919 * 1000, fps)
+            self.assertTrue(fps.add(7919 * 1000))
+            fps.close(cleaned)
+
+    def test_incremental_toggle_reingests(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path, notes_path, out = tmp / "e.csv", tmp / "n.txt", str(tmp / "out")
+            csv_path.write_text(HEADER + "2024-01-01,5.00,Food,Tea\n", encoding="utf-8")
+            notes_path.write_text("TODO: x\n", encoding="utf-8")
+            run_ingest(str(csv_path), str(notes_path), None, out, incremental=True)
+            self.assertFalse(Path(out, FP_NAME).exists())
+            result = run_ingest(str(csv_path), str(notes_path), None, out, incremental=True, dedup=True)
+            self.assertEqual(result["csv_action"], "full")
+            self.assertTrue(Path(out, FP_NAME, "meta.json").exists())
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("2024-01-01,5.00,Food,Tea\n2024-01-02,5.00,Food,Tea\n")
+            result = run_ingest(str(csv_path), str(notes_path), None, out, incremental=True, dedup=True)
+            self.assertEqual(result["csv_action"], "append")
+            self.assertEqual(len(read_rows(Path(out, "cleaned_expenses.csv"))), 2)
+            result = run_ingest(str(csv_path), str(notes_path), None, out, incremental=True, dedup=True)
+            self.assertEqual(result["csv_action"], "unchanged")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.enrich import run_enrich
+from pda.enrichers import available_enrichers, get_enricher, register_enricher
+
+
+class TestEnrichers(unittest.TestCase):
+    def test_builtins_resolve_lazily(self):
+        self.assertIn("fx_convert", available_enrichers())
+        self.assertEqual(get_enricher("fx_convert").__name__, "enrich_fx_convert")
+        with self.assertRaises(ValueError):
+            get_enricher("no_such_tool")
+
+    def test_registered_enricher_runs(self):
+        def tag(input_dir, cache_dir, profile):
+            p = Path(input_dir) / "summary.json"
+            summary = json.loads(p.read_text(encoding="utf-8"))
+            summary["enrichment"] = {"type": "tag", "city": profile.get("home_city")}
+            p.write_text(json.dumps(summary), encoding="utf-8")
+
+        register_enricher("test_tag", tag)
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / "summary.json").write_text("{}", encoding="utf-8")
+            out = run_enrich(tmp, "test_tag", str(Path(tmp) / "cache"), profile_path="data/raw/profile.json")
+            self.assertEqual(json.loads(out.read_text(encoding="utf-8"))["enrichment"]["city"], "Boston")
+
+    def test_cli_does_not_import_requests(self):
+        code = "import sys, pda.cli; print('requests' in sys.modules, 'pda.enrich' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.split(), ["False", "False"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import json
+import socket
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from pda.fetch import CircuitBreaker, CircuitOpenError, FetchEngine, TokenBucket
+
+
+class _Flaky(BaseHTTPRequestHandler):
+    """Answers 503 for the first `failures` requests, then {"ok": n}."""
+
+    failures = 0
+    hits = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with type(self).lock:
+            type(self).hits += 1
+            n = type(self).hits
+        if self.path.startswith("/missing"):
+            self.send_error(404)
+            return
+        if n <= type(self).failures:
+            self.send_error(503)
+            return
+        time.sleep(0.05)
+        body = json.dumps({"ok": n}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, dt):
+        self.now += dt
+
+
+class TestFetchEngine(unittest.TestCase):
+    def setUp(self):
+        _Flaky.failures = 0
+        _Flaky.hits = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Flaky)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries_with_backoff(self):
+        _Flaky.failures = 2
+        sleeps = []
+        with FetchEngine(retries=3, rate_per_second=0, sleep=sleeps.append) as engine:
+            self.assertEqual(engine.get_json(self.url), {"ok": 3})
+            self.assertEqual(len(sleeps), 2)
+            self.assertEqual(engine.stats()["retries"], 2)
+
+    def test_coalesces_identical_in_flight_keys(self):
+        with FetchEngine(rate_per_second=0) as engine:
+            futs = [engine.submit("same", engine.get_json, self.url) for _ in range(5)]
+            other = engine.submit("other", engine.get_json, self.url)
+            results = {f.result()["ok"] for f in futs}
+            other.result()
+            self.assertEqual(len(results), 1)
+            self.assertEqual(_Flaky.hits, 2)
+            self.assertEqual(engine.stats()["coalesced"], 4)
+
+    def test_circuit_breaker_fails_fast(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            dead = f"http://127.0.0.1:{s.getsockname()[1]}/"
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+        with FetchEngine(retries=5, rate_per_second=0, breaker=breaker, sleep=lambda _: None) as engine:
+            with self.assertRaises(CircuitOpenError):
+                engine.get_json(dead)
+            self.assertEqual(engine.stats()["requests"], 2)
+            with self.assertRaises(CircuitOpenError):
+                engine.get_json(self.url)
+            self.assertEqual(engine.stats()["requests"], 2)
+            self.assertEqual(breaker.state, "open")
+
+    def test_client_errors_are_not_retried(self):
+        with FetchEngine(rate_per_second=0, sleep=lambda _: None) as engine:
+            with self.assertRaises(requests.HTTPError):
+                engine.get_json(self.url + "missing")
+            self.assertEqual((engine.stats()["requests"], engine.stats()["retries"]), (1, 0))
+            self.assertEqual(engine.breaker.state, "closed")
+
+    def test_any_request_error_ends_half_open_trial(self):
+        clock = _FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+        breaker.record_failure()
+        clock.now = 10
+        with FetchEngine(retries=0, rate_per_second=0, breaker=breaker, sleep=lambda _: None) as engine:
+            with mock.patch.object(engine.session, "get", side_effect=requests.exceptions.ChunkedEncodingError("cut")):
+                with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                    engine.get_json(self.url)
+            self.assertEqual(breaker.state, "open")
+            clock.now = 20
+            self.assertEqual(engine.get_json(self.url), {"ok": 1})
+            self.assertEqual(breaker.state, "closed")
+
+
+class TestLimiters(unittest.TestCase):
+    def test_token_bucket_rate(self):
+        clock = _FakeClock()
+        bucket = TokenBucket(rate=4, capacity=2, clock=clock, sleep=clock.sleep)
+        for _ in range(10):
+            bucket.acquire()
+        # 2 burst tokens free, the other 8 at 4/s
+        self.assertAlmostEqual(clock.now, 2.0)
+
+    def test_breaker_half_open_trial(self):
+        clock = _FakeClock()
+        b = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=clock)
+        b.record_failure()
+        self.assertRaises(CircuitOpenError, b.before_call)
+        clock.now = 10
+        b.before_call()
+        self.assertRaises(CircuitOpenError, b.before_call)
+        b.record_success()
+        self.assertEqual(b.state, "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
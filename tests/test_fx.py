@@ -0,0 +1,120 @@
+import csv
+import json
+import math
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from pda.analyze import run_analyze
+from pda.columnar import STORE_NAME
+from pda.fx import date_ranges, enrich_with_fx_conversion
+from pda.ingest import run_ingest
+
+
+class _StubFx(BaseHTTPRequestHandler):
+    """/timeseries returning rate 0.5 + day/100 on weekdays only."""
+
+    calls = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        type(self).calls.append((url.path, q))
+        if url.path != "/timeseries":
+            self.send_error(404)
+            return
+        start, end = date.fromisoformat(q["start_date"]), date.fromisoformat(q["end_date"])
+        rates = {}
+        d = start
+        while d <= end:
+            if d.weekday() < 5:
+                rates[d.isoformat()] = {q["symbols"]: 0.5 + d.day / 100}
+            d += timedelta(days=1)
+        body = json.dumps({"rates": rates}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFx(unittest.TestCase):
+    def setUp(self):
+        _StubFx.calls = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubFx)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_date_ranges(self):
+        self.assertEqual(
+            date_ranges(["2024-01-05", "2024-01-03", "2024-03-20", "2024-01-03"]),
+            [("2024-01-03", "2024-01-05"), ("2024-03-20", "2024-03-20")],
+        )
+
+    def test_converts_rows_with_one_request_then_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "out"
+            cache = Path(tmp) / "cache"
+            run_ingest("data/raw/expenses.csv", "data/raw/notes.txt", None, str(out))
+            run_analyze(str(out))
+
+            summary = enrich_with_fx_conversion(str(out), str(cache), target="EUR", api_url=self.url)
+            self.assertEqual(len(_StubFx.calls), 1)
+            path, q = _StubFx.calls[0]
+            self.assertEqual((path, q["base"], q["symbols"]), ("/timeseries", "USD", "EUR"))
+
+            with open(out / "converted_expenses.csv", newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            self.assertEqual(len(rows), 8)
+            for r in rows:
+                d = date.fromisoformat(r["date"])
+                while d.weekday() >= 5:  # weekend -> previous Friday's quote
+                    d -= timedelta(days=1)
+                self.assertAlmostEqual(float(r["rate"]), 0.5 + d.day / 100)
+                self.assertEqual(r["converted_amount"], f"{float(r['amount']) * float(r['rate']):.2f}")
+
+            enr = summary["enrichment"]
+            self.assertEqual((enr["type"], enr["source"], enr["missing_rows"]), ("fx_conversion", "api", 0))
+            self.assertEqual(
+                enr["total_by_category_converted"],
+                {c: round(math.fsum(float(r["amount"]) * float(r["rate"]) for r in rows if r["category"] == c), 2)
+                 for c in {r["category"] for r in rows}},
+            )
+
+            again = enrich_with_fx_conversion(str(out), str(cache), target="EUR", api_url=self.url)
+            self.assertEqual(len(_StubFx.calls), 1)
+            self.assertEqual(again["enrichment"]["source"], "cache")
+            self.assertEqual(again["enrichment"]["total_spend_converted"], enr["total_spend_converted"])
+
+            # without the columnar store the CSV is streamed twice instead, with the same output
+            converted_csv = (out / "converted_expenses.csv").read_bytes()
+            shutil.rmtree(out / STORE_NAME)
+            from_csv = enrich_with_fx_conversion(str(out), str(cache), target="EUR", api_url=self.url)["enrichment"]
+            self.assertEqual((out / "converted_expenses.csv").read_bytes(), converted_csv)
+            for key in ("converted_rows", "total_spend_converted", "total_by_category_converted"):
+                self.assertEqual(from_csv[key], enr[key], key)
+
+    def test_api_failure_does_not_raise(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "out"
+            run_ingest("data/raw/expenses.csv", "data/raw/notes.txt", None, str(out))
+            run_analyze(str(out))
+            summary = enrich_with_fx_conversion(str(out), str(Path(tmp) / "cache"), target="EUR", api_url=self.url + "/missing")
+            self.assertEqual(summary["enrichment"]["source"], "failed")
+            self.assertEqual(summary["enrichment"]["missing_rows"], 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
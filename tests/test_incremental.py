@@ -0,0 +1,82 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.analyze import run_analyze
+from pda.ingest import run_ingest
+
+
+class TestIncremental(unittest.TestCase):
+    def test_append_matches_full_rerun(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path = tmp / "expenses.csv"
+            notes_path = tmp / "notes.txt"
+            csv_path.write_bytes(Path("data/raw/expenses.csv").read_bytes() + b"\n")
+            notes_path.write_bytes(Path("data/raw/notes.txt").read_bytes() + b"\n")
+
+            inc = tmp / "inc"
+            first = run_ingest(str(csv_path), str(notes_path), None, str(inc), incremental=True)
+            self.assertEqual(first["csv_action"], "full")
+            run_analyze(str(inc), incremental=True)
+
+            again = run_ingest(str(csv_path), str(notes_path), None, str(inc), incremental=True)
+            self.assertFalse(again["changed"])
+
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("2024-02-01,5000.00,Travel,Hotel\n2024-02-02,bad,Food,x\n")
+            with open(notes_path, "a", encoding="utf-8") as f:
+                f.write("TODO: book hotel #travel\n")
+
+            second = run_ingest(str(csv_path), str(notes_path), None, str(inc), incremental=True)
+            self.assertEqual((second["csv_action"], second["notes_action"]), ("append", "append"))
+            json.dumps(second)  # the result is JSON-ready, with no live state in it
+            run_analyze(str(inc), incremental=True)
+
+            full = tmp / "full"
+            run_ingest(str(csv_path), str(notes_path), None, str(full))
+            run_analyze(str(full))
+
+            for name in ("cleaned_expenses.csv", "rejected_rows.csv", "notes_extracted.json", "summary.json"):
+                self.assertEqual((inc / name).read_bytes(), (full / name).read_bytes(), name)
+
+    def test_rewritten_input_is_reingested(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path = tmp / "expenses.csv"
+            csv_path.write_text("date,amount,category,description\n2024-01-01,1,A,x\n", encoding="utf-8")
+            notes_path = tmp / "notes.txt"
+            notes_path.write_text("hi\n", encoding="utf-8")
+            run_ingest(str(csv_path), str(notes_path), None, str(tmp / "out"), incremental=True)
+
+            csv_path.write_text("date,amount,category,description\n2024-01-01,2,B,yy\n", encoding="utf-8")
+            res = run_ingest(str(csv_path), str(notes_path), None, str(tmp / "out"), incremental=True)
+            self.assertEqual(res["csv_action"], "full")
+            self.assertIn("2.0,B,yy", (tmp / "out" / "cleaned_expenses.csv").read_text(encoding="utf-8"))
+
+    def test_unfinished_trailing_record_waits(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path, notes_path, out = tmp / "expenses.csv", tmp / "notes.txt", str(tmp / "out")
+            csv_path.write_text('date,amount,category,description\n2024-01-01,1,A,"x\ny"\n2024-01-02,2,B,partial',
+                                encoding="utf-8")
+            notes_path.write_text("TODO: one\nTODO: tw", encoding="utf-8")
+            run_ingest(str(csv_path), str(notes_path), None, out, incremental=True)
+            self.assertNotIn("partial", (tmp / "out" / "cleaned_expenses.csv").read_text(encoding="utf-8"))
+            self.assertFalse(run_ingest(str(csv_path), str(notes_path), None, out, incremental=True)["changed"])
+
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("-desc\n")
+            with open(notes_path, "a", encoding="utf-8") as f:
+                f.write("o\n")
+            res = run_ingest(str(csv_path), str(notes_path), None, out, incremental=True)
+            self.assertEqual((res["csv_action"], res["notes_action"]), ("append", "append"))
+            self.assertIn("2.0,B,partial-desc", (tmp / "out" / "cleaned_expenses.csv").read_text(encoding="utf-8"))
+            self.assertEqual((tmp / "out" / "rejected_rows.csv").read_text(encoding="utf-8").count("\n"), 1)
+            notes = (tmp / "out" / "notes_extracted.json").read_text(encoding="utf-8")
+            self.assertIn("TODO: two", notes)
+
+
+if __name__ == "__main__":
+    unittest.main()
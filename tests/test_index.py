@@ -0,0 +1,75 @@
+import random
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.analyze import iter_cleaned_expenses
+from pda.columnar import STORE_NAME
+from pda.index import INDEX_NAME, scan_rows
+from pda.ingest import ingest_csv
+from pda.query import find_rows
+
+
+class TestIndex(unittest.TestCase):
+    def _write_csv(self, path, n, seed=3):
+        rng = random.Random(seed)
+        lines = ["date,amount,category,description"]
+        for i in range(n):
+            amount = rng.choice([rng.randrange(-1000, 100000) / 100, 50.0])
+            lines.append("2024-%02d-%02d,%s,%s,row %d" % (rng.randrange(1, 13), rng.randrange(1, 29), amount, rng.choice("ABCD"), i))
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    def test_index_queries_match_scan(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "in.csv"
+            self._write_csv(src, 400)
+            cleaned, _ = ingest_csv(str(src), tmp)
+            self.assertFalse((Path(tmp) / INDEX_NAME / "meta.json").exists())
+            rows = list(iter_cleaned_expenses(str(cleaned)))
+
+            cases = [
+                {},
+                {"start": "2024-03-01", "end": "2024-05-15"},
+                {"category": "B"},
+                {"category": "B", "start": "2024-06-01"},
+                {"min_amount": 50.0, "max_amount": 50.0},
+                {"min_amount": 900.0, "category": "A"},
+                {"top": 7},
+                {"top": 5, "max_amount": 50.0, "category": "C"},
+                {"start": "2024-02-01", "limit": 10},
+                {"category": "nope"},
+            ]
+            for filters in cases:
+                self.assertEqual(find_rows(tmp, **filters), scan_rows(rows, **filters), filters)
+
+    def test_stale_index_is_rebuilt_and_csv_fallback(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "in.csv"
+            self._write_csv(src, 50)
+            ingest_csv(str(src), tmp)
+            top = find_rows(tmp, top=3)
+            self.assertTrue((Path(tmp) / INDEX_NAME / "meta.json").exists())
+
+            # an append leaves the old index stale rather than re-sorting it
+            size = src.stat().st_size
+            with open(src, "a", encoding="utf-8") as f:
+                f.write("2024-01-01,99999.00,A,late\n")
+            ingest_csv(str(src), tmp, start=size)
+            self.assertFalse((Path(tmp) / INDEX_NAME / "meta.json").exists())
+            self.assertEqual(find_rows(tmp, top=1)[0]["description"], "late")
+            shutil.rmtree(Path(tmp) / INDEX_NAME)
+            top = find_rows(tmp, top=3)
+            self.assertTrue((Path(tmp) / INDEX_NAME / "meta.json").exists())
+
+            shutil.rmtree(Path(tmp) / STORE_NAME)
+            self.assertEqual(find_rows(tmp, top=3), top)
+
+    def test_missing_input_is_reported(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaisesRegex(FileNotFoundError, "run ingest first"):
+                find_rows(str(Path(tmp) / "typo"), top=3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,10 @@ import unittest
 from pathlib import Path
 import json
 
-from pda.ingest import ingest_notes
+import tempfile
+
+from pda.ingest import ingest_csv, ingest_notes
+from pda.parallel_ingest import find_record_starts
 
 class TestIngest(unittest.TestCase):
     def test_ingest_notes_extracts_action_items(self):
@@ -19,5 +22,32 @@ class TestIngest(unittest.TestCase):
         # For now they will fail until implemented.
         self.assertTrue("action_items" in payload)
 
+    def test_find_record_starts_skips_quoted_newlines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            p = Path(tmp) / "x.csv"
+            p.write_bytes(b'a,b\n1,"x\ny"\n2,z\n')
+            self.assertEqual(find_record_starts(str(p), [0, 5, 9, 14]), [4, 12, 12, 16])
+
+    def test_parallel_ingest_matches_serial(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "in.csv"
+            lines = ["date,amount,category,description"]
+            for i in range(300):
+                if i % 7 == 0:
+                    lines.append('2024-01-%02d,%d.5,Food,"multi\nline, ""quoted"" %d"' % (i % 28 + 1, i, i))
+                elif i % 11 == 0:
+                    lines.append("2024-01-01,abc,Food,bad %d" % i)
+                else:
+                    lines.append("2024-02-%02d,%d,Rent,row %d" % (i % 28 + 1, i, i))
+            src.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+            serial_rows, parallel_rows = [], []
+            a = ingest_csv(str(src), str(Path(tmp) / "a"), sink=serial_rows.append)
+            b = ingest_csv(str(src), str(Path(tmp) / "b"), sink=parallel_rows.append, workers=3)
+            for pa, pb in zip(a, b):
+                self.assertEqual(pa.read_bytes(), pb.read_bytes())
+            self.assertEqual(serial_rows, parallel_rows)
+            self.assertEqual(len(serial_rows), 300 - 24)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,40 @@
+import random
+import unittest
+
+from pda.ingest import extract_notes
+from pda.keywords import DEFAULT_ACTION_KEYWORDS, NoteMatcher, keywords_from_profile
+
+
+def legacy_scan(s, keywords=DEFAULT_ACTION_KEYWORDS):
+    upper = s.upper()
+    is_action = any(k in upper for k in keywords)
+    return is_action, [t for t in s.split() if t.startswith("#") and len(t) > 1]
+
+
+class TestKeywords(unittest.TestCase):
+    def test_matches_legacy_scan(self):
+        rnd = random.Random(3)
+        vocab = ["todo", "To", "DO", "#tax", "#", "#todo", "follow", "up", "follow-up", "FOLLOW UP",
+                 "next", "nExT", "a#b", "#x#y", "action!", "\t", "plain", "é#ü", "#health,"]
+        matcher = NoteMatcher()
+        for _ in range(2000):
+            s = " ".join(rnd.choice(vocab) for _ in range(rnd.randint(1, 6))).strip()
+            self.assertEqual(matcher.scan(s), legacy_scan(s), s)
+
+    def test_custom_keywords(self):
+        words = ["W%04d" % i for i in range(2000)] + ["PAY BILL"]
+        matcher = NoteMatcher(words)
+        self.assertEqual(matcher.scan("remember to pay bill #home"), (True, ["#home"]))
+        self.assertEqual(matcher.scan("code w1999 done"), (True, []))
+        self.assertEqual(matcher.scan("TODO is not configured"), (False, []))
+
+    def test_profile_keywords_extend_defaults(self):
+        words = keywords_from_profile({"action_keywords": ["urgent"]})
+        payload = extract_notes(["Urgent: call bank\n", "TODO: x\n", "\n"], NoteMatcher(words))
+        self.assertEqual(payload["action_items"], ["Urgent: call bank", "TODO: x"])
+        self.assertEqual(payload["total_lines"], 3)
+        self.assertIsNone(keywords_from_profile({}))
+
+
+if __name__ == "__main__":
+    unittest.main()
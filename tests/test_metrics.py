@@ -0,0 +1,65 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.ingest import ingest_csv
+from pda.utils import METRICS, Metrics, timed, write_prometheus, write_run_record
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        METRICS.reset()
+
+    def test_timer_counts_runs_and_errors(self):
+        @timed("unit")
+        def work(fail=False):
+            if fail:
+                raise ValueError("x")
+
+        work()
+        with self.assertRaises(ValueError):
+            work(fail=True)
+        counters = {(c["name"], tuple(sorted(c["labels"].items()))): c["value"] for c in METRICS.snapshot()["counters"]}
+        self.assertEqual(counters[("pda_stage_runs_total", (("stage", "unit"), ("status", "ok")))], 1)
+        self.assertEqual(counters[("pda_stage_runs_total", (("stage", "unit"), ("status", "error")))], 1)
+        (hist,) = METRICS.snapshot()["histograms"]
+        self.assertEqual((hist["name"], hist["count"]), ("pda_stage_duration_seconds", 2))
+
+    def test_prometheus_histogram_is_cumulative(self):
+        m = Metrics()
+        for v in (0.001, 0.2, 0.2, 100.0):
+            m.observe("lat_seconds", v, buckets=(0.01, 1.0), path='a"b')
+        m.incr("hits_total", 3)
+        m.incr("bytes_total", 123456789)
+        m.observe("size_bytes", 1234567.5)
+        text = m.to_prometheus()
+        self.assertIn('lat_seconds_bucket{path="a\\"b",le="0.01"} 1\n', text)
+        self.assertIn('lat_seconds_bucket{path="a\\"b",le="1"} 3\n', text)
+        self.assertIn('lat_seconds_bucket{path="a\\"b",le="+Inf"} 4\n', text)
+        self.assertIn('lat_seconds_count{path="a\\"b"} 4\n', text)
+        self.assertIn("# TYPE hits_total counter\nhits_total 3\n", text)
+        self.assertIn("bytes_total 123456789\n", text)
+        self.assertIn("size_bytes_sum 1234567.5\n", text)
+
+    def test_ingest_records_rows_reasons_and_bytes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ingest_csv("data/raw/expenses.csv", tmp)
+            snap = METRICS.snapshot()
+            counters = {(c["name"], tuple(sorted(c["labels"].items()))): c["value"] for c in snap["counters"]}
+            self.assertEqual(counters[("pda_rows_total", (("result", "cleaned"), ("stage", "ingest_csv")))], 8)
+            reasons = {c["labels"]["reason"]: c["value"] for c in snap["counters"] if c["name"] == "pda_rows_rejected_total"}
+            self.assertEqual(sum(reasons.values()), 4)
+            self.assertIn("could not convert string to float", reasons)
+            self.assertEqual(counters[("pda_bytes_read_total", (("stage", "ingest_csv"),))], Path("data/raw/expenses.csv").stat().st_size)
+
+            record = write_run_record(str(Path(tmp) / "m.jsonl"), {"command": "ingest"})
+            line = json.loads(record.read_text(encoding="utf-8"))
+            self.assertEqual(line["command"], "ingest")
+            self.assertTrue(line["counters"])
+            prom = write_prometheus(str(Path(tmp) / "pda.prom")).read_text(encoding="utf-8")
+            self.assertIn('pda_stage_runs_total{stage="ingest_csv",status="ok"} 1', prom)
+
+
+if __name__ == "__main__":
+    unittest.main()
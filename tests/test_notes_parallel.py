@@ -0,0 +1,67 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.ingest import ingest_notes
+from pda.notes_parallel import NOTES_CACHE_DIR, is_multi_notes, resolve_notes_paths
+
+
+class TestNotesParallel(unittest.TestCase):
+    def _make_dir(self, root):
+        notes = root / "notes"
+        (notes / "2024").mkdir(parents=True)
+        for i in range(12):
+            (notes / "2024" / ("day%02d.txt" % i)).write_text(
+                "TODO: item %d\n#topic%d #common\nplain line\n" % (i, i % 3), encoding="utf-8")
+        (notes / "ignore.bin").write_bytes(b"\x00")
+        return notes
+
+    def test_directory_merge_is_ordered_and_matches_concatenation(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            notes = self._make_dir(root)
+            files = resolve_notes_paths(str(notes))
+            self.assertEqual([f.name for f in files], ["day%02d.txt" % i for i in range(12)])
+
+            concat = root / "all.txt"
+            concat.write_text("".join(f.read_text(encoding="utf-8") for f in files), encoding="utf-8")
+            single = json.loads(ingest_notes(str(concat), str(root / "a")).read_text(encoding="utf-8"))
+            many = json.loads(ingest_notes(str(notes), str(root / "b"), workers=3).read_text(encoding="utf-8"))
+            self.assertEqual(single, many)
+
+            globbed = json.loads(ingest_notes(str(notes / "2024" / "day0*.txt"), str(root / "c")).read_text(encoding="utf-8"))
+            self.assertEqual(globbed["total_lines"], 30)
+
+    def test_unchanged_files_come_from_cache(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            notes = self._make_dir(root)
+            out = root / "out"
+            ingest_notes(str(notes), str(out))
+            entries = list((out / NOTES_CACHE_DIR).glob("*-*.json"))
+            self.assertEqual(len(entries), 12)
+
+            # A poisoned cache entry proves cached partials are reused.
+            first = sorted(entries)[0]
+            payload = json.loads(first.read_text(encoding="utf-8"))
+            payload["total_lines"] = 1000
+            first.write_text(json.dumps(payload), encoding="utf-8")
+            result = json.loads(ingest_notes(str(notes), str(out)).read_text(encoding="utf-8"))
+            self.assertEqual(result["total_lines"], 36 - 3 + 1000)
+
+    def test_existing_file_with_glob_characters_is_single_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            named = root / "notes[2024].txt"
+            named.write_text("TODO: pay rent\n#home\n", encoding="utf-8")
+            (root / "notes2.txt").write_text("TODO: other\n", encoding="utf-8")
+            self.assertFalse(is_multi_notes(str(named)))
+            self.assertEqual(resolve_notes_paths(str(named)), [named])
+            result = json.loads(ingest_notes(str(named), str(root / "out")).read_text(encoding="utf-8"))
+            self.assertEqual(result["total_lines"], 2)
+            self.assertTrue(is_multi_notes(str(root / "notes[0-9].txt")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.analyze import run_analyze
+from pda.ingest import run_ingest
+from pda.pipeline import run_streaming
+
+
+class TestPipeline(unittest.TestCase):
+    def test_streaming_matches_ingest_then_analyze(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            a = Path(tmp) / "a"
+            b = Path(tmp) / "b"
+            run_ingest("data/raw/expenses.csv", "data/raw/notes.txt", None, str(a))
+            run_analyze(str(a))
+            run_streaming("data/raw/expenses.csv", "data/raw/notes.txt", None, str(b))
+
+            for name in ("cleaned_expenses.csv", "rejected_rows.csv", "summary.json"):
+                self.assertEqual((a / name).read_bytes(), (b / name).read_bytes(), name)
+
+            summary = json.loads((b / "summary.json").read_text(encoding="utf-8"))
+            self.assertEqual(sum(summary["expenses"]["count_by_category"].values()), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
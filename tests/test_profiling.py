@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda import utils
+from pda.cli import build_parser
+from pda.profiling import StageProfiler
+from pda.utils import timed
+
+
+def busy_loop():
+    return sum(i * i for i in range(20000))
+
+
+@timed("outer")
+def outer():
+    with timed("inner"):
+        busy_loop()
+    return [bytearray(1000) for _ in range(100)]
+
+
+class TestProfiling(unittest.TestCase):
+    def test_writes_one_capture_per_outer_stage(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            profiler = StageProfiler(tmp, cpu=True, mem=True, top=5).start()
+            try:
+                kept = outer()
+            finally:
+                profiler.stop()
+            self.assertIsNone(utils._stage_profiler)
+            self.assertEqual(sorted(p.name for p in Path(tmp).iterdir()), ["01-outer.alloc.txt", "01-outer.pstats"])
+            self.assertIn("test_profiling.py:15(outer)", profiler.summary())
+            alloc = (Path(tmp) / "01-outer.alloc.txt").read_text(encoding="utf-8")
+            self.assertIn("test_profiling.py", alloc)
+            self.assertNotIn("cProfile.py", alloc)
+            self.assertEqual(len(kept), 100)
+
+            outer()  # profiler stopped: no new files
+            self.assertEqual(len(list(Path(tmp).iterdir())), 2)
+
+    def test_profile_flags_do_not_shadow_subcommand_profile(self):
+        args = build_parser().parse_args(["--profile-cpu", "analyze", "--input", "d", "--profile", "p.json"])
+        self.assertEqual((args.profile_cpu, args.profile), (True, "p.json"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import csv
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from pda.report import generate_report
+from pda.summary_io import write_enrichment, write_summary_file
+
+
+def big_summary(n_topics=250):
+    return {
+        "expenses": {
+            "total_spend": 10.0,
+            "average_amount": 5.0,
+            "anomalies": [{"date": "2024-01-01", "category": "A|B", "amount": 9.5, "description": "<script>"}],
+        },
+        "notes": {"action_items": ["TODO: one"], "topics": {f"#t{i}": i for i in range(n_topics)}},
+    }
+
+
+class TestReport(unittest.TestCase):
+    def test_all_formats_in_one_pass_with_caps(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            summary = write_summary_file(tmp, big_summary())
+            out = Path(tmp) / "r.md"
+            generate_report(str(summary), str(out), formats=["html", "csv"], max_rows=20)
+
+            md = out.read_text(encoding="utf-8")
+            self.assertIn("| #t249 | 249 |", md)
+            self.assertNotIn("#t229 ", md)
+            self.assertIn("_Showing 20 of 250._", md)
+            self.assertIn("| A\\|B |", md)
+
+            html = out.with_suffix(".html").read_text(encoding="utf-8")
+            self.assertIn("&lt;script&gt;", html)
+            self.assertEqual(html.count("<tr><td>#t"), 20)
+
+            with open(out.with_suffix(".csv"), newline="", encoding="utf-8") as f:
+                topics = [r for r in csv.reader(f) if r[0] == "topics"]
+            self.assertEqual(len(topics), 251)  # header + every topic
+            self.assertEqual(topics[1], ["topics", "#t249", "249"])
+
+    def test_paginates_overflow(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            summary = write_summary_file(tmp, big_summary(45))
+            out = Path(tmp) / "r.md"
+            generate_report(str(summary), str(out), max_rows=20, paginate=True)
+            self.assertIn("[page 2](r.topics.p2.md), [page 3](r.topics.p3.md)", out.read_text(encoding="utf-8"))
+            last = (Path(tmp) / "r.topics.p3.md").read_text(encoding="utf-8")
+            self.assertIn("(page 3 of 3)", last)
+            self.assertIn("| #t0 | 0 |", last)
+
+            write_summary_file(tmp, big_summary(30))
+            generate_report(str(summary), str(out), max_rows=20, paginate=True)
+            self.assertFalse((Path(tmp) / "r.topics.p3.md").exists())
+
+    def test_skips_when_summary_unchanged(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            summary = write_summary_file(tmp, big_summary(3))
+            out = Path(tmp) / "r.md"
+            generate_report(str(summary), str(out))
+            out.write_text("sentinel", encoding="utf-8")
+            generate_report(str(summary), str(out))
+            self.assertEqual(out.read_text(encoding="utf-8"), "sentinel")
+
+            write_enrichment(tmp, {"type": "exchange_rate", "rate": 0.5, "base": "USD", "target": "EUR"})
+            generate_report(str(summary), str(out))
+            self.assertIn("- Rate: 0.5", out.read_text(encoding="utf-8"))
+
+            out.write_text("sentinel", encoding="utf-8")
+            generate_report(str(summary), str(out), force=True)
+            self.assertIn("## Enrichment", out.read_text(encoding="utf-8"))
+            self.assertTrue(json.loads((Path(tmp) / ".r.md.stamp").read_text(encoding="utf-8"))["key"])
+
+
+if __name__ == "__main__":
+    unittest.main()
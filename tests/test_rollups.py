@@ -0,0 +1,59 @@
+import json
+import random
+import tempfile
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+
+from pda.ingest import run_ingest
+from pda.rollups import ROLLUPS_NAME, Rollups, load_rollups, month_key, week_key
+
+
+class TestRollups(unittest.TestCase):
+    def test_query_matches_brute_force(self):
+        rng = random.Random(7)
+        rows = []
+        for _ in range(500):
+            d = date(2023, 12, 1) + timedelta(days=rng.randrange(120))
+            rows.append({"date": d.isoformat(), "amount": rng.randrange(-500, 50000) / 100, "category": rng.choice("ABC")})
+        r = Rollups.from_rows(rows)
+        r.derive()
+
+        key = {"day": lambda d: d.isoformat(), "week": week_key, "month": month_key}
+        for by in ("day", "week", "month"):
+            for lo, hi in (("2023-12-05", "2024-02-20"), ("2024-01-01", "2024-01-31"), (None, None)):
+                expected = {}
+                for row in rows:
+                    if (lo and row["date"] < lo) or (hi and row["date"] > hi):
+                        continue
+                    cell = expected.setdefault((key[by](date.fromisoformat(row["date"])), row["category"]), [0, 0])
+                    cell[0] += 1
+                    cell[1] += round(row["amount"] * 100)
+                got = {(q["period"], q["category"]): [q["count"], round(q["total"] * 100)] for q in r.query(lo, hi, by=by)}
+                self.assertEqual(got, expected, (by, lo, hi))
+
+    def test_incremental_ingest_updates_rollups(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path = tmp / "expenses.csv"
+            csv_path.write_bytes(Path("data/raw/expenses.csv").read_bytes() + b"\n")
+            inc, full = tmp / "inc", tmp / "full"
+            run_ingest(str(csv_path), "data/raw/notes.txt", None, str(inc), incremental=True)
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("2024-02-01,5000.00,Travel,Hotel\n2024-02-03,7.25,Food,Tea\n")
+            run_ingest(str(csv_path), "data/raw/notes.txt", None, str(inc), incremental=True)
+            run_ingest(str(csv_path), "data/raw/notes.txt", None, str(full))
+
+            a = json.loads((inc / ROLLUPS_NAME).read_text(encoding="utf-8"))
+            b = json.loads((full / ROLLUPS_NAME).read_text(encoding="utf-8"))
+            for by in ("day", "week", "month"):
+                self.assertEqual(a[by], b[by], by)
+            self.assertEqual(a["month"]["2024-02"], {"Travel": [1, 500000], "Food": [1, 725]})
+
+            # a stale rollups file is rebuilt from the cleaned CSV
+            (inc / ROLLUPS_NAME).write_text("{}", encoding="utf-8")
+            self.assertEqual(load_rollups(str(inc)).month, b["month"])
+
+
+if __name__ == "__main__":
+    unittest.main()
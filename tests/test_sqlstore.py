@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import closing
+from pathlib import Path
+
+from pda.analyze import analyze_expenses
+from pda.bench import generate_expenses, generate_notes
+from pda.ingest import run_ingest
+from pda.query import find_rows
+from pda.rollups import load_rollups
+from pda.sqlstore import connect, db_path_in, query_periods, run_analyze_sqlite, run_ingest_sqlite, transaction
+from pda.summary_io import find_summary, load_summary, write_enrichment
+
+
+def normalized(value):
+    return json.loads(json.dumps(value))
+
+
+def count(out):
+    with closing(connect(db_path_in(out))) as conn:
+        return conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+
+
+class TestSqliteStore(unittest.TestCase):
+    def test_matches_file_backend(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path = generate_expenses(tmp / "e.csv", 3000, categories=6, invalid_rate=0.05, seed=3)
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("2020-01-01,5.00,Category000,Coffee\n" * 3)
+            notes_path = generate_notes(tmp / "n.txt", 200)
+            files, db = str(tmp / "files"), str(tmp / "db")
+            run_ingest(str(csv_path), str(notes_path), None, files)
+            run_ingest_sqlite(str(csv_path), str(notes_path), None, db)
+            summary_path = run_analyze_sqlite(db)
+
+            self.assertEqual(find_summary(db), summary_path)
+            summary = load_summary(str(summary_path))
+            self.assertEqual(summary["expenses"], normalized(analyze_expenses(files + "/cleaned_expenses.csv")))
+            self.assertEqual(summary["notes"], json.loads(Path(files, "notes_extracted.json").read_text(encoding="utf-8")))
+            self.assertEqual(query_periods(db, "2020-01-15", "2020-03-10", by="week"),
+                             load_rollups(files).query("2020-01-15", "2020-03-10", by="week"))
+            for filters in ({"top": 7}, {"category": "Category002", "min_amount": 40.5, "limit": 20}):
+                self.assertEqual(find_rows(db, store="sqlite", **filters), find_rows(files, **filters))
+
+            write_enrichment(db, {"type": "exchange_rate", "rate": 0.9})
+            self.assertEqual(load_summary(str(summary_path))["enrichment"]["rate"], 0.9)
+            self.assertFalse((tmp / "db" / "summary.enrichment.json").exists())
+
+    def test_upserts_are_idempotent_and_incremental(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path, notes_path, out = tmp / "e.csv", tmp / "n.txt", str(tmp / "out")
+            csv_path.write_text("date,amount,category,description\n2024-01-01,5.00,Food,Tea\n2024-01-01,5.00,Food,Tea\n",
+                                encoding="utf-8")
+            notes_path.write_text("TODO: x #a\n", encoding="utf-8")
+            run_ingest_sqlite(str(csv_path), str(notes_path), None, out)
+            run_ingest_sqlite(str(csv_path), str(notes_path), None, out)
+            self.assertEqual(count(out), 2)  # identical rows kept apart by occurrence, not duplicated on re-run
+
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("2024-01-01,5.00,Food,Tea\n2024-01-02,7.50,Bus,Ride\n")
+            result = run_ingest_sqlite(str(csv_path), str(notes_path), None, out, incremental=True)
+            self.assertEqual((result["csv_action"], result["notes_action"]), ("append", "unchanged"))
+            self.assertEqual(count(out), 4)
+
+            csv_path.write_text("date,amount,category,description\n2024-01-02,7.50,Bus,Ride\n", encoding="utf-8")
+            self.assertEqual(run_ingest_sqlite(str(csv_path), str(notes_path), None, out, incremental=True)["csv_action"], "full")
+            self.assertEqual(count(out), 1)
+
+            # WAL: a reader sees the last committed state while an ingest transaction is open
+            with closing(connect(db_path_in(out))) as writer, transaction(writer):
+                writer.execute("DELETE FROM expenses")
+                with closing(sqlite3.connect(str(db_path_in(out)), timeout=1)) as reader:
+                    self.assertEqual(reader.execute("SELECT COUNT(*) FROM expenses").fetchone()[0], 1)
+
+    def test_cli_rejects_file_store_summary_options(self):
+        for extra in (["--pretty"], ["--summary-format", "msgpack"]):
+            cmd = [sys.executable, "-m", "pda.cli", "analyze", "--input", "unused", "--store", "sqlite", *extra]
+            proc = subprocess.run(cmd, capture_output=True, text=True)
+            self.assertEqual(proc.returncode, 2)
+            self.assertIn("apply to --store files only", proc.stderr)
+
+    def test_queries_do_not_create_the_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp, "typo")
+            with self.assertRaisesRegex(FileNotFoundError, "run ingest --store sqlite first"):
+                find_rows(str(out), store="sqlite", top=5)
+            with self.assertRaises(FileNotFoundError):
+                query_periods(str(out), "2024-01-01", "2024-02-01")
+            self.assertFalse(out.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import random
+import unittest
+from statistics import mean, stdev
+
+from pda.stats import ExpenseAccumulator, RunningStats
+
+
+def legacy_summary(rows):
+    """The original list-based analyze_expenses computation."""
+    amounts = [float(r["amount"]) for r in rows]
+    total_by_cat, count_by_cat = {}, {}
+    for r in rows:
+        total_by_cat[r["category"]] = total_by_cat.get(r["category"], 0.0) + float(r["amount"])
+        count_by_cat[r["category"]] = count_by_cat.get(r["category"], 0) + 1
+    parsed = [{**r, "amount": float(r["amount"])} for r in rows]
+    avg = mean(amounts)
+    sd = stdev(amounts) if len(amounts) >= 2 else 0.0
+    threshold = avg + 2 * sd
+    top3 = sorted(total_by_cat.items(), key=lambda x: x[1], reverse=True)[:3]
+    return {
+        "total_spend": round(sum(amounts), 2),
+        "average_amount": round(avg, 2),
+        "count_by_category": count_by_cat,
+        "total_by_category": {k: round(v, 2) for k, v in total_by_cat.items()},
+        "top_3_categories_by_total": [(k, round(v, 2)) for k, v in top3],
+        "largest_5_transactions": sorted(parsed, key=lambda x: x["amount"], reverse=True)[:5],
+        "anomaly_rule": {"type": "mean_plus_2std", "threshold": round(threshold, 2)},
+        "anomalies": [r for r in parsed if r["amount"] > threshold],
+    }
+
+
+def make_rows(n, seed):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        amt = round(rnd.choice([rnd.uniform(-20, 80), rnd.uniform(500, 3000), 12.5]), 2)
+        rows.append({"date": "2024-01-%02d" % (i % 28 + 1), "amount": str(amt),
+                     "category": rnd.choice("ABCDE"), "description": "row %d" % i})
+    return rows
+
+
+class TestStats(unittest.TestCase):
+    def assertSameSummary(self, acc, rows):
+        got = json.dumps(acc.result(rescan=lambda: iter(rows)), indent=2)
+        self.assertEqual(got, json.dumps(legacy_summary(rows), indent=2))
+
+    def test_matches_legacy_single_pass(self):
+        for seed in range(5):
+            rows = make_rows(500, seed)
+            acc = ExpenseAccumulator(warmup=10, max_in_memory=40)
+            for r in rows:
+                acc.add(r)
+            self.assertSameSummary(acc, rows)
+
+    def test_rescan_when_candidate_was_dropped(self):
+        rows = [{"date": "2024-01-01", "amount": "3000.0", "category": "A", "description": "early"}]
+        rows += [{"date": "2024-01-02", "amount": str(float(i % 7)), "category": "B", "description": ""} for i in range(200)]
+        acc = ExpenseAccumulator(warmup=0)
+        for r in rows:
+            acc.add(r)
+        self.assertIsNone(acc.candidates.select(100.0))
+        self.assertSameSummary(acc, rows)
+
+    def test_merge_matches_single_pass(self):
+        rows = make_rows(300, 42)
+        parts = [ExpenseAccumulator(warmup=5, max_in_memory=20) for _ in range(3)]
+        for i, r in enumerate(rows):
+            parts[i * 3 // len(rows)].add(r)
+        merged = parts[0].merge(parts[1]).merge(parts[2])
+        single = ExpenseAccumulator()
+        for r in rows:
+            single.add(r)
+        a = merged.result(rescan=lambda: iter(rows))
+        b = single.result(rescan=lambda: iter(rows))
+        self.assertEqual(a["largest_5_transactions"], b["largest_5_transactions"])
+        self.assertEqual(a["anomalies"], b["anomalies"])
+        self.assertEqual(a["average_amount"], b["average_amount"])
+
+    def test_running_stats_exact(self):
+        xs = [0.1, 0.2, 0.3, 1e5, -15.0, 12.34]
+        s = RunningStats()
+        for x in xs:
+            s.add(x)
+        self.assertEqual(s.mean(), mean(xs))
+        self.assertEqual(s.stdev(), stdev(xs))
+        self.assertEqual(RunningStats.from_state(s.to_state()).stdev(), stdev(xs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pda import summary_io
+from pda.report import generate_report
+from pda.summary_io import ENRICHMENT_NAME, find_summary, load_summary, write_enrichment, write_summary_file
+
+SUMMARY = {"total_spend": 12.5, "by_category": {"food": 12.5}, "note": "café"}
+
+
+class TestSummaryIO(unittest.TestCase):
+    def test_compact_by_default_pretty_on_request(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_summary_file(tmp, SUMMARY)
+            compact = path.read_text(encoding="utf-8")
+            self.assertNotIn("\n", compact.strip())
+            self.assertEqual(json.loads(compact), SUMMARY)
+
+            pretty = write_summary_file(tmp, SUMMARY, pretty=True).read_text(encoding="utf-8")
+            self.assertIn('\n  "total_spend"', pretty)
+            self.assertEqual(json.loads(pretty), SUMMARY)
+
+    def test_stdlib_fallback_matches(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(summary_io, "_orjson", return_value=None):
+            path = write_summary_file(tmp, SUMMARY)
+            self.assertEqual(load_summary(str(path)), SUMMARY)
+
+    def test_enrichment_sidecar_merged_and_reset(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_summary_file(tmp, SUMMARY)
+            before = path.read_bytes()
+            write_enrichment(tmp, {"type": "exchange_rate", "rate": 0.9})
+            self.assertEqual(path.read_bytes(), before)
+            self.assertEqual(load_summary(str(path))["enrichment"]["rate"], 0.9)
+            self.assertNotIn("enrichment", load_summary(str(path), with_enrichment=False))
+
+            report = Path(tmp) / "report.md"
+            generate_report(str(path), str(report))
+            self.assertIn("0.9", report.read_text(encoding="utf-8"))
+
+            write_summary_file(tmp, SUMMARY)
+            self.assertFalse((Path(tmp) / ENRICHMENT_NAME).exists())
+            self.assertNotIn("enrichment", load_summary(str(path)))
+
+    def test_msgpack_falls_back_to_json_without_package(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(summary_io, "_msgpack", return_value=None):
+            with self.assertLogs(level="WARNING"):
+                path = write_summary_file(tmp, SUMMARY, fmt="msgpack")
+            self.assertEqual(path.name, "summary.json")
+            self.assertEqual(find_summary(tmp), path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,9 @@
+import importlib.util
+import random
 import unittest
-from pda.validate import validate_date, parse_amount, validate_row
+from pda.validate import validate_date, parse_amount, validate_row, validate_rows
+
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
 
 class TestValidate(unittest.TestCase):
     def test_validate_date_ok(self):
@@ -26,5 +30,34 @@ class TestValidate(unittest.TestCase):
         self.assertFalse(ok)
         self.assertIn("Empty", err)
 
+    def test_validate_date_semantic(self):
+        self.assertTrue(validate_date("2024-02-29"))
+        self.assertFalse(validate_date("2023-02-29"))
+        self.assertFalse(validate_date("2024-13-01"))
+        self.assertFalse(validate_date("2024-04-31"))
+
+    def _check_validate_rows_fuzz(self, use_numpy):
+        rnd = random.Random(7)
+        dates = ["2024-01-01", " 2024-02-29 ", "2023-02-29", "2024-1-1", "", None, "0000-01-01", "２０２４-01-01", 20240101]
+        amounts = ["12.5", " -3 ", "1e3", "abc", "", None, "999999", "100000", "-100000.001", "1_000", ".5", "5.",
+                   "nan", "inf", "+7.125", "9" * 400, 12, "٣.٥"]
+        cats = ["Food", " ", "", None, " Rent ", 5, 0]
+        descs = ["x", " y ", "", None, 3]
+        rows = [{"date": rnd.choice(dates), "amount": rnd.choice(amounts),
+                 "category": rnd.choice(cats), "description": rnd.choice(descs)} for _ in range(3000)]
+        columns = {k: [r[k] for r in rows] for k in ("date", "amount", "category", "description")}
+        cleaned, rejected = validate_rows(columns, use_numpy=use_numpy)
+        got = {i: (True, row, None) for i, row in cleaned}
+        got.update({i: (False, None, err) for i, err in rejected})
+        for i, row in enumerate(rows):
+            self.assertEqual(got[i], validate_row(row), row)
+
+    def test_validate_rows_matches_validate_row_fuzz(self):
+        self._check_validate_rows_fuzz(use_numpy=False)
+
+    @unittest.skipUnless(HAVE_NUMPY, "NumPy not installed (pip install -r requirements-test.txt)")
+    def test_validate_rows_numpy_matches_validate_row_fuzz(self):
+        self._check_validate_rows_fuzz(use_numpy=True)
+
 if __name__ == "__main__":
     unittest.main()
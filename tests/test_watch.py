@@ -0,0 +1,55 @@
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from pda.analyze import analyze_expenses
+from pda.watch import Watcher, make_server
+
+
+class TestWatch(unittest.TestCase):
+    def test_applies_appended_rows_and_serves_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            csv_path, notes_path = tmp / "expenses.csv", tmp / "notes.txt"
+            csv_path.write_bytes(Path("data/raw/expenses.csv").read_bytes() + b"\n")
+            notes_path.write_bytes(Path("data/raw/notes.txt").read_bytes() + b"\n")
+            out, report = tmp / "out", tmp / "report.md"
+            watcher = Watcher(str(csv_path), str(notes_path), None, str(out), str(report))
+
+            self.assertTrue(watcher.poll())
+            self.assertFalse(watcher.poll())
+            rows = watcher.status()["rows"]
+
+            with open(csv_path, "a", encoding="utf-8") as f:
+                f.write("2024-02-01,5000.00,Travel,Hotel\n")
+            self.assertFalse(watcher.poll())  # waits for the file to settle
+            self.assertTrue(watcher.poll())
+            self.assertEqual(watcher.status()["rows"], rows + 1)
+            expected = analyze_expenses(str(out / "cleaned_expenses.csv"))
+            self.assertEqual(watcher.summary["expenses"]["total_spend"], expected["total_spend"])
+            self.assertIn("5000.0", report.read_text(encoding="utf-8"))
+
+            server = make_server(watcher, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base = "http://127.0.0.1:%s" % server.server_address[1]
+            try:
+                with urlopen(base + "/summary") as r:
+                    self.assertEqual(json.load(r), json.loads(json.dumps(watcher.summary)))
+                with urlopen(base + "/query?top=1") as r:
+                    self.assertEqual(json.load(r)[0]["amount"], 5000.0)
+                with urlopen(base + "/query?by=month&from=2024-02-01&to=2024-02-29&category=Travel") as r:
+                    self.assertEqual(json.load(r)[-1]["total"], 5000.0)
+                with self.assertRaises(HTTPError) as ctx:
+                    urlopen(base + "/query?top=many")
+                self.assertEqual(ctx.exception.code, 400)
+            finally:
+                server.shutdown()
+                server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()